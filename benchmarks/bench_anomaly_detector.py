@@ -0,0 +1,57 @@
+#run with
+# python benchmarks/bench_anomaly_detector.py
+#compares the vectorized AnomalyDetector.detect against the original per-day loop
+import sys
+import os
+import glob
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+import pandas as pd
+from algorithms import AnomalyDetector
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def loop_detect(time_series, window_size=30, threshold=3.0):
+    """The pre-vectorization implementation of AnomalyDetector.detect."""
+    time_series = pd.Series(time_series)
+    anomalies = np.full(len(time_series), False)
+    for i in range(window_size, len(time_series)):
+        window = time_series.iloc[i - window_size:i]
+        mean = window.mean()
+        std = window.std()
+        if std == 0 or pd.isna(std):
+            std = 1e-10
+        z_score = abs(time_series.iloc[i] - mean) / std
+        anomalies[i] = z_score > threshold
+    return anomalies
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def main():
+    files = sorted(glob.glob(os.path.join(DATA_DIR, '*_daily.csv')))
+    series = [pd.read_csv(f)['precipitation_sum'].to_numpy() for f in files]
+    batch = np.vstack(series)
+    detector = AnomalyDetector(window_size=30, threshold=3.0)
+
+    loop_time, loop_result = best_of(lambda: [loop_detect(s) for s in series], repeat=1)
+    single_time, single_result = best_of(lambda: [detector.detect(s) for s in series])
+    batch_time, batch_result = best_of(lambda: detector.detect(batch))
+
+    assert all(np.array_equal(a, b) for a, b in zip(loop_result, single_result))
+    assert np.array_equal(np.vstack(loop_result), batch_result)
+
+    print(f"{len(series)} cities x {batch.shape[1]} days, window=30")
+    print(f"  original loop      : {loop_time * 1000:10.1f} ms")
+    print(f"  vectorized per city: {single_time * 1000:10.1f} ms  ({loop_time / single_time:,.0f}x)")
+    print(f"  vectorized batch   : {batch_time * 1000:10.1f} ms  ({loop_time / batch_time:,.0f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#run with
+# python benchmarks/bench_city_store.py
+#compares loading the bundled city CSVs against the columnar binary copies
+import sys
+import os
+import glob
+import shutil
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+import pandas as pd
+from city_store import binary_path_for, convert_csv_dir, open_city_binary, read_city_binary
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    with tempfile.TemporaryDirectory() as work_dir:
+        for path in glob.glob(os.path.join(DATA_DIR, '*_daily.csv')):
+            shutil.copy(path, work_dir)
+        convert_csv_dir(work_dir)
+        csv_files = sorted(glob.glob(os.path.join(work_dir, '*.csv')))
+        binary_files = [binary_path_for(f) for f in csv_files]
+
+        csv_time = best_of(lambda: [pd.read_csv(f, parse_dates=['date']) for f in csv_files])
+        frame_time = best_of(lambda: [read_city_binary(f) for f in binary_files])
+        mmap_time = best_of(lambda: [np.asarray(open_city_binary(f, ['precipitation_sum'])[1]['precipitation_sum']).sum()
+                                     for f in binary_files])
+
+        csv_size = sum(os.path.getsize(f) for f in csv_files)
+        binary_size = sum(os.path.getsize(f) for f in binary_files)
+
+    print(f"{len(csv_files)} city files")
+    print(f"  read_csv(parse_dates)  : {csv_time * 1000:8.1f} ms  {csv_size / 1024:8.0f} KiB")
+    print(f"  read_city_binary       : {frame_time * 1000:8.1f} ms  {binary_size / 1024:8.0f} KiB  ({csv_time / frame_time:.0f}x)")
+    print(f"  memory-mapped column   : {mmap_time * 1000:8.1f} ms  ({csv_time / mmap_time:.0f}x)")
+
+if __name__ == "__main__":
+    main()
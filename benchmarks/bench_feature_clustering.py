@@ -0,0 +1,46 @@
+#run with
+# python benchmarks/bench_feature_clustering.py [--cities 5000] [--workers 4]
+#times climate feature extraction and the automatic k sweep on synthetic locations
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+import algorithms
+from algorithms import ClusteringAlgorithm, climate_features
+from panel import CityPanel
+
+def synthetic_panel(n_cities, n_days=8898, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n_days)
+    scale = rng.uniform(0.01, 0.4, size=(n_cities, 1))
+    phase = rng.uniform(0, 2 * np.pi, size=(n_cities, 1))
+    mean = scale * (1 + 0.8 * np.cos(2 * np.pi * t / 365.25 + phase))
+    values = rng.gamma(0.5, mean / 0.5).astype(np.float32)
+    values[rng.random(values.shape) < 0.55] = 0.0
+    return CityPanel(values, [f"Location {i:05d}" for i in range(n_cities)], 11283, 4 * 3600)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cities', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    panel = synthetic_panel(args.cities)
+    start = time.perf_counter()
+    features = climate_features(panel)
+    print(f"{args.cities} locations x {panel.n_days} days")
+    print(f"  features ({features.shape[1]} per location): {time.perf_counter() - start:.2f}s")
+
+    algorithm = ClusteringAlgorithm(os.path.join(os.path.dirname(__file__), '..', 'data'), feature_cache_dir=None)
+    start = time.perf_counter()
+    result = algorithm.run_feature_clustering(panel, k_values=range(2, 11), max_workers=args.workers)
+    model = type(result.model).__name__
+    print(f"  k sweep 2..10 with {model} (threshold {algorithms.MINIBATCH_THRESHOLD}): "
+          f"{time.perf_counter() - start:.2f}s, best k={result.k}")
+    print(result.scores.round(3).to_string())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#run with
+# python benchmarks/bench_forecast_parallel.py [max workers]
+#fits Prophet for every bundled city with 1, 2, 4, ... worker processes
+import sys
+import os
+import glob
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pandas as pd
+from algorithms import ForecastingAlgorithm
+from city_store import load_city_frame
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def load_combined():
+    frames = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, '*_daily.csv'))):
+        df = load_city_frame(path)
+        df['city'] = os.path.basename(path).replace('_daily.csv', '')
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    combined = load_combined()
+    n_cities = combined['city'].nunique()
+    print(f"{n_cities} cities, {os.cpu_count()} CPUs available")
+
+    workers = 1
+    baseline = None
+    while workers <= max_workers:
+        start = time.perf_counter()
+        result = ForecastingAlgorithm.predict_all_cities(combined, 'precipitation_sum', forecast_days=30,
+                                                         max_workers=workers)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"  workers={workers:<3d} {elapsed:7.1f} s  {n_cities / elapsed:5.2f} cities/s  "
+              f"speedup {baseline / elapsed:4.2f}x  errors={len(result.attrs['errors'])}")
+        workers *= 2
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#run with
+# python benchmarks/bench_locations.py [--stations 100000] [--queries 1000]
+#times nearest-station and radius lookups on the registry's BallTree against a brute-force
+#haversine scan over all stations, for synthetic stations spread over the globe
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+from locations import EARTH_RADIUS_KM, LocationRegistry
+
+def brute_force_km(lats, lons, lat, lon):
+    lats, lons, lat, lon = np.radians(lats), np.radians(lons), np.radians(lat), np.radians(lon)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stations', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--radius', type=float, default=100.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    lats = np.degrees(np.arcsin(rng.uniform(-1, 1, args.stations)))  # uniform over the sphere
+    lons = rng.uniform(-180, 180, args.stations)
+    start = time.perf_counter()
+    registry = LocationRegistry([{'name': f"Station {i}", 'latitude': lat, 'longitude': lon}
+                                 for i, (lat, lon) in enumerate(zip(lats, lons))])
+    registry.nearest(0.0, 0.0)  # builds the tree
+    print(f"{args.stations} stations: registry + BallTree built in {time.perf_counter() - start:.2f}s")
+
+    points = list(zip(np.degrees(np.arcsin(rng.uniform(-1, 1, args.queries))), rng.uniform(-180, 180, args.queries)))
+    timings = {'nearest tree': 0.0, 'nearest brute': 0.0, 'within tree': 0.0, 'within brute': 0.0}
+    for lat, lon in points:
+        t0 = time.perf_counter()
+        tree_nearest = registry.nearest(lat, lon)[0][0]['id']
+        t1 = time.perf_counter()
+        distances = brute_force_km(lats, lons, lat, lon)
+        brute_nearest = f"station_{np.argmin(distances)}"
+        t2 = time.perf_counter()
+        tree_within = len(registry.within(lat, lon, args.radius))
+        t3 = time.perf_counter()
+        brute_within = int((brute_force_km(lats, lons, lat, lon) <= args.radius).sum())
+        t4 = time.perf_counter()
+        assert tree_nearest == brute_nearest and tree_within == brute_within
+        timings['nearest tree'] += t1 - t0
+        timings['nearest brute'] += t2 - t1
+        timings['within tree'] += t3 - t2
+        timings['within brute'] += t4 - t3
+
+    for name, total in timings.items():
+        print(f"  {name:14s}: {total / args.queries * 1e6:9.1f} us/query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#run with
+# python benchmarks/bench_panel_memory.py [--cities 1000]
+#compares memory and analysis time of per-city DataFrames (as loaded from the city files)
+#and the long frame built by predict_trends against one CityPanel, for synthetic locations
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+import pandas as pd
+from algorithms import AnomalyDetector
+from panel import CityPanel
+
+def synthetic_city_frames(n_cities, start='2000-11-22', end='2025-04-02', seed=0):
+    """Frames shaped like the city CSVs read with parse_dates: tz-aware date plus two float64 columns."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(f"{start} 04:00", f"{end} 04:00", freq='D', tz='UTC')
+    frames = {}
+    for i in range(n_cities):
+        values = rng.gamma(0.5, 0.3, size=len(dates))
+        values[rng.random(len(dates)) < 0.6] = 0.0
+        frames[f"Location {i:04d}"] = pd.DataFrame({
+            'date': dates,
+            'precipitation_sum': values,
+            'precipitation_normalized': values / values.max(),
+        })
+    return frames
+
+def mb(n_bytes):
+    return n_bytes / 1024 ** 2
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cities', type=int, default=1000)
+    args = parser.parse_args()
+
+    frames = synthetic_city_frames(args.cities)
+    frames_bytes = sum(df.memory_usage(index=True, deep=True).sum() for df in frames.values())
+    long_time, long_df = timed(lambda: pd.concat([df.assign(city=city) for city, df in frames.items()],
+                                                 ignore_index=True))
+    long_bytes = long_df.memory_usage(index=True, deep=True).sum()
+    panel_time, panel = timed(lambda: CityPanel.from_frames(frames))
+
+    print(f"{args.cities} locations x {panel.n_days} days")
+    print(f"  per-city DataFrames : {mb(frames_bytes):9.1f} MB")
+    print(f"  long frame with city: {mb(long_bytes):9.1f} MB  (built in {long_time:.2f}s)")
+    print(f"  CityPanel (float32) : {mb(panel.nbytes):9.1f} MB  (built in {panel_time:.2f}s, "
+          f"{frames_bytes / panel.nbytes:.1f}x smaller than the frames)")
+
+    # zero-copy slicing
+    row = panel.city("Location 0001")
+    window = panel.between('2020-01-01', '2020-12-31')
+    print(f"  city row shares memory: {np.shares_memory(row, panel.values)}, "
+          f"date range shares memory: {np.shares_memory(window.values, panel.values)}")
+
+    # yearly averages as ClusteringAlgorithm.compute_yearly_averages computes them
+    def frame_yearly():
+        yearly = {}
+        for city, df in frames.items():
+            df = df[(df['date'].dt.year >= 2001) & (df['date'].dt.year <= 2024)]
+            yearly[city] = df.groupby(df['date'].dt.year)['precipitation_sum'].mean()
+        return pd.DataFrame(yearly)
+    frame_yearly_time, expected = timed(frame_yearly)
+    panel_yearly_time, yearly = timed(lambda: panel.yearly_means(2001, 2024))
+    assert np.allclose(expected.to_numpy(), yearly.to_numpy(), atol=1e-6)
+    print(f"  yearly means: frames {frame_yearly_time:.2f}s, panel {panel_yearly_time:.2f}s")
+
+    detector = AnomalyDetector()
+    detect_time, flags = timed(lambda: detector.detect(panel))
+    print(f"  anomaly detection on the panel: {detect_time:.2f}s, {int(flags.sum())} anomalies")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#run with
+# python benchmarks/bench_plot_rendering.py [--repeat 3]
+#renders the anomaly subplots and the scatter overlay for every city in data/ at full resolution
+#and with each downsampling mode, reporting render+save time and file size (PNG and SVG);
+#'full' keeps every point but rasterizes dense artists
+import sys
+import os
+import argparse
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import matplotlib
+matplotlib.use('Agg')
+from visualizer import RASTERIZE_THRESHOLD, AnomalyVisualizer
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def render(visualizer, files, out_dir, ext):
+    anomalies = os.path.join(out_dir, f"anomalies.{ext}")
+    overlay = os.path.join(out_dir, f"overlay.{ext}")
+    start = time.perf_counter()
+    visualizer.plot_anomalies(files, output_path=anomalies)
+    visualizer.plot_scatter_overlay(files, output_path=overlay)
+    return time.perf_counter() - start, os.path.getsize(anomalies) + os.path.getsize(overlay)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        # 'before' draws every point as vectors, like the plots did without downsampling
+        for label, mode, rasterize in [('before', None, False), ('full', None, True),
+                                       ('minmax', 'minmax', True), ('lttb', 'lttb', True)]:
+            threshold = RASTERIZE_THRESHOLD if rasterize else float('inf')
+            visualizer = AnomalyVisualizer(None, DATA_DIR, downsample=mode, rasterize_threshold=threshold)
+            files = list(visualizer.city_files.values())
+            for file in files:
+                visualizer.loader(file, ['precipitation_sum'])  # time rendering, not CSV parsing
+            for ext in ['png', 'svg']:
+                times = []
+                for _ in range(args.repeat):  # later repeats reuse the figures
+                    elapsed, size = render(visualizer, files, out_dir, ext)
+                    times.append(elapsed)
+                print(f"{label:7s} {ext}: first {times[0]:.2f}s, best {min(times):.2f}s, "
+                      f"{size / 1024:8.0f} KB  ({len(files)} cities)")
+
+if __name__ == "__main__":
+    main()
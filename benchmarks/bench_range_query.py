@@ -0,0 +1,64 @@
+#run with
+# python benchmarks/bench_range_query.py [--years 10,25,50,100] [--files 20]
+#times reading part of a city history from the binary city files as the history grows:
+#  full + filter: read every row, then keep 2001-2024 (what compute_yearly_averages did)
+#  range:         load_city_frame(start, end), a binary search on the sorted day column
+#  last year:     load_city_frame for the final 365 days
+#  csv range:     the same 2001-2024 range from CSVs without a binary copy (bisected byte offsets)
+#plus compute_yearly_averages end to end. Range reads should stay flat as years grow.
+import sys
+import os
+import argparse
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import pandas as pd
+from algorithms import YEARLY_FIRST_YEAR, YEARLY_LAST_YEAR, ClusteringAlgorithm
+from city_store import CityDataStore, load_city_frame
+from synthetic import LAST_DAY, write_city_files
+
+START = f'{YEARLY_FIRST_YEAR}-01-01'
+END = f'{YEARLY_LAST_YEAR}-12-31'
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def full_and_filter(paths):
+    for path in paths:
+        df = load_city_frame(path, ['precipitation_sum'])
+        df[(df['date'].dt.year >= YEARLY_FIRST_YEAR) & (df['date'].dt.year <= YEARLY_LAST_YEAR)]
+
+def yearly_averages(work_dir):
+    # a fresh store each time, so nothing is served from the cache
+    algorithm = ClusteringAlgorithm(work_dir, loader=CityDataStore())
+    algorithm.compute_yearly_averages(list(algorithm.cityFiles))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=lambda s: [int(v) for v in s.split(',')], default=[10, 25, 50, 100])
+    parser.add_argument('--files', type=int, default=20)
+    args = parser.parse_args()
+
+    last_year = (pd.Timestamp(LAST_DAY) - pd.Timedelta(days=364)).strftime('%Y-%m-%d')
+    print(f"{args.files} binary city files, times in ms")
+    print(f"{'years':>5s} {'full+filter':>11s} {'range':>8s} {'last year':>9s} {'csv range':>9s} {'yearly avg':>10s}")
+    for years in args.years:
+        with tempfile.TemporaryDirectory() as work_dir:
+            paths = write_city_files(work_dir, args.files, years, binary=True)
+            full_time = best_of(lambda: full_and_filter(paths))
+            range_time = best_of(lambda: [load_city_frame(p, ['precipitation_sum'], START, END) for p in paths])
+            last_time = best_of(lambda: [load_city_frame(p, ['precipitation_sum'], last_year) for p in paths])
+            yearly_time = best_of(lambda: yearly_averages(work_dir))
+            csv_paths = write_city_files(os.path.join(work_dir, 'csv'), args.files, years)
+            csv_time = best_of(lambda: [load_city_frame(p, ['precipitation_sum'], START, END) for p in csv_paths])
+        print(f"{years:5d} {full_time * 1000:11.1f} {range_time * 1000:8.1f} {last_time * 1000:9.1f} "
+              f"{csv_time * 1000:9.1f} {yearly_time * 1000:10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#run with
+# python benchmarks/bench_similarity.py [--cities 5000]
+#times building the similarity index, nearest-neighbour queries and single-city updates
+import sys
+import os
+import argparse
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+import pandas as pd
+from similarity import SimilarityIndex
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cities', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    profiles = pd.DataFrame(rng.gamma(2.0, 0.05, size=(args.cities, 12)),
+                            index=[f"Location {i:05d}" for i in range(args.cities)])
+    print(f"{args.cities} locations, monthly profiles")
+    for metric in ('correlation', 'euclidean'):
+        start = time.perf_counter()
+        index = SimilarityIndex(profiles, metric=metric)
+        build = time.perf_counter() - start
+
+        queries = rng.choice(profiles.index, size=1000)
+        start = time.perf_counter()
+        for city in queries:
+            index.nearest(city, 10)
+        query = (time.perf_counter() - start) / len(queries)
+
+        start = time.perf_counter()
+        for city in queries[:100]:
+            index.update(city, rng.gamma(2.0, 0.05, size=12))
+        update = (time.perf_counter() - start) / 100
+        print(f"  {metric:<11}: build {build:.2f}s, top-10 query {query * 1e6:.0f} us, "
+              f"one-city update {update * 1e3:.2f} ms ({build / update:,.0f}x faster than a rebuild)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#run with
+# python benchmarks/bench_startup.py [--budget-ms 500]
+#reports import time (python -X importtime) for the entry points and the time until
+#the Climate Analyzer window is drawn. Exits with status 1 if main.py pulls in a
+#heavy dependency at startup or its import exceeds the budget.
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+HEAVY_MODULES = ['prophet', 'cmdstanpy', 'sklearn', 'matplotlib', 'pandas']
+
+def import_times(module):
+    """
+    Run python -X importtime for one module.
+
+    Returns:
+        tuple: (cumulative microseconds for module, {direct dependency: cumulative us},
+        names of every module imported while loading it)
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    subtree = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        subtree.append((depth, name.strip(), int(cumulative_us)))
+        if depth == 0:
+            # entries are printed after their dependencies, so a top-level line closes a subtree
+            if name.strip() == module:
+                break
+            subtree = []
+    total = subtree[-1][2]
+    children = {name: cumulative for depth, name, cumulative in subtree if depth == 1}
+    loaded = {name for _, name, _ in subtree}
+    return total, children, loaded
+
+def time_to_first_window():
+    """Seconds from interpreter launch until the main window has been drawn, or None without a display."""
+    code = ("import main\n"
+            "root = main.build_main_window()\n"
+            "root.update()\n"
+            "root.destroy()\n")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    return elapsed if result.returncode == 0 else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--budget-ms', type=float, default=500.0, help='maximum import time for main.py')
+    parser.add_argument('--top', type=int, default=8, help='slowest imports to list per entry point')
+    args = parser.parse_args()
+
+    failures = []
+    for module in ['main', 'algorithms', 'visualizer', 'data_processor']:
+        total, children, loaded = import_times(module)
+        print(f"import {module}: {total / 1000:8.1f} ms")
+        for name, cumulative in sorted(children.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {name:<24} {cumulative / 1000:8.1f} ms")
+        if module == 'main':
+            heavy = [m for m in HEAVY_MODULES if m in loaded]
+            if heavy:
+                failures.append(f"main.py imports {', '.join(heavy)} at startup")
+            if total / 1000 > args.budget_ms:
+                failures.append(f"import main took {total / 1000:.0f} ms (budget {args.budget_ms:.0f} ms)")
+
+    window = time_to_first_window()
+    if window is None:
+        print("time to first window: skipped (no display available)")
+    else:
+        print(f"time to first window: {window * 1000:8.1f} ms")
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
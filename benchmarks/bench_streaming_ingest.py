@@ -0,0 +1,87 @@
+#run with
+# python benchmarks/bench_streaming_ingest.py [--years 1,5,25] [--chunk-days 90]
+#ingests hourly precipitation + temperature for one location from a local stand-in for
+#the archive API (tests/openmeteo_stub.py, run in a separate process so its allocations
+#are not counted) and compares peak traced memory (tracemalloc) of
+#  streamed:  WeatherDataProcessor.stream_hourly_city, chunk_days per request
+#  in-memory: the whole history in one request, clean_data, then a daily groupby
+#The streamed peak should stay flat as the history grows; the in-memory one grows with it.
+import sys
+import os
+import argparse
+import multiprocessing
+import tempfile
+import time
+import tracemalloc
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'tests')))
+
+from datetime import date, timedelta
+import pandas as pd
+from data_processor import RateLimiter, WeatherDataProcessor
+
+CITY = {"name": "Boston", "latitude": 42.3601, "longitude": -71.0589}
+VARIABLES = ["precipitation", "temperature_2m"]
+END_DATE = "2025-04-01"
+
+def serve_stub(queue):
+    from openmeteo_stub import ArchiveStubServer
+
+    with ArchiveStubServer() as server:
+        queue.put(server.url)
+        server.thread.join()  # until the parent terminates us
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 1024 ** 2
+
+def streamed(processor, work_dir, start_date, chunk_days):
+    processor.stream_hourly_city(CITY, work_dir, start_date, END_DATE, VARIABLES, chunk_days,
+                                 rate_limiter=RateLimiter(per_minute=10 ** 6, per_hour=10 ** 6))
+
+def in_memory(processor, work_dir, start_date):
+    hourly = processor._request_many([CITY["latitude"]], [CITY["longitude"]], start_date, END_DATE,
+                                     variables=VARIABLES, hourly=True)[0]
+    hourly = processor.clean_data(hourly)
+    days = (pd.DatetimeIndex(hourly["date"]).asi8 // 10 ** 9 + hourly.attrs["utc_offset"]) // 86400
+    daily = hourly.groupby(days).agg({"precipitation": "sum", "temperature_2m": "mean"})
+    hourly.to_csv(os.path.join(work_dir, "in_memory_hourly.csv"), index=False)
+    daily.to_csv(os.path.join(work_dir, "in_memory_daily.csv"))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=lambda s: [int(v) for v in s.split(',')], default=[1, 5, 25])
+    parser.add_argument('--chunk-days', type=int, default=90)
+    args = parser.parse_args()
+
+    queue = multiprocessing.Queue()
+    stub = multiprocessing.Process(target=serve_stub, args=(queue,), daemon=True)
+    stub.start()
+    url = queue.get(timeout=30)
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            # warm-up: lazy imports would otherwise count towards the first measured peak
+            processor = WeatherDataProcessor(cache_dir=os.path.join(work_dir, 'cache'), retries=0, url=url)
+            streamed(processor, work_dir, "2025-03-01", args.chunk_days)
+            in_memory(processor, work_dir, "2025-03-01")
+        print(f"{'years':>5s} {'hourly rows':>11s} {'streamed MB':>11s} {'s':>6s} {'in-memory MB':>12s} {'s':>6s}")
+        for years in args.years:
+            start_date = (date.fromisoformat(END_DATE) - timedelta(days=int(years * 365.25) - 1)).isoformat()
+            with tempfile.TemporaryDirectory() as work_dir:
+                # separate HTTP caches, so neither run is served the other's responses
+                processor = WeatherDataProcessor(cache_dir=os.path.join(work_dir, 'cache'), retries=0, url=url)
+                stream_time, stream_peak = measure(lambda: streamed(processor, work_dir, start_date, args.chunk_days))
+                rows = sum(1 for _ in open(os.path.join(work_dir, 'boston_hourly.csv'))) - 1
+                processor = WeatherDataProcessor(cache_dir=os.path.join(work_dir, 'cache2'), retries=0, url=url)
+                memory_time, memory_peak = measure(lambda: in_memory(processor, work_dir, start_date))
+            print(f"{years:5d} {rows:11d} {stream_peak:11.1f} {stream_time:6.1f} {memory_peak:12.1f} {memory_time:6.1f}")
+    finally:
+        stub.terminate()
+
+if __name__ == "__main__":
+    main()
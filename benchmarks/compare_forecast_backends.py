@@ -0,0 +1,61 @@
+#run with
+# python benchmarks/compare_forecast_backends.py [number of holdout windows]
+#backtests the Prophet and climatology backends on the bundled cities:
+#each holdout window hides the last N*30 days, forecasts 30 days and scores them
+import sys
+import os
+import glob
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+import pandas as pd
+from algorithms import ForecastingAlgorithm
+from city_store import load_city_frame
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+TARGET = 'precipitation_sum'
+FORECAST_DAYS = 30
+
+def load_combined():
+    frames = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, '*_daily.csv'))):
+        df = load_city_frame(path)
+        df['city'] = os.path.basename(path).replace('_daily.csv', '')
+        frames.append(df)
+    combined = pd.concat(frames, ignore_index=True)
+    combined['date'] = combined['date'].dt.tz_localize(None)
+    return combined
+
+def backtest(combined, backend, windows):
+    errors = []
+    elapsed = 0.0
+    last_date = combined['date'].max()
+    for w in range(windows, 0, -1):
+        cutoff = last_date - pd.Timedelta(days=w * FORECAST_DAYS)
+        train = combined[combined['date'] <= cutoff]
+        actual = combined[(combined['date'] > cutoff) &
+                          (combined['date'] <= cutoff + pd.Timedelta(days=FORECAST_DAYS))]
+        start = time.perf_counter()
+        forecast = ForecastingAlgorithm.predict_all_cities(train, TARGET, FORECAST_DAYS, backend=backend)
+        elapsed += time.perf_counter() - start
+        scored = forecast.merge(actual, on=['city', 'date'])
+        errors.append(scored[f'predicted_{TARGET}'] - scored[TARGET])
+    errors = pd.concat(errors)
+    return {
+        'seconds': elapsed,
+        'mae': float(errors.abs().mean()),
+        'rmse': float(np.sqrt((errors ** 2).mean())),
+    }
+
+def main():
+    windows = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    combined = load_combined()
+    print(f"{combined['city'].nunique()} cities, {windows} holdout window(s) of {FORECAST_DAYS} days")
+    print(f"{'backend':<12} {'seconds':>9} {'MAE (in)':>9} {'RMSE (in)':>10}")
+    for backend in ['climatology', 'prophet']:
+        scores = backtest(combined, backend, windows)
+        print(f"{backend:<12} {scores['seconds']:9.2f} {scores['mae']:9.4f} {scores['rmse']:10.4f}")
+
+if __name__ == "__main__":
+    main()
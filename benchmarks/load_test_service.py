@@ -0,0 +1,110 @@
+#run with
+# python benchmarks/load_test_service.py [--url http://127.0.0.1:8765] [--clients 8] [--duration 10]
+#sends GET requests for /forecast/<city>, /anomalies/<city>, /forecast and /cities from
+#--clients threads over keep-alive connections for --duration seconds and prints the
+#requests per second and latency percentiles. --revalidate is the fraction of requests
+#sent with the ETag from an earlier response (If-None-Match), which should come back 304.
+#Without --url a server is started in-process on the repo's data directory.
+import sys
+import os
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def request_paths(city_ids):
+    paths = [f"/forecast/{city}" for city in city_ids] + [f"/anomalies/{city}" for city in city_ids]
+    return paths + ['/forecast', '/cities']
+
+def client(host, port, paths, deadline, revalidate, seed, latencies, statuses):
+    rng = random.Random(seed)
+    etags = {}
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        headers = {'If-None-Match': etags[path]} if path in etags and rng.random() < revalidate else {}
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            statuses['error'] += 1
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] += 1
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    connection.close()
+
+def start_local_server(data_dir):
+    from service import ForecastServer, ResultStore
+
+    store = ResultStore(data_dir)
+    start = time.perf_counter()
+    store.refresh()
+    print(f"Precomputed results in {time.perf_counter() - start:.2f}s")
+    server = ForecastServer(('127.0.0.1', 0), store)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', help='running service to test, e.g. http://127.0.0.1:8765')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='data directory for the in-process server')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--revalidate', type=float, default=0.5, help='fraction of requests sent with If-None-Match')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        server = start_local_server(args.data_dir)
+        host, port = server.server_address[:2]
+
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    connection.request('GET', '/cities')
+    cities = [city['id'] for city in json.loads(connection.getresponse().read())['cities']]
+    connection.close()
+    paths = request_paths(cities)
+
+    latencies = [[] for _ in range(args.clients)]
+    statuses = [Counter() for _ in range(args.clients)]
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=client, args=(host, port, paths, deadline, args.revalidate, i,
+                                                     latencies[i], statuses[i])) for i in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    all_latencies = np.array([value for values in latencies for value in values]) * 1000
+    status_counts = sum(statuses, Counter())
+    print(f"{len(paths)} paths, {args.clients} clients, {elapsed:.1f}s, revalidate {args.revalidate:.0%}")
+    print(f"requests  {len(all_latencies)}  ({len(all_latencies) / elapsed:.0f} req/s)")
+    print("statuses  " + ", ".join(f"{status}: {count}" for status, count in sorted(status_counts.items(), key=str)))
+    if len(all_latencies):
+        p50, p95, p99 = np.percentile(all_latencies, [50, 95, 99])
+        print(f"latency   p50 {p50:.2f} ms  p95 {p95:.2f} ms  p99 {p99:.2f} ms  max {all_latencies.max():.2f} ms")
+
+if __name__ == "__main__":
+    main()
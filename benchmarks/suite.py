@@ -0,0 +1,205 @@
+#run with
+# python benchmarks/suite.py [--scale quick|default|production] [--save baseline.json]
+# python benchmarks/suite.py --compare baseline.json [--tolerance 0.25]
+#times the core analyses on synthetic data for every (location count, history length) pair:
+#anomaly detection, yearly averages + K-Means, climatology (and with --prophet, Prophet)
+#forecasts, clean_data + normalize_data and loading city files as CSV and .cbin.
+#Per-file benchmarks (cleaning, loading) use at most --file-sample locations.
+#--compare exits with status 1 when a benchmark is slower than the baseline by more
+#than the tolerance. Everything runs offline.
+#the production scale (10,000 locations x 100 years) needs about 8 GB of memory
+import sys
+import os
+import argparse
+import json
+import platform
+import statistics
+import tempfile
+import time
+import warnings
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+import pandas as pd
+import synthetic
+from algorithms import AnomalyDetector, ClusteringAlgorithm, ForecastingAlgorithm
+from city_store import load_city_frame
+
+SCALES = {
+    'quick': ([10, 100], [1, 10]),
+    'default': ([10, 100, 1000], [1, 25, 100]),
+    'production': ([10, 100, 1000, 10000], [1, 10, 100]),
+}
+PROPHET_LOCATIONS = 4  # Prophet fits take seconds each, so only this many locations are forecast
+
+def timed(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': statistics.median(times), 'repeat': repeat}
+
+def bench_anomaly_detect(panel, years, args):
+    detector = AnomalyDetector()
+    return lambda: detector.detect(panel), {}
+
+def bench_yearly_kmeans(panel, years, args):
+    algorithm = ClusteringAlgorithm(args.work_dir, feature_cache_dir=None)
+    k = min(3, len(panel))
+    def run():
+        yearly = algorithm.compute_yearly_averages(panel)
+        algorithm.run_kmeans(yearly.dropna(), k)
+    return run, {'k': k}
+
+def bench_forecast_climatology(panel, years, args):
+    return lambda: ForecastingAlgorithm.predict_all_cities(panel, 'precipitation_sum', forecast_days=30,
+                                                           backend='climatology'), {}
+
+def bench_forecast_prophet(panel, years, args):
+    subset = panel.select(list(panel.cities[:PROPHET_LOCATIONS]))
+    return lambda: ForecastingAlgorithm.predict_all_cities(subset, 'precipitation_sum', forecast_days=30,
+                                                           max_workers=1), {'locations': len(subset)}
+
+def bench_clean_normalize(panel, years, args):
+    from data_processor import WeatherDataProcessor
+
+    processor = WeatherDataProcessor(cache_dir=os.path.join(args.work_dir, 'http_cache'))  # never used to fetch
+    frames = [synthetic.synthetic_raw_frame(years, seed) for seed in range(min(len(panel), args.file_sample))]
+    def run():
+        for df in frames:
+            processor.normalize_data(processor.clean_data(df))
+    return run, {'files': len(frames)}
+
+def _bench_load(panel, years, args, binary, start=None, end=None):
+    directory = os.path.join(args.work_dir, f"{'cbin' if binary else 'csv'}_{len(panel)}x{years}")
+    paths = synthetic.write_city_files(directory, min(len(panel), args.file_sample), years, binary)
+    def run():
+        for path in paths:
+            load_city_frame(path, None, start, end)
+    return run, {'files': len(paths)}
+
+def bench_load_csv(panel, years, args):
+    return _bench_load(panel, years, args, binary=False)
+
+def bench_load_cbin(panel, years, args):
+    return _bench_load(panel, years, args, binary=True)
+
+def bench_load_cbin_range(panel, years, args):
+    # the years compute_yearly_averages reads
+    return _bench_load(panel, years, args, binary=True, start='2001-01-01', end='2024-12-31')
+
+BENCHMARKS = {
+    'anomaly_detect': bench_anomaly_detect,
+    'yearly_kmeans': bench_yearly_kmeans,
+    'forecast_climatology': bench_forecast_climatology,
+    'forecast_prophet': bench_forecast_prophet,
+    'clean_normalize': bench_clean_normalize,
+    'load_csv': bench_load_csv,
+    'load_cbin': bench_load_cbin,
+    'load_cbin_range': bench_load_cbin_range,
+}
+
+def run_suite(args):
+    results = {}
+    names = [name for name in BENCHMARKS if name in args.only] if args.only else list(BENCHMARKS)
+    if not args.prophet and not args.only:
+        names.remove('forecast_prophet')
+    for locations in args.locations:
+        for years in args.years:
+            panel = synthetic.synthetic_panel(locations, years)
+            print(f"{locations} locations x {years} years ({panel.nbytes / 1024 ** 2:.0f} MB panel)")
+            for name in names:
+                func, params = BENCHMARKS[name](panel, years, args)
+                func()  # warm-up: imports, caches
+                record = timed(func, args.repeat)
+                record['params'] = {'locations': locations, 'years': years, **params}
+                key = f"{name}/{locations}x{years}y"
+                results[key] = record
+                print(f"  {name:22s} best {record['best']:9.4f}s  median {record['median']:9.4f}s")
+            del panel
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+def compare(results, baseline, tolerance, noise_floor):
+    """Print current vs baseline timings. Returns the keys that regressed."""
+    regressions = []
+    print(f"\n{'benchmark':40s} {'baseline':>10s} {'current':>10s} {'ratio':>7s}")
+    for key, record in results.items():
+        base = baseline['results'].get(key)
+        if base is None or base['params'] != record['params']:
+            print(f"{key:40s} {'-':>10s} {record['best']:9.4f}s {'new':>7s}")
+            continue
+        ratio = record['best'] / base['best'] if base['best'] > 0 else float('inf')
+        slower = ratio > 1 + tolerance and record['best'] - base['best'] > noise_floor
+        flag = '  REGRESSION' if slower else ('  faster' if ratio < 1 - tolerance else '')
+        print(f"{key:40s} {base['best']:9.4f}s {record['best']:9.4f}s {ratio:6.2f}x{flag}")
+        if slower:
+            regressions.append(key)
+    return regressions
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', choices=list(SCALES), default='quick')
+    parser.add_argument('--locations', type=int_list, help='comma-separated location counts (overrides --scale)')
+    parser.add_argument('--years', type=int_list, help='comma-separated history lengths in years (overrides --scale)')
+    parser.add_argument('--only', type=lambda s: s.split(','), help=f"benchmarks to run from {','.join(BENCHMARKS)}")
+    parser.add_argument('--prophet', action='store_true', help=f'include Prophet ({PROPHET_LOCATIONS} locations)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--file-sample', type=int, default=50, help='locations used by the per-file benchmarks')
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--noise-floor', type=float, default=0.005,
+                        help='ignore slowdowns smaller than this many seconds')
+    args = parser.parse_args()
+    unknown = [name for name in args.only or [] if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        scale_locations = sorted({r['params']['locations'] for r in baseline['results'].values()})
+        scale_years = sorted({r['params']['years'] for r in baseline['results'].values()})
+        # rerun exactly what the baseline measured unless told otherwise
+        args.locations = args.locations or scale_locations
+        args.years = args.years or scale_years
+        args.only = args.only or sorted({key.split('/')[0] for key in baseline['results']})
+    args.locations = args.locations or SCALES[args.scale][0]
+    args.years = args.years or SCALES[args.scale][1]
+
+    warnings.simplefilter('ignore')  # Prophet and pandas chatter would bury the table
+    with tempfile.TemporaryDirectory() as work_dir:
+        args.work_dir = work_dir
+        results = run_suite(args)
+
+    report = {'environment': environment(), 'results': results}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {len(results)} results to {args.save}")
+    if baseline is not None:
+        if baseline.get('environment', {}).get('machine') != report['environment']['machine']:
+            print("warning: the baseline was recorded on a different machine type")
+        regressions = compare(results, baseline, args.tolerance, args.noise_floor)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions.")
+
+if __name__ == "__main__":
+    main()
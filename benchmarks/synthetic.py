@@ -0,0 +1,71 @@
+#synthetic weather data for the benchmarks, shaped like the data Open-Meteo returns
+#and the city files written by WeatherDataProcessor; nothing here touches the network
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+import pandas as pd
+from city_store import binary_path_for, write_city_binary
+from panel import CityPanel
+
+LAST_DAY = '2025-04-01'
+DRY_FRACTION = 0.6
+CHUNK_LOCATIONS = 256  # rows generated at a time, keeps float64 temporaries small at 10k locations
+
+def n_days(years):
+    return int(round(years * 365.25))
+
+def first_date(years):
+    return pd.Timestamp(LAST_DAY) - pd.Timedelta(days=n_days(years) - 1)
+
+def precipitation(rng, n_locations, days):
+    """Daily precipitation in inches: seasonal gamma amounts with dry days, locations as rows."""
+    season = np.cos(2 * np.pi * np.arange(days) / 365.25)
+    scale = rng.uniform(0.05, 0.4, size=(n_locations, 1))
+    amplitude = rng.uniform(-0.8, 0.8, size=(n_locations, 1))
+    values = rng.gamma(0.5, 1.0, size=(n_locations, days)) * scale * (1 + amplitude * season)
+    values[rng.random((n_locations, days)) < DRY_FRACTION] = 0.0
+    return values
+
+def synthetic_panel(n_locations, years, seed=0):
+    """CityPanel of n_locations x years of daily precipitation (float32)."""
+    rng = np.random.default_rng(seed)
+    days = n_days(years)
+    values = np.empty((n_locations, days), dtype=np.float32)
+    for start in range(0, n_locations, CHUNK_LOCATIONS):
+        stop = min(start + CHUNK_LOCATIONS, n_locations)
+        values[start:stop] = precipitation(rng, stop - start, days)
+    first_day = (first_date(years) - pd.Timestamp('1970-01-01')).days
+    return CityPanel(values, [f"Location {i:05d}" for i in range(n_locations)], first_day, 4 * 3600)
+
+def synthetic_raw_frame(years, seed=0):
+    """One location as fetched from the API, before clean_data: a few duplicate, missing and negative days."""
+    rng = np.random.default_rng(seed)
+    days = n_days(years)
+    dates = pd.date_range(first_date(years) + pd.Timedelta(hours=4), periods=days, freq='D', tz='UTC')
+    values = precipitation(rng, 1, days)[0]
+    values[rng.random(days) < 0.001] = np.nan
+    values[rng.random(days) < 0.0005] = -0.1
+    df = pd.DataFrame({'date': dates, 'precipitation_sum': values})
+    duplicates = df.sample(frac=0.001, random_state=seed)
+    return pd.concat([df, duplicates], ignore_index=True).sort_values('date', kind='stable', ignore_index=True)
+
+def synthetic_city_frame(years, seed=0):
+    """One location as stored in a city file: date, precipitation_sum and precipitation_normalized."""
+    df = synthetic_raw_frame(years, seed).drop_duplicates(subset='date', ignore_index=True)
+    values = df['precipitation_sum'].fillna(0).clip(lower=0)
+    return df.assign(precipitation_sum=values, precipitation_normalized=values / max(values.max(), 1e-9))
+
+def write_city_files(directory, n_files, years, binary=False, seed=0):
+    """Write n_files city CSVs (plus .cbin copies when binary) and return their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(n_files):
+        df = synthetic_city_frame(years, seed + i)
+        path = os.path.join(directory, f"location_{i:05d}_daily.csv")
+        df.to_csv(path, index=False)
+        if binary:
+            write_city_binary(df, binary_path_for(path))
+        paths.append(path)
+    return paths
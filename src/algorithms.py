@@ -1,56 +1,250 @@
 # algorithms.py
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import hashlib
+import json
 import os
-from sklearn.cluster import KMeans
-from prophet import Prophet
+from concurrent.futures import ProcessPoolExecutor
+from city_store import default_store, file_signature
+from locations import LocationRegistry
+from model_cache import ProphetModelCache
+from panel import CityPanel
+from tracing import span, traced
+# sklearn and prophet are imported where they are used: prophet alone takes seconds to import
 
 # -------------------------------
 # Clustering Algorithm Component
 # -------------------------------
+# feature clustering settings
+MINIBATCH_THRESHOLD = 2000  # above this many cities MiniBatchKMeans replaces KMeans
+SILHOUETTE_SAMPLE = 5000  # silhouette is O(n^2), so score on a sample of this size
+WET_DAY_INCHES = 0.01
+FEATURE_VERSION = 1  # bump when climate_features changes so cached matrices are rebuilt
+YEARLY_FIRST_YEAR = 2001  # years averaged for K-Means on yearly precipitation
+YEARLY_LAST_YEAR = 2024
+
 class ClusteringAlgorithm:
-    def __init__(self, data_dir='data'): #dir with CSVs
+    def __init__(self, data_dir='data', loader=default_store, feature_cache_dir='.feature_cache', registry=None): #dir with CSVs, function path -> DataFrame (cached, read-only)
         self.data_dir = data_dir
+        self.loader = loader
+        self.feature_cache_dir = feature_cache_dir #None disables the feature cache
+        self.registry = registry or LocationRegistry.from_data_dir(data_dir)
         self.cityFiles = self._load_city_files()
 
     def _load_city_files(self):
-        city_files = {}
-        for file in os.listdir(self.data_dir):
-            if file.endswith('.csv'):
-                city_name = file.replace('_daily.csv', '').replace('_', ' ').title()
-                city_files[city_name] = os.path.join(self.data_dir, file)
-        return city_files
-
-    def load_city_data(self, city):
+        # names come from the location registry, only locations with a data file are listed
+        return self.registry.city_files()
+
+    def load_city_data(self, city, columns=None, start=None, end=None): #start/end: inclusive dates, only those rows are read
         if city not in self.cityFiles:
             raise FileNotFoundError(f"CSV file for {city} not found.")
-        df = pd.read_csv(self.cityFiles[city], parse_dates=['date'])
+        if start is None and end is None:
+            df = self.loader(self.cityFiles[city], columns)
+        else:
+            df = self.loader(self.cityFiles[city], columns, start, end)
         if df.empty:
             raise ValueError(f"CSV file for {city} is empty.")
         return df
 
-    def compute_yearly_averages(self, selectedCities):
+    def load_panel(self, selectedCities, column='precipitation_sum', start=None, end=None):
+        missing = [city for city in selectedCities if city not in self.cityFiles]
+        if missing:
+            raise FileNotFoundError(f"CSV file for {', '.join(missing)} not found.")
+        return CityPanel.from_files({city: self.cityFiles[city] for city in selectedCities}, column, self.loader,
+                                    start, end)
+
+    @traced('yearly_averages')
+    def compute_yearly_averages(self, selectedCities): #list of city names, or a CityPanel
+        if isinstance(selectedCities, CityPanel):
+            return selectedCities.yearly_means(YEARLY_FIRST_YEAR, YEARLY_LAST_YEAR)
         yearlyData = {}
         for city in selectedCities:
-            df = self.load_city_data(city)
-            df = df[(df['date'].dt.year >= 2001) & (df['date'].dt.year <= 2024)]
-            df['Year'] = df['date'].dt.year
-            yearlyMean = df.groupby('Year')['precipitation_sum'].mean()
+            # read only the averaged years instead of filtering the whole history
+            df = self.load_city_data(city, ['precipitation_sum'], f'{YEARLY_FIRST_YEAR}-01-01',
+                                     f'{YEARLY_LAST_YEAR}-12-31')
+            yearlyMean = df.groupby(df['date'].dt.year.rename('Year'))['precipitation_sum'].mean()
             yearlyData[city] = yearlyMean
         return pd.DataFrame(yearlyData)
 
+    @traced('kmeans')
     def run_kmeans(self, data, k):
+        from sklearn.cluster import KMeans
+
         kmeans = KMeans(n_clusters=k, random_state=42, n_init='auto')
         kmeans.fit(data.T)
         return kmeans
 
+    @traced('climate_features')
+    def climate_features(self, selectedCities):
+        """
+        Climate feature matrix for clustering many locations.
+
+        Columns are the mean daily precipitation of each calendar month (month_01..month_12),
+        the annual mean, the seasonal amplitude (wettest minus driest month) and the
+        wet-day frequency (share of days with at least WET_DAY_INCHES). For city names the
+        matrix is cached in feature_cache_dir, keyed by the data files' mtime and size.
+
+        Parameters:
+            selectedCities (list | CityPanel): City names or a panel of daily values.
+
+        Returns:
+            pd.DataFrame: One row per city.
+        """
+        if isinstance(selectedCities, CityPanel):
+            return climate_features(selectedCities)
+        path = self._feature_cache_path(selectedCities)
+        if path is not None and os.path.exists(path):
+            with np.load(path, allow_pickle=False) as cached:
+                return pd.DataFrame(cached['values'], index=pd.Index(cached['cities'], name='city'),
+                                    columns=cached['columns'])
+        features = climate_features(self.load_panel(selectedCities))
+        if path is not None:
+            os.makedirs(self.feature_cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp.npz"
+            np.savez(tmp_path, values=features.to_numpy(), cities=np.asarray(features.index, dtype=str),
+                     columns=np.asarray(features.columns, dtype=str))
+            os.replace(tmp_path, path)
+        return features
+
+    @traced('feature_clustering')
+    def run_feature_clustering(self, selectedCities, k=None, k_values=range(2, 11), max_workers=1, mp_context=None):
+        """
+        Cluster cities on standardized climate_features, picking k by silhouette score.
+
+        With k=None every candidate in k_values (up to one less than the number of cities)
+        is fitted, in parallel worker processes unless max_workers is 1, and the best
+        silhouette wins. Above MINIBATCH_THRESHOLD cities MiniBatchKMeans is used.
+        mp_context is passed to the process pool (e.g. spawn when called from a GUI thread).
+
+        Returns:
+            ClusteringResult: labels_ and cluster_centers_ usable with ClusteringVisualizer.plot,
+            plus the features and the inertia/silhouette of every k tried.
+        """
+        features = self.climate_features(selectedCities)
+        incomplete = features.index[features.isna().any(axis=1)]
+        if len(incomplete):
+            raise ValueError(f"No precipitation data for: {', '.join(incomplete)}")
+        n_cities = len(features)
+        if k is not None:
+            if k < 1 or k > n_cities:
+                raise ValueError("Invalid number of clusters.")
+            candidates = [k]
+        else:
+            candidates = [c for c in k_values if 2 <= c < n_cities]
+            if not candidates:
+                raise ValueError("Need at least three cities to choose the number of clusters.")
+
+        spread = features.std(ddof=0).replace(0, 1)
+        X = ((features - features.mean()) / spread).to_numpy()
+        jobs = [(X, c, n_cities > MINIBATCH_THRESHOLD) for c in candidates]
+        if max_workers == 1 or len(jobs) <= 1:
+            outcomes = [_fit_kmeans(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+                outcomes = list(executor.map(_fit_kmeans, jobs))
+
+        scores = pd.DataFrame([{'k': c, 'inertia': model.inertia_, 'silhouette': score}
+                               for c, model, score in outcomes]).set_index('k')
+        # best silhouette, smallest k on ties; a lone candidate (or no valid score) wins by default
+        best = max(outcomes, key=lambda o: (np.nan_to_num(o[2], nan=-np.inf), -o[0]))
+
+        def yearly():
+            if isinstance(selectedCities, CityPanel):
+                return self.compute_yearly_averages(selectedCities)
+            return self.compute_yearly_averages(self.load_panel(selectedCities, start=f'{YEARLY_FIRST_YEAR}-01-01',
+                                                                end=f'{YEARLY_LAST_YEAR}-12-31'))
+        return ClusteringResult(best[1], features, scores, yearly)
+
+    def _feature_cache_path(self, selectedCities):
+        if not self.feature_cache_dir:
+            return None
+        missing = [city for city in selectedCities if city not in self.cityFiles]
+        if missing:
+            raise FileNotFoundError(f"CSV file for {', '.join(missing)} not found.")
+        key = json.dumps([FEATURE_VERSION, WET_DAY_INCHES,
+                          [(city, os.path.abspath(self.cityFiles[city]), file_signature(self.cityFiles[city]))
+                           for city in selectedCities]])
+        return os.path.join(self.feature_cache_dir, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]}.npz")
+
+
+class ClusteringResult:
+    """
+    Outcome of ClusteringAlgorithm.run_feature_clustering.
+
+    labels_ and cluster_centers_ follow the KMeans attributes ClusteringVisualizer.plot
+    reads, with centers given as the mean yearly-average curve of each cluster so they
+    plot next to the cities: ClusteringVisualizer().plot(result.yearly, result, result.k).
+    """
+    def __init__(self, model, features, scores, yearly_loader):
+        self.model = model
+        self.k = model.n_clusters
+        self.labels_ = model.labels_
+        self.features = features
+        self.scores = scores
+        self._yearly_loader = yearly_loader
+        self._yearly = None
+
+    @property
+    def yearly(self) -> pd.DataFrame:
+        """Yearly averages (years x cities), loaded on first use."""
+        if self._yearly is None:
+            self._yearly = self._yearly_loader()
+        return self._yearly
+
+    @property
+    def cluster_centers_(self) -> np.ndarray:
+        yearly = self.yearly.to_numpy()
+        return np.vstack([np.nanmean(yearly[:, self.labels_ == i], axis=1) for i in range(self.k)])
+
+    def assignments(self) -> pd.DataFrame:
+        """City -> 1-based cluster number, as shown in the plots."""
+        return pd.DataFrame({'city': self.features.index, 'cluster': self.labels_ + 1})
+
+
+def climate_features(panel: CityPanel) -> pd.DataFrame:
+    """The feature matrix described in ClusteringAlgorithm.climate_features, for every row of panel."""
+    monthly = panel.monthly_means()
+    valid = ~np.isnan(panel.values)
+    values = np.where(valid, panel.values, 0)
+    days = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        annual = values.sum(axis=1, dtype=np.float64) / days
+        wet_frequency = (values >= WET_DAY_INCHES).sum(axis=1) / days
+    has_month = ~np.isnan(monthly).all(axis=1)
+    amplitude = np.full(len(panel), np.nan)
+    amplitude[has_month] = np.nanmax(monthly[has_month], axis=1) - np.nanmin(monthly[has_month], axis=1)
+
+    columns = {f'month_{m:02d}': monthly[:, m - 1] for m in range(1, 13)}
+    columns.update({'annual_mean': annual, 'seasonal_amplitude': amplitude, 'wet_day_frequency': wet_frequency})
+    return pd.DataFrame(columns, index=pd.Index(panel.cities, name='city'))
+
+
+def _fit_kmeans(job):
+    """Fit one candidate k for run_feature_clustering; runs in a worker process in parallel mode."""
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+
+    X, k, minibatch = job
+    if minibatch:
+        model = MiniBatchKMeans(n_clusters=k, random_state=42, n_init='auto', batch_size=1024)
+    else:
+        model = KMeans(n_clusters=k, random_state=42, n_init='auto')
+    labels = model.fit_predict(X)
+    score = np.nan
+    if 1 < len(np.unique(labels)) < len(X):
+        score = float(silhouette_score(X, labels, sample_size=min(len(X), SILHOUETTE_SAMPLE), random_state=42))
+    return k, model, score
+
 # ----------------------------------
 # Forecasting Algorithm Component
 # ----------------------------------
+# Prophet settings; part of the model cache key, so changing them refits
+PROPHET_PARAMS = {'daily_seasonality': True}
+
 class ForecastingAlgorithm:
     @staticmethod
-    def predict_with_prophet(df: pd.DataFrame, target_column: str, city: str, forecast_days: int = 30) -> pd.DataFrame:
+    def predict_with_prophet(df: pd.DataFrame, target_column: str, city: str, forecast_days: int = 30,
+                             cache: ProphetModelCache | None = None) -> pd.DataFrame:
         """
         Predict target_column for a specific city using Prophet.
 
@@ -59,6 +253,7 @@ class ForecastingAlgorithm:
             target_column (str): The column to predict (e.g., 'precipitation_sum').
             city (str): The city for which to forecast.
             forecast_days (int): The number of days to forecast.
+            cache (ProphetModelCache): Optional fitted-model cache; a hit skips model.fit.
 
         Returns:
             pd.DataFrame: Forecasted values with dates.
@@ -68,11 +263,22 @@ class ForecastingAlgorithm:
         
         df_prophet = city_df[['date', target_column]].rename(columns={'date': 'ds', target_column: 'y'})
         
-        model = Prophet(daily_seasonality=True)
-        model.fit(df_prophet)
+        model = None
+        if cache is not None:
+            cache_key = cache.key(city, target_column, df_prophet, PROPHET_PARAMS)
+            model = cache.get(cache_key)
+        if model is None:
+            from prophet import Prophet
+
+            model = Prophet(**PROPHET_PARAMS)
+            with span('prophet.fit', city=city):
+                model.fit(df_prophet)
+            if cache is not None:
+                cache.put(cache_key, model)
         
-        future = model.make_future_dataframe(periods=forecast_days)
-        forecast = model.predict(future)
+        with span('prophet.predict', city=city):
+            future = model.make_future_dataframe(periods=forecast_days)
+            forecast = model.predict(future)
         
         result = forecast[['ds', 'yhat']].tail(forecast_days).rename(
             columns={'ds': 'date', 'yhat': f'predicted_{target_column}'}
@@ -81,20 +287,217 @@ class ForecastingAlgorithm:
         return result
 
     @staticmethod
-    def predict_all_cities(df: pd.DataFrame, target_column: str, forecast_days: int = 30) -> pd.DataFrame:
+    def predict_with_climatology(df: pd.DataFrame, target_column: str, city: str, forecast_days: int = 30) -> pd.DataFrame:
+        """
+        Predict target_column for a specific city from its day-of-year climatology plus a linear trend.
+
+        A fast alternative to predict_with_prophet that returns the same frame shape.
+
+        Returns:
+            pd.DataFrame: Forecasted values with dates.
+        """
+        forecast, errors = _climatology_forecast(df[df['city'] == city], target_column, forecast_days)
+        if errors or forecast.empty:
+            raise ValueError(errors[0]['error'] if errors else f"No data for {city}.")
+        return forecast.drop(columns='city')
+
+    @staticmethod
+    @traced('predict_all_cities')
+    def predict_all_cities(df: pd.DataFrame | CityPanel, target_column: str, forecast_days: int = 30,
+                           max_workers: int | None = 1, cache: ProphetModelCache | None = None,
+                           backend: str = 'prophet', progress=None, mp_context=None) -> pd.DataFrame:
         """
-        Apply Prophet forecast to all unique cities present in the DataFrame.
+        Apply a forecast to all unique cities present in the DataFrame.
+
+        Parameters:
+            df (pd.DataFrame | CityPanel): Long frame with 'city', 'date' and target_column,
+                or a CityPanel whose values are used as target_column.
+            max_workers (int): Worker processes used to fit cities in parallel;
+                1 fits them serially, None uses one per CPU (Prophet backend only).
+            cache (ProphetModelCache): Optional fitted-model cache shared by all cities.
+            backend (str): 'prophet' fits one Prophet model per city; 'climatology'
+                forecasts every city at once from day-of-year means plus a linear trend.
+            progress (callable): Optional progress(done, total, city) called after each city
+                finishes. An exception raised by it stops the remaining cities.
+            mp_context: Optional multiprocessing context for the worker processes, e.g.
+                multiprocessing.get_context('spawn') when called from a GUI thread.
 
         Returns:
-            pd.DataFrame: Concatenated forecast results for all cities.
+            pd.DataFrame: Concatenated forecast results for all cities, in the order the
+            cities first appear. A city whose fit fails is left out and recorded in
+            result.attrs['errors'] as {'city': ..., 'error': ...} instead.
         """
+        if backend == 'climatology':
+            if isinstance(df, CityPanel):
+                combined, errors = _climatology_from_grid(df.values.astype(np.float64), df.cities, df.first_day,
+                                                          df.last_dates(), target_column, forecast_days)
+            else:
+                combined, errors = _climatology_forecast(df, target_column, forecast_days)
+            combined.attrs['errors'] = errors
+            if progress is not None:
+                total = len(df) if isinstance(df, CityPanel) else df['city'].nunique()
+                progress(total, total, None)
+            return combined
+        if backend != 'prophet':
+            raise ValueError(f"Unknown forecasting backend '{backend}'.")
+        if isinstance(df, CityPanel):
+            # Prophet fits one frame per city anyway
+            df = df.to_long_frame().rename(columns={df.variable: target_column})
+
+        # partition once instead of filtering the whole frame for every city
+        jobs = [(city, city_df, target_column, forecast_days, cache)
+                for city, city_df in df.groupby('city', sort=False)]
+
+        outcomes = []
+        if max_workers == 1 or len(jobs) <= 1:
+            for job in jobs:
+                outcomes.append(_forecast_city(job))
+                if progress is not None:
+                    progress(len(outcomes), len(jobs), job[0])
+        else:
+            executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context)
+            try:
+                for outcome in executor.map(_forecast_city, jobs):
+                    outcomes.append(outcome)
+                    if progress is not None:
+                        progress(len(outcomes), len(jobs), outcome[0])
+            finally:
+                # when progress() stops the run, drop the cities that have not started
+                executor.shutdown(wait=True, cancel_futures=True)
+            if cache is not None:
+                # workers update their own copy of the cache counters
+                for *_, counts in outcomes:
+                    cache.add_counters(counts)
+
         results = []
-        for city in df['city'].unique():
-            forecast = ForecastingAlgorithm.predict_with_prophet(df, target_column, city, forecast_days)
-            forecast['city'] = city
-            results.append(forecast)
-        
-        return pd.concat(results, ignore_index=True)
+        errors = []
+        for city, forecast, error, _ in outcomes:
+            if error is None:
+                forecast['city'] = city
+                results.append(forecast)
+            else:
+                errors.append({'city': city, 'error': error})
+
+        if results:
+            combined = pd.concat(results, ignore_index=True)
+        else:
+            combined = pd.DataFrame(columns=['date', f'predicted_{target_column}', 'city'])
+        combined.attrs['errors'] = errors
+        return combined
+
+
+def _climatology_forecast(df, target_column, forecast_days, smoothing_days=15):
+    """
+    Day-of-year climatology plus a linear trend, computed for every city in one NumPy pass.
+
+    Each city's history is laid out on a shared cities x days grid. Means per day of
+    year are smoothed with a circular moving average, a least-squares trend is fitted
+    to what is left, and both are extrapolated forecast_days past each city's last date.
+
+    Returns:
+        tuple: (DataFrame with date, predicted_<target>, city columns; list of error records)
+    """
+    df = df[df['city'].notna()]
+    codes, cities = pd.factorize(df['city'], sort=False)
+    dates = pd.to_datetime(df['date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    day = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    values = df[target_column].to_numpy(dtype=np.float64)
+
+    if len(cities) == 0:
+        return pd.DataFrame(columns=['date', f'predicted_{target_column}', 'city']), []
+
+    first_day = day.min()
+    n_days = int(day.max() - first_day) + 1
+    grid = np.full((len(cities), n_days), np.nan)
+    grid[codes, day - first_day] = values
+    last_timestamp = dates.groupby(codes).max().reindex(range(len(cities))).to_numpy()
+    return _climatology_from_grid(grid, cities, first_day, last_timestamp, target_column, forecast_days,
+                                  smoothing_days)
+
+
+def _climatology_from_grid(grid, cities, first_day, last_timestamp, target_column, forecast_days, smoothing_days=15):
+    """The climatology forecast for a cities x days grid starting at day number first_day."""
+    prediction_column = f'predicted_{target_column}'
+    cities = pd.Index(cities)
+    if len(cities) == 0:
+        return pd.DataFrame(columns=['date', prediction_column, 'city']), []
+    n_days = grid.shape[1]
+    valid = ~np.isnan(grid)
+    has_data = valid.any(axis=1)
+
+    # mean per day of year on a 366-day calendar, smoothed across the year boundary
+    doy = _leap_day_of_year(first_day + np.arange(n_days + forecast_days))
+    slots = (np.arange(len(cities))[:, None] * 366 + doy[None, :n_days]).ravel()
+    sums = np.bincount(slots, weights=np.where(valid, grid, 0.0).ravel(), minlength=len(cities) * 366)
+    counts = np.bincount(slots, weights=valid.ravel(), minlength=len(cities) * 366)
+    sums = _circular_moving_sum(sums.reshape(len(cities), 366), smoothing_days)
+    counts = _circular_moving_sum(counts.reshape(len(cities), 366), smoothing_days)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        climatology = sums / counts
+
+        # least-squares trend of the anomalies against day number
+        residual = grid - climatology[:, doy[:n_days]]
+        used = ~np.isnan(residual)
+        t = np.arange(n_days, dtype=np.float64)
+        n = used.sum(axis=1)
+        t_mean = np.where(used, t, 0.0).sum(axis=1) / n
+        r_mean = np.where(used, residual, 0.0).sum(axis=1) / n
+        dt = np.where(used, t - t_mean[:, None], 0.0)
+        slope = (dt * np.where(used, residual - r_mean[:, None], 0.0)).sum(axis=1) / (dt * dt).sum(axis=1)
+    slope = np.where(np.isfinite(slope), slope, 0.0)
+    intercept = np.where(np.isfinite(r_mean), r_mean - slope * t_mean, 0.0)
+
+    last_index = n_days - 1 - np.argmax(valid[:, ::-1], axis=1)
+    future_index = last_index[:, None] + np.arange(1, forecast_days + 1)
+    rows = np.arange(len(cities))[:, None]
+    predictions = climatology[rows, doy[future_index]] + intercept[:, None] + slope[:, None] * future_index
+
+    # same future dates as Prophet: the last timestamp plus 1..forecast_days days
+    future_dates = last_timestamp[:, None] + np.arange(1, forecast_days + 1) * np.timedelta64(1, 'D')
+
+    keep = np.flatnonzero(has_data)
+    result = pd.DataFrame({
+        'date': future_dates[keep].ravel(),
+        prediction_column: predictions[keep].ravel(),
+        'city': np.repeat(np.asarray(cities, dtype=object)[keep], forecast_days),
+    })
+    errors = [{'city': city, 'error': f"No {target_column} values to forecast from."}
+              for city in cities[~has_data]]
+    return result, errors
+
+
+def _leap_day_of_year(days):
+    """0-based day of year on a 366-day calendar so dates after February line up across years."""
+    days = np.asarray(days).astype('datetime64[D]')
+    years = days.astype('datetime64[Y]')
+    day_of_year = (days - years).astype(np.int64)
+    year = years.astype(np.int64) + 1970
+    is_leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    return day_of_year + ((~is_leap) & (day_of_year >= 59))
+
+
+def _circular_moving_sum(a, width):
+    """Sum over a centred window of width columns, wrapping around the last axis."""
+    half = width // 2
+    padded = np.concatenate([a[:, -half:], a, a[:, :half]], axis=1) if half else a
+    cumulative = np.concatenate([np.zeros((a.shape[0], 1)), np.cumsum(padded, axis=1)], axis=1)
+    return cumulative[:, 2 * half + 1:] - cumulative[:, :-(2 * half + 1)]
+
+
+def _forecast_city(job):
+    """Fit one city for predict_all_cities; runs in a worker process in parallel mode."""
+    city, city_df, target_column, forecast_days, cache = job
+    before = cache.counters() if cache is not None else {}
+    try:
+        with span('forecast.city', city=city):
+            forecast = ForecastingAlgorithm.predict_with_prophet(city_df, target_column, city, forecast_days, cache)
+        error = None
+    except Exception as e:
+        forecast, error = None, f"{type(e).__name__}: {e}"
+    counts = {name: value - before[name] for name, value in cache.counters().items()} if cache is not None else {}
+    return city, forecast, error, counts
 
 # -------------------------------
 # Anomaly Detection Component
@@ -107,25 +510,253 @@ class AnomalyDetector:
         self.window_size = window_size
         self.threshold = threshold
 
-    def detect(self, time_series: pd.Series | np.ndarray) -> np.ndarray:
+    @traced('anomaly.detect')
+    def detect(self, time_series: pd.Series | np.ndarray | CityPanel) -> np.ndarray:
         """
         Detects anomalies using a rolling window.
 
+        A 2-D cities x days array (or a CityPanel) is scored row by row in a single
+        vectorized pass, so several cities can be checked with one call.
+
+        Returns:
+            np.ndarray: Boolean array marking anomalies, same shape as the input.
+        """
+        if isinstance(time_series, CityPanel):
+            values = time_series.values.astype(np.float64)
+        elif isinstance(time_series, pd.Series):
+            values = time_series.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            values = np.asarray(time_series, dtype=np.float64)
+        if values.ndim not in (1, 2):
+            raise ValueError("time_series must be a 1-D series or a 2-D cities x days array.")
+
+        anomalies = _rolling_zscore_anomalies(np.atleast_2d(values), self.window_size, self.threshold)
+        return anomalies.reshape(values.shape)
+
+
+class StreamingAnomalyDetector:
+    """
+    Online companion to AnomalyDetector that flags values as they arrive.
+
+    The last window_size values live in a ring buffer with running sums, so each
+    update is O(1). Replaying a full series gives the same flags as
+    AnomalyDetector.detect, and the state can be checkpointed with state_dict().
+    """
+    def __init__(self, window_size: int = 30, threshold: float = 3.0):
+        self.window_size = window_size
+        self.threshold = threshold
+        self._buffer = np.full(window_size, np.nan)
+        self._pos = 0            # ring slot holding the oldest value
+        self._seen = 0           # observations pushed so far
+        self._count = 0          # non-NaN values in the buffer
+        self._centre = 0.0       # running sums are kept relative to this value
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._since_resync = 0
+        self._last_value = np.nan
+        self._last_valid_pos = -1
+        self._run_start = 0      # position where the current run of equal values began
+
+    def update(self, value: float) -> bool:
+        """
+        Score one new observation against the current window, then add it.
+
+        Returns:
+            bool: True if the value is an anomaly.
+        """
+        value = float(value)
+        is_anomaly = False
+        if self._seen >= self.window_size and not np.isnan(value):
+            is_anomaly = self._score(value)
+        self._push(value)
+        return is_anomaly
+
+    def update_many(self, values: np.ndarray) -> np.ndarray:
+        """
+        Score and add a block of observations in one vectorized pass.
+
         Returns:
-            np.ndarray: Boolean array marking anomalies.
-        """
-        # Convert to pandas Series if necessary
-        if not isinstance(time_series, pd.Series):
-            time_series = pd.Series(time_series)
-
-        anomalies = np.full(len(time_series), False)
-        for i in range(self.window_size, len(time_series)):
-            window = time_series.iloc[i - self.window_size:i]
-            mean = window.mean()
-            std = window.std()
-            if std == 0 or pd.isna(std):
-                std = 1e-10
-            z_score = abs(time_series.iloc[i] - mean) / std
-            anomalies[i] = z_score > self.threshold
+            np.ndarray: Boolean array marking anomalies in values.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        history = self._window_values()
+        combined = np.concatenate([history, values])
+        anomalies = _rolling_zscore_anomalies(combined[None, :], self.window_size, self.threshold)[0]
+        self._load_window(combined, self._seen + len(values))
+        return anomalies[len(history):]
+
+    def state_dict(self) -> dict:
+        """Return the detector state as a JSON-serializable dict."""
+        return {
+            'window_size': self.window_size,
+            'threshold': self.threshold,
+            'buffer': self._buffer.tolist(),
+            'pos': int(self._pos),
+            'seen': int(self._seen),
+            'count': int(self._count),
+            'centre': float(self._centre),
+            'sum': float(self._sum),
+            'sum_sq': float(self._sum_sq),
+            'since_resync': int(self._since_resync),
+            'last_value': float(self._last_value),
+            'last_valid_pos': int(self._last_valid_pos),
+            'run_start': int(self._run_start),
+        }
+
+    @classmethod
+    def from_state_dict(cls, state: dict) -> 'StreamingAnomalyDetector':
+        """Rebuild a detector from state_dict() output, e.g. after json.load."""
+        detector = cls(window_size=state['window_size'], threshold=state['threshold'])
+        detector._buffer = np.array(state['buffer'], dtype=np.float64)
+        if len(detector._buffer) != detector.window_size:
+            raise ValueError("Buffer length does not match window_size.")
+        for name in ('pos', 'seen', 'count', 'since_resync', 'last_valid_pos', 'run_start'):
+            setattr(detector, f'_{name}', int(state[name]))
+        for name in ('centre', 'sum', 'sum_sq', 'last_value'):
+            setattr(detector, f'_{name}', float(state[name]))
+        return detector
+
+    def _score(self, value):
+        if self._count == 0:
+            return False
+        mean = self._sum / self._count
+        std = 0.0
+        if self._count >= 2:
+            std = np.sqrt(max((self._sum_sq - self._sum * mean) / (self._count - 1), 0.0))
+        # same zero-std fallback as detect(), including windows of identical values
+        if std == 0 or self._run_start <= self._seen - self.window_size:
+            std = 1e-10
+        return abs(value - self._centre - mean) / std > self.threshold
+
+    def _push(self, value):
+        oldest = self._buffer[self._pos]
+        if not np.isnan(oldest):
+            self._count -= 1
+            self._sum -= oldest - self._centre
+            self._sum_sq -= (oldest - self._centre) ** 2
+        if not np.isnan(value):
+            self._count += 1
+            self._sum += value - self._centre
+            self._sum_sq += (value - self._centre) ** 2
+            if self._last_valid_pos >= 0 and value != self._last_value:
+                self._run_start = self._last_valid_pos + 1
+            self._last_value = value
+            self._last_valid_pos = self._seen
+        self._buffer[self._pos] = value
+        self._pos = (self._pos + 1) % self.window_size
+        self._seen += 1
+        self._since_resync += 1
+        # recompute the sums once per window so rounding error cannot accumulate
+        if self._since_resync >= self.window_size:
+            self._resync()
+
+    def _resync(self):
+        valid = self._buffer[~np.isnan(self._buffer)]
+        self._count = len(valid)
+        self._centre = float(valid.mean()) if len(valid) else 0.0
+        shifted = valid - self._centre
+        self._sum = float(shifted.sum())
+        self._sum_sq = float((shifted * shifted).sum())
+        self._since_resync = 0
+
+    def _window_values(self):
+        """Buffered values in arrival order (fewer than window_size early on)."""
+        ordered = np.roll(self._buffer, -self._pos)
+        return ordered[self.window_size - min(self._seen, self.window_size):]
+
+    def _load_window(self, values, seen):
+        """Reset the state from the most recent values of a series of total length seen."""
+        tail = values[-self.window_size:]
+        self._buffer = np.full(self.window_size, np.nan)
+        self._buffer[self.window_size - len(tail):] = tail
+        self._pos = 0
+        self._seen = seen
+        self._resync()
+
+        valid_idx = np.flatnonzero(~np.isnan(values))
+        if len(valid_idx) == 0:
+            return
+        offset = seen - len(values)
+        last = values[valid_idx[-1]]
+        differing = valid_idx[values[valid_idx] != last]
+        new_run_start = offset + differing[-1] + 1 if len(differing) else None
+        if new_run_start is not None:
+            self._run_start = new_run_start
+        elif not np.isnan(self._last_value) and last != self._last_value:
+            self._run_start = self._last_valid_pos + 1
+        self._last_value = float(last)
+        self._last_valid_pos = int(offset + valid_idx[-1])
+
+
+# windows whose variance is below this fraction of the running sum of squares are recomputed
+_RUNNING_SUM_RTOL = 1e-8
 
+
+def _rolling_zscore_anomalies(values: np.ndarray, window: int, threshold: float) -> np.ndarray:
+    """
+    Rolling Z-score for every row of a 2-D array using cumulative sums, O(n) per row.
+
+    Each point i is scored against values[i - window:i] exactly like the original
+    per-day loop: NaNs are skipped, the sample std (ddof=1) is used and a window
+    with zero or undefined std falls back to 1e-10.
+    """
+    n_series, n = values.shape
+    anomalies = np.zeros((n_series, n), dtype=bool)
+    if n <= window:
         return anomalies
+
+    valid = ~np.isnan(values)
+    # Centre each row first so the running sums stay small and precise
+    valid_per_row = valid.sum(axis=1)
+    centre = np.nansum(values, axis=1) / np.maximum(valid_per_row, 1)
+    shifted = np.where(valid, values - centre[:, None], 0.0)
+
+    def running_sums(a):
+        cumulative = np.zeros((n_series, n + 1), dtype=a.dtype)
+        np.cumsum(a, axis=1, out=cumulative[:, 1:])
+        return cumulative
+
+    def window_sums(cumulative):
+        return cumulative[:, window:n] - cumulative[:, :n - window]
+
+    count = window_sums(running_sums(valid.astype(np.int64)))
+    total = window_sums(running_sums(shifted))
+    cumulative_squares = running_sums(shifted * shifted)
+    squares = window_sums(cumulative_squares)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        deviation = squares - total * mean
+        # A difference of running sums carries rounding error in proportion to everything
+        # summed before it, so after a change of scale (1e6 then 0.1) a window's variance
+        # can drown in it. Those windows get recomputed directly, the way the loop does.
+        imprecise = (count >= 2) & (deviation < cumulative_squares[:, window:n] * _RUNNING_SUM_RTOL)
+        var = deviation / (count - 1)
+        std = np.sqrt(np.maximum(var, 0.0))
+        rows, cols = np.nonzero(imprecise)
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=1)[rows, cols]
+        std[rows, cols] = np.nanstd(windows, axis=1, ddof=1)
+        std[(count < 2) | (std == 0) | _constant_windows(values, valid, window)] = 1e-10
+        z_score = np.abs(shifted[:, window:] - mean) / std
+        z_score[rows, cols] = np.abs(values[rows, cols + window] - np.nanmean(windows, axis=1)) / std[rows, cols]
+
+    anomalies[:, window:] = valid[:, window:] & (z_score > threshold)
+    return anomalies
+
+
+def _constant_windows(values: np.ndarray, valid: np.ndarray, window: int) -> np.ndarray:
+    """
+    Flag windows whose non-NaN values are all identical (true std of exactly 0).
+
+    Running sums can leave a tiny residual variance for such windows, so they are
+    found separately by tracking where each run of equal values starts.
+    """
+    n_series, n = values.shape
+    idx = np.arange(n)
+    last_valid = np.maximum.accumulate(np.where(valid, idx, -1), axis=1)
+    prev_valid = np.concatenate([np.full((n_series, 1), -1), last_valid[:, :-1]], axis=1)
+    prev_value = np.take_along_axis(values, np.maximum(prev_valid, 0), axis=1)
+    changed = valid & (prev_valid >= 0) & (values != prev_value)
+    run_start = np.maximum.accumulate(np.where(changed, prev_valid + 1, 0), axis=1)
+    # window [i - window, i) is constant when the run covering i - 1 began at or before i - window
+    return run_start[:, window - 1:n - 1] <= idx[:n - window]
@@ -0,0 +1,531 @@
+# city_store.py
+import io
+import json
+import os
+import shutil
+import sys
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from tracing import span
+
+# Columnar binary layout for one city:
+#   8-byte magic | uint32 header length | JSON header | columns, each 64-byte aligned
+# The header lists every column with its dtype and byte offset so columns can be
+# memory-mapped individually. Dates are stored as int32 day numbers since
+# 1970-01-01 plus one shared time-of-day offset in seconds (all daily rows share it).
+# Hourly files store int32 hour numbers instead (header 'time_column': 'hour').
+# Rows are in time order (header 'sorted': true), so the time column doubles as the
+# index for range reads: a binary search over the memory-mapped column finds the
+# rows of a date range and only those pages of the value columns are read.
+MAGIC = b'CITYCOL1'
+BINARY_SUFFIX = '.cbin'
+TIME_UNITS = {'day': 86400, 'hour': 3600}  # time column name -> seconds per unit
+_ALIGN = 64
+_PREFIX = len(MAGIC) + 4
+_COPY_CHUNK = 1024 * 1024
+
+
+def binary_path_for(csv_path: str) -> str:
+    """Path of the binary file that sits alongside a city CSV."""
+    return os.path.splitext(csv_path)[0] + BINARY_SUFFIX
+
+
+def write_city_binary(df: pd.DataFrame, path: str, time_column: str = 'day') -> str:
+    """
+    Write a city frame (date + numeric columns) in the columnar binary format.
+
+    Dates become int32 day numbers (hour numbers with time_column='hour') and every
+    other column is stored as float32. The file is written to a temporary name and
+    moved into place atomically.
+
+    Returns:
+        str: The path written.
+    """
+    time_values, time_offset = _time_numbers(df['date'], time_column)
+    columns = {time_column: time_values}
+    for name in df.columns:
+        if name != 'date':
+            columns[name] = df[name].to_numpy(dtype=np.float32)
+
+    header, encoded = _encode_header(len(df), time_offset, time_column,
+                                     [(name, values.dtype.str, values.nbytes) for name, values in columns.items()],
+                                     bool(np.all(time_values[1:] > time_values[:-1])))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        _write_prefix(f, encoded)
+        for column, values in zip(header['columns'], columns.values()):
+            f.write(b'\0' * (column['offset'] - f.tell()))
+            f.write(values.tobytes())
+    os.replace(tmp_path, path)
+    return path
+
+
+class CityBinaryWriter:
+    """
+    Writes a binary city file a chunk of rows at a time, for data too long to hold in memory.
+
+    Each column is appended to its own spool file next to path; close() writes the
+    header and copies the spools into place, so memory use is one chunk however many
+    rows are written. The result is identical to write_city_binary on the whole frame.
+    """
+    def __init__(self, path: str, columns: list, time_column: str = 'day'):
+        self.path = path
+        self.columns = list(columns)
+        self.time_column = time_column
+        self.rows = 0
+        self.time_offset = None
+        self.sorted = True
+        self._last_time = None
+        names = [time_column] + self.columns
+        self._spool_paths = {name: f"{path}.{i}.spool" for i, name in enumerate(names)}
+        self._spools = {name: open(spool_path, 'wb') for name, spool_path in self._spool_paths.items()}
+
+    def append(self, df: pd.DataFrame) -> None:
+        """Append rows with 'date' and every column given to the constructor."""
+        if df.empty:
+            return
+        time_values, time_offset = _time_numbers(df['date'], self.time_column)
+        if self.time_offset is not None and time_offset != self.time_offset:
+            raise ValueError("All rows must share the same time offset to be stored as time numbers.")
+        self.time_offset = time_offset
+        previous = time_values[:1] if self._last_time is None else np.r_[self._last_time, time_values[:1]]
+        self.sorted &= bool(np.all(time_values[1:] > time_values[:-1]) and np.all(previous[1:] > previous[:-1]))
+        self._last_time = time_values[-1]
+        self._spools[self.time_column].write(time_values.tobytes())
+        for name in self.columns:
+            self._spools[name].write(df[name].to_numpy(dtype=np.float32).tobytes())
+        self.rows += len(df)
+
+    def close(self) -> str:
+        """Assemble the file (atomically) and remove the spools. Returns the path."""
+        for spool in self._spools.values():
+            spool.close()
+        specs = [(name, np.dtype(np.int32 if name == self.time_column else np.float32).str,
+                  os.path.getsize(spool_path)) for name, spool_path in self._spool_paths.items()]
+        header, encoded = _encode_header(self.rows, self.time_offset or 0, self.time_column, specs, self.sorted)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            _write_prefix(f, encoded)
+            for column in header['columns']:
+                f.write(b'\0' * (column['offset'] - f.tell()))
+                with open(self._spool_paths[column['name']], 'rb') as spool:
+                    shutil.copyfileobj(spool, f, _COPY_CHUNK)
+        os.replace(tmp_path, self.path)
+        self._remove_spools()
+        return self.path
+
+    def abort(self) -> None:
+        for spool in self._spools.values():
+            spool.close()
+        self._remove_spools()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _remove_spools(self):
+        for spool_path in self._spool_paths.values():
+            try:
+                os.remove(spool_path)
+            except FileNotFoundError:
+                pass
+
+
+class CityCsvWriter:
+    """
+    Appends chunks of a city frame to a CSV, written under a temporary name and moved
+    into place by close() so readers never see a partial file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, 'w', newline='')
+        self._header = True
+
+    def append(self, df: pd.DataFrame) -> None:
+        if df.empty:
+            return
+        df.to_csv(self._file, index=False, header=self._header)
+        self._header = False
+        self.rows += len(df)
+
+    def close(self) -> str:
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def _time_numbers(dates, time_column):
+    # int32 day or hour numbers since 1970-01-01 plus the one offset in seconds they all share
+    unit = TIME_UNITS[time_column]
+    seconds = pd.to_datetime(dates, utc=True).to_numpy(dtype='datetime64[s]').astype(np.int64)
+    numbers = seconds // unit
+    time_offsets = np.unique(seconds - numbers * unit)
+    if len(time_offsets) > 1:
+        raise ValueError(f"All rows must share the same time offset to be stored as {time_column} numbers.")
+    return numbers.astype(np.int32), int(time_offsets[0]) if len(time_offsets) else 0
+
+
+def _encode_header(rows, time_offset, time_column, specs, is_sorted):
+    # specs: (name, dtype str, nbytes) per column, time column first
+    header = {'rows': rows, 'time_offset': time_offset, 'sorted': is_sorted, 'columns': []}
+    if time_column != 'day':
+        header['time_column'] = time_column  # files without the key are daily
+    # header size depends on the offsets it records, so iterate until it settles
+    data_start = 0
+    while True:
+        header['columns'] = []
+        offset = data_start
+        for name, dtype, nbytes in specs:
+            header['columns'].append({'name': name, 'dtype': dtype, 'offset': offset})
+            offset = _aligned(offset + nbytes)
+        encoded = json.dumps(header).encode('utf-8')
+        needed = _aligned(_PREFIX + len(encoded))
+        if needed == data_start:
+            return header, encoded
+        data_start = needed
+
+
+def _write_prefix(f, encoded):
+    f.write(MAGIC)
+    f.write(len(encoded).to_bytes(4, 'little'))
+    f.write(encoded)
+
+
+def read_header(path: str) -> dict:
+    """Read the JSON header of a binary city file."""
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a binary city file.")
+        length = int.from_bytes(f.read(4), 'little')
+        return json.loads(f.read(length))
+
+
+def open_city_binary(path: str, columns: list | None = None) -> tuple[dict, dict]:
+    """
+    Memory-map the requested columns of a binary city file without copying.
+
+    Returns:
+        tuple: (header dict, {column name: read-only np.memmap}).
+    """
+    header = read_header(path)
+    available = {c['name']: c for c in header['columns']}
+    time_column = header.get('time_column', 'day')
+    wanted = list(available) if columns is None else [time_column] + [c for c in columns if c != time_column]
+    arrays = {}
+    for name in wanted:
+        if name not in available:
+            raise KeyError(f"Column '{name}' not found in {path}.")
+        column = available[name]
+        if header['rows'] == 0:
+            arrays[name] = np.empty(0, dtype=column['dtype'])
+        else:
+            arrays[name] = np.memmap(path, dtype=column['dtype'], mode='r',
+                                     offset=column['offset'], shape=(header['rows'],))
+    return header, arrays
+
+
+def read_city_binary(path: str, columns: list | None = None, start=None, end=None) -> pd.DataFrame:
+    """
+    Load a binary city file as a DataFrame shaped like the CSV read with parse_dates.
+
+    Parameters:
+        path (str): Binary city file.
+        columns (list): Value columns to load (default: all).
+        start, end: Optional inclusive date range (see day_number); only those rows are read.
+
+    Returns:
+        pd.DataFrame: 'date' (UTC timestamps) followed by the float64 value columns.
+    """
+    header, arrays = open_city_binary(path, columns)
+    time_column = header.get('time_column', 'day')
+    times = arrays.pop(time_column)
+    rows = _row_slice(header, times, start, end)
+    seconds = times[rows].astype(np.int64) * TIME_UNITS[time_column] + header['time_offset']
+    data = {'date': pd.to_datetime(seconds, unit='s', utc=True)}
+    # values are stored as float32 but come back as float64, the same dtypes as the CSV read
+    data.update({name: values[rows].astype(np.float64) for name, values in arrays.items()})
+    return pd.DataFrame(data)
+
+
+def load_city_frame(csv_path: str, columns: list | None = None, start=None, end=None) -> pd.DataFrame:
+    """
+    Load a city file, preferring the binary copy when it is at least as new as the CSV.
+
+    Falls back to pd.read_csv(parse_dates=['date']) so callers work either way. With
+    start/end (inclusive dates) only the rows in range are read: a binary search on
+    the time column of the binary copy, or on byte offsets of the CSV (both are in
+    date order as written by WeatherDataProcessor).
+    """
+    binary_path = binary_path_for(csv_path)
+    if os.path.exists(binary_path) and (
+            not os.path.exists(csv_path) or os.path.getmtime(binary_path) >= os.path.getmtime(csv_path)):
+        with span('load.cbin', file=os.path.basename(binary_path)):
+            return read_city_binary(binary_path, columns, start, end)
+    usecols = None if columns is None else ['date'] + [c for c in columns if c != 'date']
+    with span('load.csv', file=os.path.basename(csv_path)):
+        if start is None and end is None:
+            return pd.read_csv(csv_path, parse_dates=['date'], usecols=usecols)
+        with open(csv_path, 'rb') as f:
+            data = _csv_rows_in_range(f, start, end)
+        df = pd.read_csv(io.BytesIO(data), parse_dates=['date'], usecols=usecols)
+    if df.empty:
+        # no values to infer the dtypes from
+        df = df.astype({name: np.float64 for name in df.columns if name != 'date'})
+        df['date'] = pd.to_datetime(df['date'], utc=True)
+    return _filter_days(df, start, end)
+
+
+def _csv_rows_in_range(f, start, end):
+    # header plus the rows of a date-ordered city CSV whose UTC day is within start..end,
+    # found by bisecting byte offsets so only those rows are parsed
+    header = f.readline()
+    date_field = header.rstrip(b'\r\n').split(b',').index(b'date')
+    first_row = f.tell()
+    size = os.fstat(f.fileno()).st_size
+
+    def row_day(offset):
+        # day of the first row starting at or after offset, None past the last row
+        if offset > first_row:
+            f.seek(offset - 1)
+            f.readline()
+        else:
+            f.seek(first_row)
+        row_start = f.tell()
+        line = f.readline().rstrip(b'\r\n')
+        return row_start, day_number(line.split(b',')[date_field].decode()) if line else None
+
+    def first_offset(before):
+        # offset of the first row for which before(day) is false
+        lo, hi = first_row, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            day = row_day(mid)[1]
+            if day is not None and before(day):
+                lo = mid + 1
+            else:
+                hi = mid
+        return row_day(lo)[0]
+
+    begin = first_row if start is None else first_offset(lambda day: day < day_number(start))
+    stop = size if end is None else first_offset(lambda day: day <= day_number(end))
+    f.seek(begin)
+    return header + f.read(max(0, stop - begin))
+
+
+def _filter_days(df, start, end):
+    # rows of a loaded frame whose UTC day is within start..end
+    if start is None and end is None:
+        return df
+    days = pd.DatetimeIndex(df['date']).asi8 // (86400 * 10 ** 9)
+    keep = np.ones(len(df), dtype=bool)
+    if start is not None:
+        keep &= days >= day_number(start)
+    if end is not None:
+        keep &= days <= day_number(end)
+    return df[keep].reset_index(drop=True)
+
+
+def day_number(value) -> int:
+    """UTC day number since 1970-01-01 of a date, timestamp or date string (ints pass through)."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.tz_localize('UTC')
+    return int(timestamp.value // (86400 * 10**9))
+
+
+def _row_slice(header, times, start, end):
+    # rows whose UTC day is within start..end: a binary search on the sorted time column
+    if start is None and end is None:
+        return slice(None)
+    if not header.get('sorted', False):
+        header['sorted'] = bool(np.all(times[1:] > times[:-1]))  # files from before the flag existed
+        if not header['sorted']:
+            raise ValueError("Range reads need a binary city file in time order; rewrite it with write_city_binary.")
+    unit = TIME_UNITS[header.get('time_column', 'day')]
+    offset = header['time_offset']
+    lo, hi = 0, len(times)
+    if start is not None:
+        first = -(-(day_number(start) * 86400 - offset) // unit)  # first time number on or after start
+        lo = int(np.searchsorted(times, first, side='left'))
+    if end is not None:
+        last = ((day_number(end) + 1) * 86400 - 1 - offset) // unit  # last time number on end
+        hi = int(np.searchsorted(times, last, side='right'))
+    return slice(lo, max(lo, hi))
+
+
+class CityDataStore:
+    """
+    In-process cache of loaded city frames shared by the GUI, the CLI and the algorithms.
+
+    Entries are keyed by file and column selection and revalidated on every load against
+    the mtime and size of the CSV and its binary copy, so rewritten files are reloaded.
+    Total memory is bounded by max_bytes with least recently used eviction. Callers get a
+    shallow copy whose arrays are read-only: adding or replacing columns is fine, writing
+    into the cached values raises ValueError.
+    """
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (signature, frame, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def __call__(self, csv_path: str, columns: list | None = None, start=None, end=None) -> pd.DataFrame:
+        return self.load(csv_path, columns, start, end)
+
+    def load(self, csv_path: str, columns: list | None = None, start=None, end=None) -> pd.DataFrame:
+        """
+        Return the city frame for csv_path, reading the file only when it changed.
+
+        start/end (inclusive dates) limit the rows read, see load_city_frame; each
+        range is cached as its own entry, or cut from the full history when that is
+        already cached.
+        """
+        path = os.path.abspath(csv_path)
+        selection = None if columns is None else tuple(columns)
+        key = (path, selection, None if start is None else day_number(start), None if end is None else day_number(end))
+        signature = file_signature(csv_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1].copy(deep=False)
+                self._remove(key)
+                self.invalidations += 1
+            full = self._entries.get((path, selection, None, None)) if key[2:] != (None, None) else None
+            if full is not None and full[0] == signature:
+                self._entries.move_to_end((path, selection, None, None))
+                self.hits += 1
+                return _frozen_copy(_filter_days(full[1], start, end)).copy(deep=False)
+            self.misses += 1
+
+        # read outside the lock so other threads can keep hitting the cache meanwhile
+        frame = _frozen_copy(load_city_frame(csv_path, columns, start, end))
+        nbytes = int(frame.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (signature, frame, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return frame.copy(deep=False)
+
+    def invalidate(self, csv_path: str | None = None) -> int:
+        """Drop cached entries for csv_path, or everything when it is None. Returns the count."""
+        with self._lock:
+            if csv_path is None:
+                keys = list(self._entries)
+            else:
+                path = os.path.abspath(csv_path)
+                keys = [key for key in self._entries if key[0] == path]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self) -> dict:
+        """Hit/miss/invalidation/eviction counters plus current entries and bytes."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)[2]
+
+
+def file_signature(csv_path: str) -> tuple:
+    """(mtime_ns, size) of a city CSV and of its binary copy, None for a missing file."""
+    signature = []
+    for path in (csv_path, binary_path_for(csv_path)):
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _frozen_copy(frame):
+    # the frame rebuilt from arrays marked read-only, so shallow copies handed out cannot write into the cache
+    data = {}
+    for name in frame.columns:
+        column = frame[name]
+        if isinstance(column.dtype, pd.DatetimeTZDtype):
+            values = column.array.copy()
+            buffer = values.view('i8').base  # the datetime64 array behind the dates
+        else:
+            values = buffer = column.to_numpy(copy=True)
+        buffer.flags.writeable = False
+        data[name] = values
+    return pd.DataFrame(data, index=frame.index, copy=False)
+
+
+# the store shared by everything in this process
+default_store = CityDataStore()
+
+
+def convert_csv_dir(data_dir: str) -> list:
+    """Write a binary copy next to every daily and hourly city CSV in data_dir. Returns the files written."""
+    from locations import DATA_FILE_SUFFIX, HOURLY_FILE_SUFFIX  # locations imports this module
+
+    written = []
+    for file in sorted(os.listdir(data_dir)):
+        # hourly files store hour numbers, like CityBinaryWriter(time_column='hour'); not locations.csv
+        time_column = 'day' if file.endswith(DATA_FILE_SUFFIX) else 'hour' if file.endswith(HOURLY_FILE_SUFFIX) else None
+        if time_column is not None:
+            csv_path = os.path.join(data_dir, file)
+            df = pd.read_csv(csv_path, parse_dates=['date'])
+            written.append(write_city_binary(df, binary_path_for(csv_path), time_column))
+    return written
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), '..', 'data')
+    for path in convert_csv_dir(data_dir):
+        print(f"Wrote {path}")
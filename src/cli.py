@@ -0,0 +1,392 @@
+# cli.py
+"""
+Headless runner for the Climate Analyzer pipeline, for scheduled jobs on servers without a display.
+
+Examples:
+    python src/cli.py ingest --incremental
+    python src/cli.py cluster -k 3 --png
+    python src/cli.py run --stages ingest,cluster,forecast,anomaly --backend climatology
+    python src/cli.py similar Boston -n 3
+
+Every run writes its results to --output-dir plus run_summary.json with per-stage status
+and wall time. Exit status: 0 when every stage succeeded, 1 when any stage failed,
+2 for invalid arguments.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+import warnings
+import tracing
+
+# must be set before anything imports matplotlib.pyplot
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGE_ORDER = ['ingest', 'cluster', 'forecast', 'anomaly']
+
+
+class PipelineContext:
+    """Data shared by the stages of one run, so each city file is loaded only once."""
+
+    def __init__(self, data_dir, output_dir, output_format='json', png=False, locations=None, figures=False):
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.png = png
+        self.figures = figures
+        self.figure_tasks = []  # per-city/per-cluster charts, exported together after the last stage
+        self.full_history = False  # set when a later stage reads whole histories, see load()
+        from city_store import CityDataStore
+        from locations import LocationRegistry
+
+        self.store = CityDataStore()
+        if locations:
+            self.registry = LocationRegistry.load(locations, data_dir)
+        else:
+            self.registry = LocationRegistry.from_data_dir(data_dir)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def load(self, path, columns=None, start=None, end=None):
+        """Load a city file once per run (read-only; reloaded if the file changes)."""
+        if self.full_history and (start is not None or end is not None):
+            # the whole file is read anyway by a later stage: read it once, cut the range from it
+            self.store.load(path, columns)
+        return self.store.load(path, columns, start, end)
+
+    def city_files(self, cities=None):
+        """Map city names to their data files, limited to cities when given."""
+        available = self.registry.city_files()
+        if not cities:
+            return dict(sorted(available.items()))
+        missing = [c for c in cities if c not in available]
+        if missing:
+            raise FileNotFoundError(f"No data file for: {', '.join(missing)}")
+        return {city: available[city] for city in cities}
+
+    def write_table(self, df, name):
+        if self.output_format == 'parquet':
+            path = os.path.join(self.output_dir, f"{name}.parquet")
+            df.to_parquet(path, index=False)
+        else:
+            path = os.path.join(self.output_dir, f"{name}.json")
+            df.to_json(path, orient='records', date_format='iso', indent=2)
+        return path
+
+    def write_json(self, obj, name):
+        path = os.path.join(self.output_dir, f"{name}.json")
+        with open(path, 'w') as f:
+            json.dump(obj, f, indent=2, default=str)
+        return path
+
+    def figure_path(self, name):
+        return os.path.join(self.output_dir, f"{name}.png")
+
+
+def run_ingest(context, args):
+    from data_processor import WeatherDataProcessor
+
+    processor = WeatherDataProcessor(variables=args.variables)
+    registry = context.registry
+    selected = [registry[c] for c in args.cities] if args.cities else registry.locations
+    if args.hourly:
+        # one location at a time, chunk by chunk, so memory stays flat however long the history
+        saved = []
+        for city in selected:
+            saved += processor.stream_hourly_city(city, context.data_dir, variables=args.variables,
+                                                  chunk_days=args.chunk_days)
+        return [context.write_json({'files': saved}, 'ingest')]
+    saved = processor.process_and_save_concurrent(selected, context.data_dir, max_workers=args.workers or 4,
+                                                  incremental=args.incremental, batch_size=args.batch_size)
+    return [context.write_json({'files': saved}, 'ingest')]
+
+
+def run_cluster(context, args):
+    import pandas as pd
+    from algorithms import ClusteringAlgorithm
+    from visualizer import ClusteringVisualizer
+
+    algorithm = ClusteringAlgorithm(context.data_dir, loader=context.load, registry=context.registry)
+    selected = list(context.city_files(args.cities))
+    if args.features or args.k == 'auto':
+        result = algorithm.run_feature_clustering(selected, k=None if args.k == 'auto' else int(args.k),
+                                                  max_workers=args.workers)
+        yearly, kmeans, k = result.yearly, result, result.k
+        assignments = result.assignments()
+        extra = [context.write_table(result.features.reset_index(), 'cluster_features'),
+                 context.write_table(result.scores.reset_index(), 'cluster_scores')]
+    else:
+        k = int(args.k)
+        if k < 1 or k > len(selected):
+            raise ValueError("Number of clusters must be between 1 and the number of selected cities.")
+        yearly = algorithm.compute_yearly_averages(selected)
+        kmeans = algorithm.run_kmeans(yearly, k)
+        assignments = pd.DataFrame({'city': yearly.columns, 'cluster': kmeans.labels_ + 1})
+        extra = []
+    outputs = [
+        context.write_table(assignments, 'clusters'),
+        context.write_table(yearly.rename_axis('year').reset_index(), 'yearly_averages'),
+    ] + extra
+    if context.png:
+        fig = ClusteringVisualizer().plot(yearly, kmeans, k)
+        fig.savefig(context.figure_path('clustering'))
+        outputs.append(context.figure_path('clustering'))
+    if context.figures:
+        from figure_export import cluster_tasks
+
+        context.figure_tasks += cluster_tasks(yearly, kmeans)
+    return outputs
+
+
+def run_forecast(context, args):
+    import pandas as pd
+    from algorithms import ForecastingAlgorithm
+    from model_cache import ProphetModelCache
+    from visualizer import PredictionVisualizer
+
+    frames = []
+    for city, path in context.city_files(args.cities).items():
+        frames.append(context.load(path, ['precipitation_sum']).assign(city=city))
+    combined = pd.concat(frames, ignore_index=True)
+    cache = ProphetModelCache(os.path.join(context.output_dir, '.model_cache')) if args.backend == 'prophet' else None
+    forecast = ForecastingAlgorithm.predict_all_cities(combined, 'precipitation_sum', forecast_days=args.days,
+                                                       max_workers=args.workers, cache=cache, backend=args.backend)
+    outputs = [context.write_table(forecast, 'forecast')]
+    if forecast.attrs['errors']:
+        outputs.append(context.write_json(forecast.attrs['errors'], 'forecast_errors'))
+    if context.png and not forecast.empty:
+        PredictionVisualizer.plot_precipitation_forecast_all_cities(forecast, context.figure_path('forecast'))
+        outputs.append(context.figure_path('forecast'))
+    if context.figures and not forecast.empty:
+        from figure_export import city_forecast_tasks
+
+        context.figure_tasks += city_forecast_tasks(forecast)
+    if forecast.attrs['errors']:
+        raise RuntimeError(f"Forecast failed for {len(forecast.attrs['errors'])} city(s); see forecast_errors.json")
+    return outputs
+
+
+def run_anomaly(context, args):
+    import numpy as np
+    import pandas as pd
+    from algorithms import AnomalyDetector
+    from visualizer import AnomalyVisualizer
+
+    city_files = context.city_files(args.cities)
+    frames = {city: context.load(path, ['precipitation_sum']) for city, path in city_files.items()}
+    longest = max(len(df) for df in frames.values())
+    batch = np.full((len(frames), longest), np.nan)
+    for i, df in enumerate(frames.values()):
+        batch[i, :len(df)] = df['precipitation_sum'].to_numpy()
+    flags = AnomalyDetector(window_size=args.window, threshold=args.threshold).detect(batch)
+
+    anomalies = pd.concat([
+        df.loc[flags[i, :len(df)], ['date', 'precipitation_sum']].assign(city=city)
+        for i, (city, df) in enumerate(frames.items())
+    ], ignore_index=True)
+    outputs = [context.write_table(anomalies[['city', 'date', 'precipitation_sum']], 'anomalies')]
+    if context.png:
+        visualizer = AnomalyVisualizer(None, context.data_dir, loader=context.load, registry=context.registry,
+                                       downsample=None if args.downsample == 'none' else args.downsample)
+        visualizer.plot_anomalies(list(city_files.values()), args.window, args.threshold,
+                                  output_path=context.figure_path('anomalies'))
+        visualizer.plot_scatter_overlay(list(city_files.values()), output_path=context.figure_path('scatter_overlay'))
+        outputs += [context.figure_path('anomalies'), context.figure_path('scatter_overlay')]
+    if context.figures:
+        from figure_export import city_anomaly_task
+
+        downsample = None if args.downsample == 'none' else args.downsample
+        context.figure_tasks += [city_anomaly_task(city, df, flags[i, :len(df)], downsample)
+                                 for i, (city, df) in enumerate(frames.items())]
+    return outputs
+
+
+def run_similar(context, args):
+    import pandas as pd
+    from algorithms import ClusteringAlgorithm
+    from similarity import SimilarityIndex
+
+    algorithm = ClusteringAlgorithm(context.data_dir, loader=context.load, registry=context.registry)
+    cities = list(context.city_files(args.cities))
+    if args.city not in cities:
+        raise KeyError(f"No data file for: {args.city}")
+    index_path = args.index or os.path.join(context.output_dir, f"similarity_{args.profile}_{args.metric}.npz")
+    if os.path.exists(index_path):
+        index = SimilarityIndex.load(index_path)
+        if (index.metric, index.profile) != (args.metric, args.profile):
+            raise ValueError(f"{index_path} holds a {index.profile}/{index.metric} index.")
+        changes = index.sync(algorithm, cities)  # only changed or new cities are recomputed
+        print(f"Similarity index: {len(changes['updated'])} updated, {len(changes['removed'])} removed",
+              file=sys.stderr)
+    else:
+        index = SimilarityIndex.from_algorithm(algorithm, cities, args.metric, args.profile)
+    index.save(index_path)
+
+    neighbours = pd.DataFrame(index.nearest(args.city, args.top), columns=['city', 'distance'])
+    neighbours.insert(0, 'rank', range(1, len(neighbours) + 1))
+    for rank, city, distance in neighbours.itertuples(index=False):
+        print(f"{rank:3d}. {city:<30} {distance:.4f}")
+    return [context.write_table(neighbours, 'similar'), index_path]
+
+
+def run_figures(context, args):
+    """Export the charts queued by the other stages, skipping those already rendered from the same data."""
+    from figure_export import FigureExporter
+
+    exporter = FigureExporter(os.path.join(context.output_dir, 'figures'), max_workers=args.workers)
+    paths = exporter.export(context.figure_tasks)
+    print(f"Figures: {exporter.stats()}", file=sys.stderr)
+    return sorted(paths.values())
+
+
+STAGES = {
+    'ingest': run_ingest,
+    'cluster': run_cluster,
+    'forecast': run_forecast,
+    'anomaly': run_anomaly,
+    'similar': run_similar,
+    'figures': run_figures,  # added after the requested stages by --figures
+}
+FULL_HISTORY_STAGES = {'forecast', 'anomaly'}
+
+
+def run_stages(stage_names, context, args):
+    """Run stages in order, timing each one. Returns the summary written to run_summary.json."""
+    import matplotlib.pyplot as plt
+
+    summary = {'stages': [], 'status': 'ok'}
+    run_start = time.perf_counter()
+    if context.figures:
+        stage_names = list(stage_names) + ['figures']
+    context.full_history = any(name in FULL_HISTORY_STAGES for name in stage_names)
+    for name in stage_names:
+        start = time.perf_counter()
+        record = {'stage': name}
+        try:
+            with warnings.catch_warnings(), tracing.span(f'stage.{name}'):
+                warnings.filterwarnings('ignore', message='.*non-interactive.*')  # plt.show() under Agg
+                record['outputs'] = STAGES[name](context, args)
+            record['status'] = 'ok'
+        except Exception as e:
+            record['status'] = 'failed'
+            record['error'] = f"{type(e).__name__}: {e}"
+            summary['status'] = 'failed'
+            traceback.print_exc()
+        finally:
+            plt.close('all')
+        record['seconds'] = round(time.perf_counter() - start, 3)
+        summary['stages'].append(record)
+        print(f"[{name}] {record['status']} in {record['seconds']:.2f}s", file=sys.stderr)
+    summary['seconds'] = round(time.perf_counter() - run_start, 3)
+    summary['data_store'] = context.store.stats()
+    context.write_json(summary, 'run_summary')
+    return summary
+
+
+def _cluster_count(value):
+    if value == 'auto':
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer or 'auto', got {value!r}")
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--data-dir', default=os.path.join(ROOT_DIR, 'data'), help='directory with city data files')
+    common.add_argument('--locations', help='location registry CSV (default: locations.csv in --data-dir)')
+    common.add_argument('--output-dir', default='output', help='where results are written')
+    common.add_argument('--format', choices=['json', 'parquet'], default='json', help='format for tabular results')
+    common.add_argument('--png', action='store_true', help='also render charts as PNG files')
+    common.add_argument('--figures', action='store_true',
+                        help='export per-city and per-cluster charts to <output-dir>/figures (unchanged charts are reused)')
+    common.add_argument('--cities', type=lambda s: [c.strip() for c in s.split(',') if c.strip()],
+                        help='comma-separated city names (default: all)')
+    common.add_argument('--trace', action='store_true',
+                        help='record timing/CPU/memory spans to <output-dir>/trace.json and trace_summary.txt')
+    common.add_argument('--cprofile', type=lambda s: [n.strip() for n in s.split(',') if n.strip()], default=[],
+                        help='span names to run under cProfile with --trace, e.g. stage.forecast,kmeans')
+    common.add_argument('--workers', type=int, default=1, help='worker count for fetching/forecasting/figure export')
+
+    ingest = argparse.ArgumentParser(add_help=False)
+    ingest.add_argument('--incremental', action='store_true', help='fetch only days missing from stored files')
+    ingest.add_argument('--batch-size', type=int, default=5, help='locations per API request')
+    ingest.add_argument('--hourly', action='store_true',
+                        help='stream hourly data in chunks, writing <id>_hourly.csv and daily totals to <id>_daily.csv')
+    ingest.add_argument('--chunk-days', type=int, default=90, help='days of hourly data per request with --hourly')
+    ingest.add_argument('--variables', type=lambda s: [v.strip() for v in s.split(',') if v.strip()],
+                        help='comma-separated daily variables to fetch, e.g. precipitation_sum,temperature_2m_max '
+                             '(default: precipitation_sum); hourly ones with --hourly (default: precipitation)')
+
+    cluster = argparse.ArgumentParser(add_help=False)
+    cluster.add_argument('-k', type=_cluster_count, default=3, help="number of clusters, or 'auto' (implies --features)")
+    cluster.add_argument('--features', action='store_true',
+                         help='cluster on monthly climatology, seasonal amplitude and wet-day frequency')
+
+    forecast = argparse.ArgumentParser(add_help=False)
+    forecast.add_argument('--days', type=int, default=30, help='days to forecast')
+    forecast.add_argument('--backend', choices=['prophet', 'climatology'], default='prophet')
+
+    anomaly = argparse.ArgumentParser(add_help=False)
+    anomaly.add_argument('--window', type=int, default=30, help='anomaly detector window size')
+    anomaly.add_argument('--threshold', type=float, default=3.0, help='anomaly Z-score threshold')
+    anomaly.add_argument('--downsample', choices=['none', 'minmax', 'lttb'], default='minmax',
+                         help='reduce plotted points to about two per pixel (anomalies are always drawn)')
+
+    parser = argparse.ArgumentParser(prog='cli.py', description='Headless Climate Analyzer pipeline runner.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('ingest', parents=[common, ingest], help='fetch and store weather data')
+    commands.add_parser('cluster', parents=[common, cluster], help='K-Means clustering of yearly averages')
+    commands.add_parser('forecast', parents=[common, forecast], help='forecast precipitation per city')
+    commands.add_parser('anomaly', parents=[common, anomaly], help='flag anomalous precipitation days')
+    similar = commands.add_parser('similar', parents=[common], help='cities with the most similar precipitation regime')
+    similar.add_argument('city', help='city to compare against')
+    similar.add_argument('-n', '--top', type=int, default=5, help='number of neighbours')
+    similar.add_argument('--metric', choices=['correlation', 'euclidean'], default='correlation')
+    similar.add_argument('--profile', choices=['monthly', 'yearly'], default='monthly')
+    similar.add_argument('--index', help='saved similarity index (default: in --output-dir); updated in place')
+    run = commands.add_parser('run', parents=[common, ingest, cluster, forecast, anomaly],
+                              help='run several stages in one process, reusing loaded data')
+    run.add_argument('--stages', default='cluster,forecast,anomaly',
+                     help=f"comma-separated stages from {','.join(STAGE_ORDER)}")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        stage_names = [s.strip() for s in args.stages.split(',') if s.strip()]
+        unknown = [s for s in stage_names if s not in STAGE_ORDER]
+        if unknown or not stage_names:
+            parser.error(f"unknown stage(s): {', '.join(unknown) or '(none)'}")
+    else:
+        stage_names = [args.command]
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("--format parquet requires pyarrow")
+
+    context = PipelineContext(args.data_dir, args.output_dir, args.format, args.png, args.locations,
+                              args.figures)
+    if args.trace:
+        tracing.enable(profile=args.cprofile, profile_dir=args.output_dir)
+    else:
+        tracing.enable_from_env()
+    try:
+        summary = run_stages(stage_names, context, args)
+    finally:
+        if args.trace:
+            tracer = tracing.disable()
+            tracer.write(args.output_dir)
+            print(tracer.format_summary(), file=sys.stderr)
+    return 0 if summary['status'] == 'ok' else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,66 +1,406 @@
 import time
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import openmeteo_requests
 import requests_cache
 import pandas as pd
+from requests.adapters import HTTPAdapter
 from retry_requests import retry
 import os
 import numpy as np
+from contextlib import ExitStack
+from city_store import (CityBinaryWriter, CityCsvWriter, binary_path_for, day_number, load_city_frame,
+                        open_city_binary, write_city_binary)
+from locations import DATA_FILE_SUFFIX, HOURLY_FILE_SUFFIX, LocationRegistry, slug
+from tracing import span, traced
 #there is a week delay for weather data so ealiest date you can pull from i a week before current day
 #if pulling data, pull 10 min before as there is a min delay before a new location can be requested, max 10 per hr
+REQUESTS_PER_MINUTE = 10
+REQUESTS_PER_HOUR = 10
+START_DATE = "2000-11-22"
+END_DATE = "2025-04-02"
+ARCHIVE_LAG_DAYS = 7
+OVERLAP_DAYS = 14  # recent days re-fetched on incremental refresh, in case the archive revised them
+DAILY_VARIABLES = ["precipitation_sum"]
+HOURLY_VARIABLES = ["precipitation"]
+CHUNK_DAYS = 90  # days of hourly data per request when streaming
+NORMALIZE_BLOCK_ROWS = 2048  # rows per block when the streamed daily file is rewritten
+
+# How an hourly variable becomes a daily column, named like the daily archive's
+HOURLY_AGGREGATES = {
+    "precipitation": ("precipitation_sum", "sum"),
+    "rain": ("rain_sum", "sum"),
+    "snowfall": ("snowfall_sum", "sum"),
+    "temperature_2m": ("temperature_2m_mean", "mean"),
+    "wind_speed_10m": ("wind_speed_10m_max", "max"),
+    "wind_gusts_10m": ("wind_gusts_10m_max", "max"),
+}
+
+# How clean_data treats each daily variable (precipitation and snowfall in inches,
+# temperatures in degrees C, wind in km/h): gaps are interpolated linearly, gaps left at
+# the ends get 'fill' (a number, or 'nearest' for the closest valid value) and values
+# are clipped to 'clip'. Variables without a rule are only interpolated.
+CLEANING_RULES = {
+    "precipitation_sum": {"fill": 0.0, "clip": (0, 50)},
+    "rain_sum": {"fill": 0.0, "clip": (0, 50)},
+    "snowfall_sum": {"fill": 0.0, "clip": (0, 100)},
+    "precipitation_hours": {"fill": 0.0, "clip": (0, 24)},
+    "temperature_2m_max": {"fill": "nearest", "clip": (-90, 60)},
+    "temperature_2m_min": {"fill": "nearest", "clip": (-90, 60)},
+    "temperature_2m_mean": {"fill": "nearest", "clip": (-90, 60)},
+    "wind_speed_10m_max": {"fill": "nearest", "clip": (0, 400)},
+    "wind_gusts_10m_max": {"fill": "nearest", "clip": (0, 500)},
+    "precipitation": {"fill": 0.0, "clip": (0, 15)},
+    "rain": {"fill": 0.0, "clip": (0, 15)},
+    "snowfall": {"fill": 0.0, "clip": (0, 30)},
+    "temperature_2m": {"fill": "nearest", "clip": (-90, 60)},
+    "wind_speed_10m": {"fill": "nearest", "clip": (0, 400)},
+    "wind_gusts_10m": {"fill": "nearest", "clip": (0, 500)},
+}
+DEFAULT_CLEANING_RULE = {"fill": None, "clip": (None, None)}
+
+
+def latest_available_date(today: date | None = None) -> str:
+    """Most recent day the archive API can serve, given its one-week lag."""
+    return ((today or date.today()) - timedelta(days=ARCHIVE_LAG_DAYS)).isoformat()
+
+
+class RateLimitedError(Exception):
+    """Raised when the archive API answers 429 Too Many Requests."""
+    def __init__(self, retry_after: float | None = None):
+        super().__init__(f"Rate limited by the archive API (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Holds up to capacity tokens, refilled continuously at capacity per period seconds."""
+
+    def __init__(self, capacity: int, period: float, now: float = 0.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+class RateLimiter:
+    """Thread-safe limiter that blocks callers until every token bucket allows a request."""
+
+    def __init__(self, per_minute: int = REQUESTS_PER_MINUTE, per_hour: int = REQUESTS_PER_HOUR,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        now = clock()
+        self.buckets = [TokenBucket(per_minute, 60, now), TokenBucket(per_hour, 3600, now)]
+        self.paused_until = now
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent, then consume one token from every bucket."""
+        while True:
+            with self.lock:
+                now = self.clock()
+                wait = max([self.paused_until - now] + [b.wait_time(now) for b in self.buckets])
+                if wait <= 0:
+                    for bucket in self.buckets:
+                        bucket.take()
+                    return
+            self.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for seconds, e.g. after a 429 response."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+def _batches(items, size):
+    return [items[i:i + size] for i in range(0, len(items), max(size, 1))]
+
+
+def _raise_on_rate_limit(response, *args, **kwargs):
+    if response.status_code == 429:
+        retry_after = response.headers.get("Retry-After")
+        raise RateLimitedError(float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+
+def value_columns(df: pd.DataFrame) -> list:
+    """Fetched variables in a city frame: everything except 'date' and derived *_normalized columns."""
+    return [name for name in df.columns if name != "date" and not name.endswith("_normalized")]
+
+
+def _date_chunks(start_date, end_date, chunk_days):
+    # consecutive inclusive (start, end) ISO date ranges covering start_date..end_date
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+        chunks.append((start.isoformat(), chunk_end.isoformat()))
+        start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+class StreamingCleaner:
+    """
+    Runs clean_data over a series that arrives in chunks and returns the same rows as
+    cleaning the concatenated series in one go.
+
+    Rows after the last row where every variable is present are held back until a
+    later chunk brings the right-hand value their interpolation needs. That last
+    complete row stays as the left-hand value for the next chunk, so memory is one
+    chunk plus the current gap. Rows not newer than ones already pushed are dropped,
+    like drop_duplicates on overlapping chunks.
+    """
+    def __init__(self, clean):
+        self.clean = clean
+        self._held = None
+        self._anchored = False  # _held starts with a row that was already returned
+        self._last_date = None
+
+    def push(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Add a chunk (sorted by date). Returns the rows that can be cleaned now."""
+        if self._last_date is not None:
+            chunk = chunk[chunk["date"] > self._last_date]
+        chunk = chunk.drop_duplicates(subset="date")
+        if chunk.empty:
+            return chunk
+        self._last_date = chunk["date"].iloc[-1]
+        rows = chunk if self._held is None else pd.concat([self._held, chunk], ignore_index=True)
+        complete = np.flatnonzero(rows[value_columns(rows)].notna().all(axis=1).to_numpy())
+        skip = int(self._anchored)
+        if not len(complete) or complete[-1] < skip:
+            self._held = rows
+            return rows.iloc[:0]
+        anchor = complete[-1]
+        cleaned = self.clean(rows.iloc[:anchor + 1].copy())
+        self._held = rows.iloc[anchor:].reset_index(drop=True)  # raw, as clean_data interpolates before clipping
+        self._anchored = True
+        return cleaned.iloc[skip:]
+
+    def finish(self) -> pd.DataFrame:
+        """Clean and return the rows still held back (the series has ended)."""
+        if self._held is None:
+            return pd.DataFrame()
+        cleaned = self.clean(self._held.copy()).iloc[int(self._anchored):]
+        self._held = None
+        return cleaned
+
+
+class DailyAggregator:
+    """
+    Folds cleaned hourly rows into daily rows as they arrive, using HOURLY_AGGREGATES.
+
+    Days are local calendar days (local time = UTC + utc_offset seconds) stamped at
+    local midnight, like the daily archive. The latest day is held back until a later
+    row shows it is complete.
+    """
+    def __init__(self, variables: list, utc_offset: int):
+        self.aggregates = {name: HOURLY_AGGREGATES.get(name, (f"{name}_mean", "mean")) for name in variables}
+        self.utc_offset = utc_offset
+        self._pending = None
+
+    @property
+    def columns(self) -> list:
+        return [column for column, _ in self.aggregates.values()]
+
+    def push(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """Add hourly rows. Returns the days they completed."""
+        return self._aggregate(rows, final=False)
+
+    def finish(self) -> pd.DataFrame:
+        """Return the last, possibly partial, day."""
+        return self._aggregate(None, final=True)
+
+    def _aggregate(self, rows, final):
+        parts = [df for df in (self._pending, rows) if df is not None and len(df)]
+        if not parts:
+            return pd.DataFrame(columns=["date"] + self.columns)
+        rows = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+        days = (pd.DatetimeIndex(rows["date"]).asi8 // 10 ** 9 + self.utc_offset) // 86400
+        done = np.ones(len(rows), dtype=bool) if final else days < days[-1]
+        self._pending = None if final else rows[~done]
+        grouped = rows[done].groupby(days[done], sort=True)
+        daily = {"date": pd.to_datetime(np.unique(days[done]) * 86400 - self.utc_offset, unit="s", utc=True)}
+        for name, (column, how) in self.aggregates.items():
+            daily[column] = grouped[name].agg(how).to_numpy(dtype=np.float64)
+        return pd.DataFrame(daily)
+
 
 class WeatherDataProcessor:
     """A module to fetch, clean, and preprocess weather data from Open-Meteo API."""
 
-    def __init__(self, cache_dir='.cache', retries=5, backoff_factor=0.2):
-        """Initialize the API client with caching and retry settings."""
+    def __init__(self, cache_dir='.cache', retries=5, backoff_factor=0.2,
+                 url="https://archive-api.open-meteo.com/v1/archive", pool_size=10, variables=None):
+        """
+        Initialize the API client with caching, retry and connection pooling settings.
+
+        variables lists the daily Open-Meteo variables fetched for every location, all in
+        one request (default: precipitation_sum only).
+        """
         cache_session = requests_cache.CachedSession(cache_dir, expire_after=-1)
         retry_session = retry(cache_session, retries=retries, backoff_factor=backoff_factor)
+        # keep the retry policy but allow one pooled connection per concurrent fetch
+        pooled_adapter = HTTPAdapter(max_retries=retry_session.get_adapter("https://").max_retries,
+                                     pool_connections=pool_size, pool_maxsize=pool_size)
+        for prefix in ("http://", "https://"):
+            retry_session.mount(prefix, pooled_adapter)
         self.client = openmeteo_requests.Client(session=retry_session)
-        self.url = "https://archive-api.open-meteo.com/v1/archive"
+        self.url = url
+        self.variables = list(variables or DAILY_VARIABLES)
+
+    def fetch_city_data(self, latitude: float, longitude: float, start_date: str, end_date: str,
+                        variables: list | None = None) -> pd.DataFrame:
+        """Fetch daily data for a given location: 'date' plus one column per variable (default self.variables)."""
+        try:
+            return self._request_daily(latitude, longitude, start_date, end_date, variables=variables)
+        except openmeteo_requests.Client.OpenMeteoRequestsError as e:
+            print(f"Error fetching data: {e}")
+            return None
+
+    def fetch_cities_data(self, cities: list, start_date: str, end_date: str, batch_size: int = 10,
+                          rate_limiter: RateLimiter | None = None, variables: list | None = None) -> dict:
+        """
+        Fetch daily data for many cities, batch_size locations per request.
+
+        The archive API accepts lists of coordinates and answers with one response per
+        location, so a refresh needs only ceil(len(cities) / batch_size) round trips.
+
+        Returns:
+            dict: City name -> DataFrame, or None for cities whose batch failed.
+        """
+        rate_limiter = rate_limiter or RateLimiter()
+        results = {}
+        for batch in _batches(cities, batch_size):
+            try:
+                frames = self._fetch_batch(batch, start_date, end_date, rate_limiter, variables=variables)
+            except (openmeteo_requests.Client.OpenMeteoRequestsError, RateLimitedError) as e:
+                print(f"Error fetching data for {', '.join(c['name'] for c in batch)}: {e}")
+                frames = [None] * len(batch)
+            results.update((city["name"], df) for city, df in zip(batch, frames))
+        return results
+
+    def _fetch_batch(self, batch, start_date, end_date, rate_limiter, max_attempts=5, variables=None, hourly=False):
+        """One request for every city in batch, retried after 429 responses."""
+        for attempt in range(max_attempts):
+            rate_limiter.acquire()
+            try:
+                return self._request_many([c["latitude"] for c in batch], [c["longitude"] for c in batch],
+                                          start_date, end_date, variables=variables, hourly=hourly,
+                                          hooks={"response": _raise_on_rate_limit})
+            except RateLimitedError as e:
+                print(f"Rate limited while fetching {', '.join(c['name'] for c in batch)} "
+                      f"(attempt {attempt + 1}/{max_attempts})")
+                rate_limiter.pause(e.retry_after if e.retry_after is not None else 2 ** attempt)
+        raise RateLimitedError()
 
-    def fetch_city_data(self, latitude: float, longitude: float, start_date: str, end_date: str) -> pd.DataFrame:
-        """Fetch daily precipitation data for a given location."""
+    def _request_daily(self, latitude, longitude, start_date, end_date, **request_kwargs):
+        return self._request_many([latitude], [longitude], start_date, end_date, **request_kwargs)[0]
+
+    def _request_many(self, latitudes, longitudes, start_date, end_date, variables=None, hourly=False,
+                      **request_kwargs):
+        variables = list(variables or (HOURLY_VARIABLES if hourly else self.variables))
         params = {
-            "latitude": latitude,
-            "longitude": longitude,
+            "latitude": latitudes,
+            "longitude": longitudes,
             "start_date": start_date,
             "end_date": end_date,
-            "daily": ["precipitation_sum"],
+            "hourly" if hourly else "daily": variables,
             "timezone": "America/New_York",
             "precipitation_unit": "inch"
         }
         
+        with span('http.request', locations=len(latitudes), start=start_date, end=end_date):
+            responses = self.client.weather_api(self.url, params=params, **request_kwargs)
+        if len(responses) != len(latitudes):
+            raise openmeteo_requests.Client.OpenMeteoRequestsError(
+                f"Expected {len(latitudes)} location responses, got {len(responses)}")
+        with span('http.decode', locations=len(latitudes)):
+            return [self._response_frame(response, variables, hourly)
+                    for response in sorted(responses, key=lambda r: r.LocationId())]
+
+    def _response_frame(self, response, variables, hourly=False) -> pd.DataFrame:
+        block = response.Hourly() if hourly else response.Daily()
+        if block.VariablesLength() != len(variables):
+            raise openmeteo_requests.Client.OpenMeteoRequestsError(
+                f"Expected {len(variables)} {'hourly' if hourly else 'daily'} variables, got {block.VariablesLength()}")
+        data = {
+            "date": pd.date_range(
+                start=pd.to_datetime(block.Time(), unit="s", utc=True),
+                end=pd.to_datetime(block.TimeEnd(), unit="s", utc=True),
+                freq=pd.Timedelta(seconds=block.Interval()),
+                inclusive="left"
+            ),
+        }
+        # the API returns the variables in the order they were requested
+        for i, name in enumerate(variables):
+            data[name] = block.Variables(i).ValuesAsNumpy()
+        df = pd.DataFrame(data)
+        df.attrs["utc_offset"] = response.UtcOffsetSeconds()  # local time = UTC + utc_offset seconds
+        return df
+
+    def fetch_cities_concurrently(self, cities: list, start_date: str, end_date: str, max_workers: int = 4,
+                                  rate_limiter: RateLimiter | None = None, max_attempts: int = 5,
+                                  date_ranges: dict | None = None, batch_size: int = 1):
+        """
+        Fetch several cities on a thread pool, paced by a token-bucket rate limiter.
+
+        A 429 response pauses every worker (for Retry-After seconds when given) and the
+        request is retried up to max_attempts times. date_ranges optionally maps a city
+        name to its own (start_date, end_date); cities sharing a range are requested
+        batch_size at a time. Yields (city, DataFrame or None) as each fetch completes,
+        so callers can process results while others are in flight.
+        """
+        rate_limiter = rate_limiter or RateLimiter()
+        date_ranges = date_ranges or {}
+
+        by_range = {}
+        for city in cities:
+            by_range.setdefault(date_ranges.get(city["name"], (start_date, end_date)), []).append(city)
+        jobs = [(batch, city_range) for city_range, group in by_range.items() for batch in _batches(group, batch_size)]
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
         try:
-            responses = self.client.weather_api(self.url, params=params)
-            response = responses[0]
-            
-            daily = response.Daily()
-            precipitation_sum = daily.Variables(0).ValuesAsNumpy()
-            
-            data = {
-                "date": pd.date_range(
-                    start=pd.to_datetime(daily.Time(), unit="s", utc=True),
-                    end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
-                    freq=pd.Timedelta(seconds=daily.Interval()),
-                    inclusive="left"
-                ),
-                "precipitation_sum": precipitation_sum
-            }
-            return pd.DataFrame(data)
-        
-        except openmeteo_requests.Client.OpenMeteoRequestsError as e:
-            print(f"Error fetching data: {e}")
-            return None
+            futures = {executor.submit(self._fetch_batch, batch, *city_range, rate_limiter, max_attempts): batch
+                       for batch, city_range in jobs}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    frames = future.result()
+                except Exception as e:
+                    print(f"Error fetching data for {', '.join(c['name'] for c in batch)}: {e}")
+                    frames = [None] * len(batch)
+                yield from zip(batch, frames)
+        finally:
+            # if the caller stops early, drop queued requests instead of waiting for them
+            executor.shutdown(wait=False, cancel_futures=True)
 
+    @traced('clean_data')
     def clean_data(self, df: pd.DataFrame) -> pd.DataFrame:
-        """Clean the precipitation data."""
+        """Clean every value column with its rule from CLEANING_RULES."""
         df = df.drop_duplicates(subset="date")
-        df["precipitation_sum"] = df["precipitation_sum"].interpolate(method="linear").fillna(0)
-        df["precipitation_sum"] = df["precipitation_sum"].clip(lower=0, upper=50)
+        for name in value_columns(df):
+            rule = CLEANING_RULES.get(name, DEFAULT_CLEANING_RULE)
+            values = df[name].interpolate(method="linear")
+            if rule["fill"] == "nearest":
+                values = values.bfill().ffill()  # only the ends are still missing
+            elif rule["fill"] is not None:
+                values = values.fillna(rule["fill"])
+            df[name] = values.clip(*rule["clip"])
         return df
 
+    @traced('normalize_data')
     def normalize_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Normalize precipitation values to 0-1 range."""
+        if "precipitation_sum" not in df:
+            return df
         max_precip = df["precipitation_sum"].max()
         if max_precip > 0:
             df["precipitation_normalized"] = df["precipitation_sum"] / max_precip
@@ -69,50 +409,263 @@ class WeatherDataProcessor:
         return df
 
     def load_data(self, city_name: str, data_dir: str = "../data") -> pd.DataFrame:
-        """Load preprocessed data from a CSV file."""
-        file_path = f"{data_dir}/{city_name.lower().replace(' ', '_')}_daily.csv"
-        if os.path.exists(file_path):
-            return pd.read_csv(file_path)
+        """Load preprocessed data, using the binary copy of the CSV when available."""
+        file_path = f"{data_dir}/{slug(city_name)}{DATA_FILE_SUFFIX}"
+        if os.path.exists(file_path) or os.path.exists(binary_path_for(file_path)):
+            return load_city_frame(file_path)
         else:
             print(f"Data file for {city_name} not found.")
             return None
 
-    def process_and_save(self, cities: list, output_dir: str = "../data", delay: int = 60):  
-        """Fetch, clean, normalize, and save data for all cities."""
+    def city_file_path(self, city: dict, output_dir: str) -> str:
+        # registry locations carry their ID; plain {"name", ...} dicts fall back to the name
+        return f"{output_dir}/{city.get('id') or slug(city['name'])}{DATA_FILE_SUFFIX}"
+
+    def save_city_data(self, city: dict, df: pd.DataFrame, output_dir: str, save_binary: bool = True) -> str:
+        """Clean, normalize and write one city's data (CSV plus binary copy). Returns the CSV path."""
+        df = self.clean_data(df)
+        df = self.normalize_data(df)
+        
+        file_path = self.city_file_path(city, output_dir)
+        self._write_city_files(df, file_path, save_binary)
+        print(f"Saved data for {city['name']} to {file_path}")
+        return file_path
+
+    def plan_refresh(self, city: dict, output_dir: str, end_date: str | None = None,
+                     overlap_days: int = OVERLAP_DAYS) -> tuple | None:
+        """
+        Work out which days an incremental refresh of city has to fetch.
+
+        Returns:
+            tuple: (stored DataFrame or None, start_date, end_date), or None when the
+            stored data already reaches end_date. Without stored data the full range is used.
+        """
+        end_date = end_date or latest_available_date()
+        file_path = self.city_file_path(city, output_dir)
+        if not (os.path.exists(file_path) or os.path.exists(binary_path_for(file_path))):
+            return None, START_DATE, end_date
+
+        stored = load_city_frame(file_path)
+        if stored.empty:
+            return None, START_DATE, end_date
+        last_day = stored["date"].max().date()
+        if last_day.isoformat() >= end_date:
+            return None
+        return stored, (last_day - timedelta(days=overlap_days)).isoformat(), end_date
+
+    def merge_refresh(self, city: dict, stored: pd.DataFrame | None, new_df: pd.DataFrame, output_dir: str,
+                      save_binary: bool = True) -> str:
+        """
+        Clean freshly fetched rows and merge them into the stored history.
+
+        The last stored row before the fetched range is cleaned along with the new rows
+        so interpolation of leading gaps has a left neighbour, exactly as in a full
+        download. Overlapping stored rows are replaced, precipitation_normalized is
+        recomputed over the merged history (a new maximum rescales every row), and the
+        files are replaced atomically.
+
+        Returns:
+            str: The CSV path written.
+        """
+        if stored is None or stored.empty:
+            return self.save_city_data(city, new_df, output_dir, save_binary)
+
+        # stored variables the new rows lack stay missing there, new variables are missing before them
+        columns = ["date"] + list(dict.fromkeys(value_columns(stored) + value_columns(new_df)))
+        # splice by calendar day: the fetched rows can carry another UTC offset than the stored
+        # ones (04:00 vs 05:00 across DST), so move them onto the stored offset first
+        day_ns = 86400 * 10 ** 9
+        stored_times = pd.DatetimeIndex(stored["date"]).asi8
+        stored_days = stored_times // day_ns
+        new_days = pd.DatetimeIndex(new_df["date"]).asi8 // day_ns
+        offset = stored_times[0] - stored_days[0] * day_ns
+        new_df = new_df.assign(date=pd.to_datetime(new_days * day_ns + offset, utc=True))
+        kept = stored.loc[stored_days < day_number(new_df["date"].min())].reindex(columns=columns)
+        context = kept.tail(1)
+        cleaned = self.clean_data(pd.concat([context, new_df.reindex(columns=columns)], ignore_index=True))
+        cleaned = cleaned.iloc[len(context):]
+
+        merged = pd.concat([kept, cleaned], ignore_index=True)
+        merged[columns[1:]] = merged[columns[1:]].astype(np.float64)
+        merged = self.normalize_data(merged)
+
+        file_path = self.city_file_path(city, output_dir)
+        self._write_city_files(merged, file_path, save_binary)
+        print(f"Added {len(merged) - len(stored)} new days for {city['name']} to {file_path}")
+        return file_path
+
+    def refresh_city(self, city: dict, output_dir: str = "../data", end_date: str | None = None,
+                     save_binary: bool = True) -> str | None:
+        """Fetch only the days missing from a city's stored data and append them."""
+        plan = self.plan_refresh(city, output_dir, end_date)
+        if plan is None:
+            print(f"{city['name']} is already up to date.")
+            return None
+        stored, start_date, end_date = plan
+        new_df = self.fetch_city_data(city["latitude"], city["longitude"], start_date, end_date)
+        if new_df is None:
+            return None
+        return self.merge_refresh(city, stored, new_df, output_dir, save_binary)
+
+    def stream_hourly_city(self, city: dict, output_dir: str = "../data", start_date: str = START_DATE,
+                           end_date: str = END_DATE, variables: list | None = None, chunk_days: int = CHUNK_DAYS,
+                           rate_limiter: RateLimiter | None = None, save_binary: bool = True) -> tuple:
+        """
+        Fetch a city's hourly history chunk_days at a time and write it both hourly
+        (<id>_hourly.csv) and summed/averaged to days (<id>_daily.csv).
+
+        Only one chunk is in memory at a time: chunks are cleaned with StreamingCleaner,
+        so the rows match cleaning the whole history at once, folded into days with
+        DailyAggregator and appended to the files. The daily rows are spooled to a CSV
+        and rewritten with precipitation_normalized once the maximum is known.
+
+        Returns:
+            tuple: (hourly CSV path, daily CSV path).
+        """
+        variables = list(variables or HOURLY_VARIABLES)
+        rate_limiter = rate_limiter or RateLimiter()
+        hourly_path = f"{output_dir}/{city.get('id') or slug(city['name'])}{HOURLY_FILE_SUFFIX}"
+        daily_path = self.city_file_path(city, output_dir)
+        spool_path = f"{daily_path}.spool"
+        os.makedirs(output_dir, exist_ok=True)
+
+        cleaner = StreamingCleaner(self.clean_data)
+        aggregator = None
+        max_precip = 0.0
+        with ExitStack() as writers:
+            hourly_writers = [writers.enter_context(CityCsvWriter(hourly_path))]
+            if save_binary:
+                hourly_writers.append(writers.enter_context(
+                    CityBinaryWriter(binary_path_for(hourly_path), variables, time_column='hour')))
+            daily_spool = writers.enter_context(CityCsvWriter(spool_path))
+            for chunk_start, chunk_end in _date_chunks(start_date, end_date, chunk_days):
+                with span('stream.chunk', city=city["name"], start=chunk_start):
+                    chunk = self._fetch_batch([city], chunk_start, chunk_end, rate_limiter, variables=variables,
+                                              hourly=True)[0]
+                    if aggregator is None:
+                        aggregator = DailyAggregator(variables, chunk.attrs["utc_offset"])
+                    rows = cleaner.push(chunk)
+                    for writer in hourly_writers:
+                        writer.append(rows)
+                    daily = aggregator.push(rows)
+                    daily_spool.append(daily)
+                    if "precipitation_sum" in daily and len(daily):
+                        max_precip = max(max_precip, float(daily["precipitation_sum"].max()))
+            if aggregator is None:
+                raise ValueError(f"No dates between {start_date} and {end_date}")
+            rows = cleaner.finish()
+            for writer in hourly_writers:
+                writer.append(rows)
+            for daily in (aggregator.push(rows), aggregator.finish()):
+                daily_spool.append(daily)
+                if "precipitation_sum" in daily and len(daily):
+                    max_precip = max(max_precip, float(daily["precipitation_sum"].max()))
+
+        try:
+            self._write_normalized_daily(spool_path, daily_path, aggregator.columns, max_precip, save_binary)
+        finally:
+            os.remove(spool_path)
+        print(f"Saved hourly data for {city['name']} to {hourly_path} and daily totals to {daily_path}")
+        return hourly_path, daily_path
+
+    def _write_normalized_daily(self, spool_path, daily_path, columns, max_precip, save_binary):
+        # second pass over the spooled daily rows, a block at a time, adding the normalized column
+        if "precipitation_sum" in columns:
+            columns = columns + ["precipitation_normalized"]
+        with ExitStack() as writers:
+            targets = [writers.enter_context(CityCsvWriter(daily_path))]
+            if save_binary:
+                targets.append(writers.enter_context(CityBinaryWriter(binary_path_for(daily_path), columns)))
+            for block in pd.read_csv(spool_path, parse_dates=["date"], chunksize=NORMALIZE_BLOCK_ROWS):
+                if "precipitation_sum" in block:
+                    # same as normalize_data over the whole history
+                    scale = max_precip if max_precip > 0 else 1.0
+                    block["precipitation_normalized"] = block["precipitation_sum"] / scale
+                for writer in targets:
+                    writer.append(block)
+
+    def _write_city_files(self, df, file_path, save_binary):
+        # write to a temporary file and rename so readers never see a partial file
+        tmp_path = f"{file_path}.tmp"
+        with span('write.csv', file=os.path.basename(file_path)):
+            df.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, file_path)
+        if save_binary:
+            with span('write.cbin', file=os.path.basename(file_path)):
+                write_city_binary(df, binary_path_for(file_path))
+
+    def process_and_save(self, cities: list, output_dir: str = "../data", delay: int = 60, save_binary: bool = True,
+                         incremental: bool = False):  
+        """
+        Fetch, clean, normalize, and save data for all cities (CSV plus binary copy).
+
+        With incremental=True only the days missing from each stored file are fetched.
+        """
         os.makedirs(output_dir, exist_ok=True)
         
         for i, city in enumerate(cities):
             print(f"Fetching data for {city['name']} ({i+1}/{len(cities)})...")
-            df = self.fetch_city_data(city["latitude"], city["longitude"], "2000-11-22", "2025-04-02")
-            
-            if df is not None:
-                df = self.clean_data(df)
-                df = self.normalize_data(df)
-                
-                file_path = f"{output_dir}/{city['name'].lower().replace(' ', '_')}_daily.csv"
-                df.to_csv(file_path, index=False)
-                print(f"Saved data for {city['name']} to {file_path}")
+            with span('process_city', city=city['name']):
+                if incremental:
+                    if self.refresh_city(city, output_dir, save_binary=save_binary) is None:
+                        continue  # nothing requested, so no need to wait
+                else:
+                    df = self.fetch_city_data(city["latitude"], city["longitude"], START_DATE, END_DATE)
+
+                    if df is not None:
+                        self.save_city_data(city, df, output_dir, save_binary)
             
             # Only sleep between cities, not after the last one
             if i < len(cities) - 1:
                 print(f"Waiting {delay} seconds before next request (API rate limit)...")
                 time.sleep(delay)
 
-# List of 10 cities
-cities = [
-    {"name": "Tallahassee", "latitude": 30.4382, "longitude": -84.2806},
-    {"name": "New York", "latitude": 40.7128, "longitude": -74.0060},
-    {"name": "Los Angeles", "latitude": 34.0522, "longitude": -118.2437},
-    {"name": "Chicago", "latitude": 41.8781, "longitude": -87.6298},
-    {"name": "Houston", "latitude": 29.7604, "longitude": -95.3698},
-    {"name": "Phoenix", "latitude": 33.4484, "longitude": -112.0740},
-    {"name": "San Francisco", "latitude": 37.7749, "longitude": -122.4194},
-    {"name": "Boston", "latitude": 42.3601, "longitude": -71.0589},
-    {"name": "Seattle", "latitude": 47.6062, "longitude": -122.3321},
-    {"name": "Miami", "latitude": 25.7617, "longitude": -80.1918},
-]
+    def process_and_save_concurrent(self, cities: list, output_dir: str = "../data", max_workers: int = 4,
+                                    rate_limiter: RateLimiter | None = None, save_binary: bool = True,
+                                    incremental: bool = False, batch_size: int = 1, progress=None) -> list:
+        """
+        Fetch cities concurrently under the rate limiter and save each one as it arrives.
+
+        Cleaning and saving run on the calling thread while other requests are in flight.
+        With incremental=True only the days missing from each stored file are fetched,
+        and batch_size cities with the same date range share one request.
+        progress(done, total, city_name) is called after each city is handled; an
+        exception raised by it stops the run before the next city is saved.
+
+        Returns:
+            list: Paths of the CSV files written.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        stored = {}
+        date_ranges = {}
+        if incremental:
+            pending = []
+            for city in cities:
+                with span('plan_refresh', city=city["name"]):
+                    plan = self.plan_refresh(city, output_dir)
+                if plan is None:
+                    print(f"{city['name']} is already up to date.")
+                    continue
+                stored[city["name"]], start_date, end_date = plan
+                date_ranges[city["name"]] = (start_date, end_date)
+                pending.append(city)
+            cities = pending
+
+        saved = []
+        fetched = self.fetch_cities_concurrently(cities, START_DATE, END_DATE, max_workers, rate_limiter,
+                                                 date_ranges=date_ranges, batch_size=batch_size)
+        try:
+            for done, (city, df) in enumerate(fetched, start=1):
+                if df is not None:
+                    with span('save_city', city=city["name"]):
+                        saved.append(self.merge_refresh(city, stored.get(city["name"]), df, output_dir, save_binary))
+                if progress is not None:
+                    progress(done, len(cities), city["name"])
+        finally:
+            fetched.close()
+        return saved
 
 if __name__ == "__main__":
     processor = WeatherDataProcessor()
-    processor.process_and_save(cities)
+    processor.process_and_save(LocationRegistry.load("../data/locations.csv").locations)
     print("All city data fetched and saved.")
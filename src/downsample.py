@@ -0,0 +1,85 @@
+# downsample.py
+import numpy as np
+
+
+def minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """
+    Indices of the smallest and largest value in each of n_buckets equal runs of y.
+
+    Keeps every peak and trough at the resolution of a bucket, so a line through the
+    kept points covers the same vertical extent per pixel column as the full series.
+
+    Returns:
+        np.ndarray: Sorted unique indices, always including the first and last point.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_buckets <= 0 or 2 * n_buckets + 2 >= n:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    padded = np.full(size * (-(-n // size)), np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(-1, size)
+    missing = np.isnan(buckets)
+    starts = np.arange(len(buckets)) * size
+    low = starts + np.argmin(np.where(missing, np.inf, buckets), axis=1)
+    high = starts + np.argmax(np.where(missing, -np.inf, buckets), axis=1)
+    present = ~missing.all(axis=1)  # all-NaN buckets have nothing to keep
+    return np.unique(np.concatenate([[0, n - 1], low[present], high[present]]))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks n_out points that keep the visual shape of a line.
+
+    Each bucket keeps the point forming the largest triangle with the point kept in
+    the previous bucket and the average of the next bucket. NaN points are skipped.
+
+    Returns:
+        np.ndarray: Sorted indices into x and y.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.flatnonzero(~np.isnan(y))
+    if n_out < 3 or n_out >= len(finite):
+        return finite
+    fx, fy = x[finite], y[finite]
+    edges = np.linspace(1, len(fx) - 1, n_out - 1).astype(np.int64)  # first and last point are fixed
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, len(fx) - 1
+    previous = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], max(edges[b + 1], edges[b] + 1)
+        next_lo, next_hi = hi, max(edges[b + 2] if b + 2 < len(edges) else len(fx), hi + 1)
+        avg_x, avg_y = fx[next_lo:next_hi].mean(), fy[next_lo:next_hi].mean()
+        ax, ay = fx[previous], fy[previous]
+        areas = np.abs((ax - avg_x) * (fy[lo:hi] - ay) - (ax - fx[lo:hi]) * (avg_y - ay))
+        previous = lo + int(np.argmax(areas))
+        kept[b + 1] = previous
+    return finite[np.unique(kept)]
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, n_points: int, method: str = 'minmax',
+                       keep: np.ndarray | None = None) -> np.ndarray:
+    """
+    Indices of about n_points points to draw instead of the whole series.
+
+    Parameters:
+        x (np.ndarray): Sorted x positions (dates as int64 work).
+        y (np.ndarray): Values.
+        n_points (int): Target number of points, e.g. twice the axis width in pixels.
+        method (str): 'minmax' (per-bucket extremes) or 'lttb'.
+        keep (np.ndarray, optional): Boolean mask of points that must be kept, such as anomalies.
+
+    Returns:
+        np.ndarray: Sorted indices, a superset of np.flatnonzero(keep).
+    """
+    if method == 'minmax':
+        indices = minmax_indices(y, n_points // 2)
+    elif method == 'lttb':
+        indices = lttb_indices(x, y, n_points)
+    else:
+        raise ValueError(f"Unknown downsampling method '{method}', expected 'minmax' or 'lttb'.")
+    if keep is not None:
+        indices = np.union1d(indices, np.flatnonzero(keep))
+    return indices
@@ -0,0 +1,244 @@
+# figure_export.py
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from downsample import downsample_indices
+from locations import slug
+
+RENDER_VERSION = 1  # bump when a renderer changes so cached images are redrawn
+RAIN_BANDS = [(0.01, 0.1, 'lightblue', 'Light rain'), (0.1, 0.5, 'deepskyblue', 'Moderate rain'),
+              (0.5, 1.0, 'dodgerblue', 'Heavy rain')]
+
+
+class FigureTask:
+    """
+    One chart to export: a renderer kind, the data it plots and its parameters.
+
+    data maps names to numpy arrays or JSON values and params holds JSON values, so
+    a task pickles cheaply to a worker process and hashes to a stable digest.
+    """
+    def __init__(self, name: str, kind: str, data: dict, params: dict | None = None):
+        if kind not in RENDERERS:
+            raise ValueError(f"Unknown figure kind '{kind}', expected one of {sorted(RENDERERS)}.")
+        self.name = name
+        self.kind = kind
+        self.data = data
+        self.params = params or {}
+
+    def digest(self) -> str:
+        """Hash of everything that affects the image."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'kind': self.kind, 'version': RENDER_VERSION, 'params': self.params},
+                                 sort_keys=True, default=str).encode('utf-8'))
+        for key in sorted(self.data):
+            value = self.data[key]
+            digest.update(key.encode('utf-8'))
+            if isinstance(value, np.ndarray):
+                digest.update(f"{value.dtype.str}{value.shape}".encode('utf-8'))
+                digest.update(np.ascontiguousarray(value).tobytes())
+            else:
+                digest.update(json.dumps(value, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+
+class FigureExporter:
+    """
+    Renders many FigureTasks into output_dir with the Agg backend, on a process pool.
+
+    Files are named <name>-<digest>.<format>, so charts of different data never
+    overwrite each other and an existing file is reused instead of redrawn. Older
+    renders of the same chart are removed, and figures.json maps each chart name to
+    its current file.
+    """
+    def __init__(self, output_dir: str, max_workers: int | None = None, image_format: str = 'png', dpi: int = 100,
+                 use_cache: bool = True):
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.image_format = image_format
+        self.dpi = dpi
+        self.use_cache = use_cache
+        self.rendered = 0
+        self.cached = 0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def path_for(self, task: FigureTask) -> str:
+        return os.path.join(self.output_dir, f"{slug(task.name)}-{task.digest()[:16]}.{self.image_format}")
+
+    def export(self, tasks: list) -> dict:
+        """
+        Render tasks whose image is not in output_dir yet.
+
+        Returns:
+            dict: Chart name -> file path, for every task.
+        """
+        names = [task.name for task in tasks]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Figure names must be unique, got duplicates: {duplicates}")
+
+        paths = {task.name: self.path_for(task) for task in tasks}
+        jobs = [(task.kind, task.data, task.params, paths[task.name], self.dpi) for task in tasks
+                if not (self.use_cache and os.path.exists(paths[task.name]))]
+        self.cached += len(tasks) - len(jobs)
+
+        if self.max_workers == 1 or len(jobs) <= 1:
+            errors = [_render(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_use_agg) as executor:
+                errors = list(executor.map(_render, jobs))
+        failed = [(path, error) for (*_, path, _), error in zip(jobs, errors) if error is not None]
+        self.rendered += len(jobs) - len(failed)
+        if failed:
+            raise RuntimeError("Rendering failed for " + ", ".join(f"{os.path.basename(p)}: {e}" for p, e in failed))
+
+        self._prune(paths)
+        self._write_manifest(paths)
+        return paths
+
+    def stats(self) -> dict:
+        return {'rendered': self.rendered, 'cached': self.cached}
+
+    def _prune(self, paths):
+        # drop renders of these charts made from older data
+        current = {os.path.basename(path) for path in paths.values()}
+        names = {slug(name) for name in paths}
+        suffix = f".{self.image_format}"
+        for file in os.listdir(self.output_dir):
+            if file.endswith(suffix) and file not in current and file[:-len(suffix)].rsplit('-', 1)[0] in names:
+                try:
+                    os.remove(os.path.join(self.output_dir, file))
+                except FileNotFoundError:
+                    pass  # pruned by a concurrent export
+
+    def _write_manifest(self, paths):
+        manifest_path = os.path.join(self.output_dir, 'figures.json')
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        manifest.update({name: os.path.basename(path) for name, path in paths.items()})
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+
+
+# -------------------------------
+# Task builders
+# -------------------------------
+def city_anomaly_task(city: str, df: pd.DataFrame, anomalies: np.ndarray, downsample: str | None = 'minmax',
+                      column: str = 'precipitation_sum') -> FigureTask:
+    """Chart of one city's series with its anomalies marked, from a city frame and its detector flags."""
+    return FigureTask(f"anomalies {city}", 'anomalies', {
+        'dates': pd.DatetimeIndex(df['date']).asi8,
+        'values': df[column].to_numpy(dtype=np.float64),
+        'anomalies': np.asarray(anomalies, dtype=bool),
+    }, {'title': city, 'downsample': downsample})
+
+
+def city_forecast_tasks(forecast_df: pd.DataFrame, target_column: str = 'precipitation_sum') -> list:
+    """One forecast chart per city in the output of ForecastingAlgorithm.predict_all_cities."""
+    column = f'predicted_{target_column}'
+    return [FigureTask(f"forecast {city}", 'forecast', {
+        'dates': pd.DatetimeIndex(city_df['date']).asi8,
+        'values': city_df[column].to_numpy(dtype=np.float64),
+    }, {'title': city}) for city, city_df in forecast_df.groupby('city', sort=False)]
+
+
+def cluster_tasks(yearly: pd.DataFrame, kmeans) -> list:
+    """One chart per cluster: its cities' yearly averages and the cluster center."""
+    labels = np.asarray(kmeans.labels_)
+    centers = np.asarray(kmeans.cluster_centers_)
+    tasks = []
+    for cluster in range(len(centers)):
+        members = [city for city, label in zip(yearly.columns, labels) if label == cluster]
+        tasks.append(FigureTask(f"cluster {cluster + 1}", 'cluster', {
+            'years': yearly.index.to_numpy(dtype=np.int64),
+            'values': yearly[members].to_numpy(dtype=np.float64),
+            'cities': members,
+            'center': centers[cluster].astype(np.float64),
+        }, {'title': f"Cluster {cluster + 1}"}))
+    return tasks
+
+
+# -------------------------------
+# Renderers (run in worker processes)
+# -------------------------------
+def render_anomalies(fig, data, params):
+    ax = fig.subplots()
+    dates = pd.to_datetime(data['dates'], utc=True)
+    values, anomalies = data['values'], data['anomalies']
+    shown = np.arange(len(values))
+    if params.get('downsample'):
+        width = max(int(ax.get_window_extent().width), 1)
+        shown = downsample_indices(data['dates'], values, 2 * width, params['downsample'], anomalies)
+    ax.plot(dates[shown], values[shown], label='Precipitation', linewidth=0.5, rasterized=len(shown) > 1000)
+    ax.scatter(dates[anomalies], values[anomalies], color='red', label='Anomalies', s=20)
+    ax.set_title(params['title'])
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Precipitation (inch)')
+    ax.legend(loc='upper right')
+
+
+def render_forecast(fig, data, params):
+    ax = fig.subplots()
+    values = data['values']
+    ymax = max(values.max(), 1.4) if len(values) else 1.4
+    ax.plot(pd.to_datetime(data['dates'], utc=True), values, marker='o', label='Forecasted Precipitation')
+    for low, high, color, label in RAIN_BANDS + [(1.0, ymax, 'navy', 'Very heavy rain')]:
+        ax.axhspan(low, high, facecolor=color, alpha=0.3, label=label)
+    ax.set_title(f"{len(values)}-Day Precipitation Forecast for {params['title']}")
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Precipitation (inches)')
+    ax.tick_params(axis='x', rotation=45)
+    ax.grid(True)
+    ax.legend(loc='upper left')
+    ax.set_ylim(0, ymax * 1.1)
+
+
+def render_cluster(fig, data, params):
+    ax = fig.subplots()
+    years = data['years']
+    for city, column in zip(data['cities'], data['values'].T):
+        ax.plot(years, column, marker='o', markersize=4, alpha=0.7, label=city)
+    ax.plot(years, data['center'], color='black', linewidth=2.5, label='Cluster center')
+    ax.set_title(f"{params['title']} ({len(data['cities'])} cities)")
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Average Precipitation (inches)')
+    ax.legend(loc='upper left', fontsize='small', ncol=2)
+
+
+RENDERERS = {
+    'anomalies': render_anomalies,
+    'forecast': render_forecast,
+    'cluster': render_cluster,
+}
+FIGURE_SIZES = {'anomalies': (12, 5), 'forecast': (12, 6), 'cluster': (12, 6)}
+
+
+def _use_agg():
+    import matplotlib
+
+    matplotlib.use('Agg')
+
+
+def _render(job):
+    """Draw one figure to its path (written atomically). Returns None, or the error message."""
+    from matplotlib.figure import Figure
+
+    kind, data, params, path, dpi = job
+    try:
+        fig = Figure(figsize=FIGURE_SIZES[kind])
+        RENDERERS[kind](fig, data, params)
+        fig.tight_layout()
+        root, ext = os.path.splitext(path)
+        tmp_path = f"{root}.{os.getpid()}.tmp{ext}"  # keep the extension, savefig picks the format from it
+        fig.savefig(tmp_path, dpi=dpi)
+        os.replace(tmp_path, path)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
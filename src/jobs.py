@@ -0,0 +1,140 @@
+# jobs.py
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's worker when cancellation was requested."""
+
+
+class Job:
+    """
+    Handle for one background job.
+
+    The job function receives this object and calls progress() after each city;
+    progress() also raises JobCancelled once cancel() has been requested, so a
+    job stops between cities without any extra checks.
+    """
+    def __init__(self, job_id: int, name: str, events: queue.Queue, callbacks: dict):
+        self.id = job_id
+        self.name = name
+        self.status = 'pending'  # pending -> running -> done | failed | cancelled
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self._events = events
+        self._callbacks = callbacks
+        self._cancel = threading.Event()
+
+    def cancel(self) -> None:
+        """Ask the job to stop at its next progress report."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(f"{self.name} was cancelled.")
+
+    def progress(self, done: int, total: int, item=None) -> None:
+        """Report progress from the worker thread. Raises JobCancelled if cancelled."""
+        self._events.put((self, 'progress', (done, total, item)))
+        self.check_cancelled()
+
+    def __repr__(self):
+        return f"Job({self.id}, {self.name!r}, {self.status})"
+
+
+class JobExecutor:
+    """
+    Runs GUI work on background threads and hands the outcome back to the Tk thread.
+
+    Workers only put events on a thread-safe queue; poll() delivers them to the
+    job's callbacks on the thread that calls it, so callbacks may use Tk and
+    matplotlib. attach(root) polls from the Tk event loop with root.after.
+    """
+    def __init__(self, max_workers: int = 4):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._events = queue.Queue()
+        self._ids = itertools.count(1)
+        self.jobs = {}
+
+    def submit(self, name: str, fn, *args, on_progress=None, on_done=None, on_error=None,
+               on_cancel=None, **kwargs) -> Job:
+        """
+        Run fn(job, *args, **kwargs) on a worker thread.
+
+        Callbacks run on the polling thread: on_progress(job, done, total, item),
+        on_done(job, result), on_error(job, exception) and on_cancel(job).
+        """
+        callbacks = {'progress': on_progress, 'done': on_done, 'failed': on_error, 'cancelled': on_cancel}
+        job = Job(next(self._ids), name, self._events, callbacks)
+        self.jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            job.check_cancelled()  # cancelled while waiting for a free worker
+            self._events.put((job, 'running', None))
+            result = fn(job, *args, **kwargs)
+        except JobCancelled:
+            self._events.put((job, 'cancelled', None))
+        except Exception as e:
+            self._events.put((job, 'failed', e))
+        else:
+            self._events.put((job, 'done', result))
+
+    def poll(self) -> int:
+        """Deliver every queued event to its job's callbacks. Returns the number delivered."""
+        delivered = 0
+        while True:
+            try:
+                job, kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                return delivered
+            delivered += 1
+            callback = job._callbacks.get(kind)
+            if kind == 'progress':
+                job.done, job.total, item = payload
+                if callback:
+                    callback(job, job.done, job.total, item)
+                continue
+            job.status = kind
+            if kind == 'done':
+                job.result = payload
+                if callback:
+                    callback(job, payload)
+            elif kind == 'failed':
+                job.error = payload
+                if callback:
+                    callback(job, payload)
+            elif kind == 'cancelled' and callback:
+                callback(job)
+
+    def attach(self, root, interval_ms: int = 100) -> None:
+        """Poll from the Tk event loop of root every interval_ms until the window closes."""
+        def tick():
+            self.poll()
+            root.after(interval_ms, tick)
+        root.after(interval_ms, tick)
+
+    def active(self) -> list:
+        """Jobs that have not finished yet (as far as the polling thread has seen)."""
+        return [job for job in self.jobs.values() if job.status in ('pending', 'running')]
+
+    def cancel_all(self) -> int:
+        """Request cancellation of every unfinished job. Returns how many were asked to stop."""
+        active = self.active()
+        for job in active:
+            job.cancel()
+        return len(active)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.cancel_all()
+        self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,168 @@
+# locations.py
+import csv
+import math
+import os
+import numpy as np
+from city_store import binary_path_for
+
+LOCATIONS_FILE = 'locations.csv'
+DATA_FILE_SUFFIX = '_daily.csv'
+HOURLY_FILE_SUFFIX = '_hourly.csv'
+EARTH_RADIUS_KM = 6371.0088
+
+
+def slug(name: str) -> str:
+    """Location ID derived from a name, also the stem of its data file ('New York' -> 'new_york')."""
+    return name.strip().lower().replace(' ', '_')
+
+
+class LocationRegistry:
+    """
+    The stations the application knows about, loaded from data/locations.csv.
+
+    Each location is a dict with a stable 'id' (also the stem of its data file
+    <id>_daily.csv), a display 'name', 'latitude' and 'longitude', so it can be
+    passed straight to WeatherDataProcessor. Spatial queries use a haversine
+    BallTree built on first use.
+    """
+    def __init__(self, locations: list | None = None, data_dir: str = 'data'):
+        self.data_dir = data_dir
+        self.locations = []
+        self._by_id = {}
+        self._by_name = {}
+        self._tree = None
+        for location in locations or []:
+            self.add(location['name'], location['latitude'], location['longitude'], location.get('id'))
+
+    @classmethod
+    def load(cls, path: str, data_dir: str | None = None) -> 'LocationRegistry':
+        """Read a locations CSV (id,name,latitude,longitude); data files are looked up next to it by default."""
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = [{'id': row['id'], 'name': row['name'], 'latitude': float(row['latitude']),
+                     'longitude': float(row['longitude'])} for row in csv.DictReader(f)]
+        return cls(rows, os.path.dirname(path) if data_dir is None else data_dir)
+
+    @classmethod
+    def from_data_dir(cls, data_dir: str = 'data') -> 'LocationRegistry':
+        """
+        Registry for a data directory: its locations.csv, or, for directories created
+        before the registry existed, one location per <id>_daily.csv without coordinates.
+        """
+        path = os.path.join(data_dir, LOCATIONS_FILE)
+        if os.path.exists(path):
+            return cls.load(path, data_dir)
+        registry = cls(data_dir=data_dir)
+        if not os.path.isdir(data_dir):
+            return registry
+        for file in sorted(os.listdir(data_dir)):
+            if file.endswith(DATA_FILE_SUFFIX):
+                location_id = file[:-len(DATA_FILE_SUFFIX)]
+                registry.add(location_id.replace('_', ' ').title(), math.nan, math.nan, location_id)
+        return registry
+
+    def save(self, path: str | None = None) -> str:
+        """Write the registry as CSV (atomically). Returns the path."""
+        path = path or os.path.join(self.data_dir, LOCATIONS_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['id', 'name', 'latitude', 'longitude'], lineterminator='\n')
+            writer.writeheader()
+            writer.writerows(self.locations)
+        os.replace(tmp_path, path)
+        return path
+
+    def add(self, name: str, latitude: float, longitude: float, location_id: str | None = None) -> dict:
+        """Register a location. Without an explicit ID one is derived from the name and made unique."""
+        if location_id is None:
+            location_id = base = slug(name)
+            suffix = 2
+            while location_id in self._by_id:
+                location_id = f"{base}_{suffix}"
+                suffix += 1
+        elif location_id in self._by_id:
+            raise ValueError(f"Duplicate location id '{location_id}'.")
+        if name.lower() in self._by_name:
+            raise ValueError(f"Duplicate location name '{name}'.")
+        location = {'id': location_id, 'name': name, 'latitude': float(latitude), 'longitude': float(longitude)}
+        self.locations.append(location)
+        self._by_id[location_id] = location
+        self._by_name[name.lower()] = location
+        self._tree = None
+        return location
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __iter__(self):
+        return iter(self.locations)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key: str) -> dict | None:
+        """Look a location up by ID or by name (case-insensitive)."""
+        return self._by_id.get(key) or self._by_name.get(str(key).lower())
+
+    def __getitem__(self, key: str) -> dict:
+        location = self.get(key)
+        if location is None:
+            raise KeyError(f"Unknown location '{key}'.")
+        return location
+
+    @property
+    def names(self) -> list:
+        return [location['name'] for location in self.locations]
+
+    def data_file(self, key) -> str:
+        """Path of a location's daily CSV (which may not exist yet)."""
+        location = key if isinstance(key, dict) else self[key]
+        return os.path.join(self.data_dir, f"{location['id']}{DATA_FILE_SUFFIX}")
+
+    def has_data(self, key) -> bool:
+        path = self.data_file(key)
+        return os.path.exists(path) or os.path.exists(binary_path_for(path))
+
+    def city_files(self, with_data_only: bool = True) -> dict:
+        """{name: data file path} in registry order, by default only for locations with data."""
+        return {location['name']: self.data_file(location) for location in self.locations
+                if not with_data_only or self.has_data(location)}
+
+    def name_for_file(self, path: str) -> str:
+        """Display name of the location a data file belongs to."""
+        file = os.path.basename(path)
+        stem = file[:-len(DATA_FILE_SUFFIX)] if file.endswith(DATA_FILE_SUFFIX) else os.path.splitext(file)[0]
+        location = self._by_id.get(stem)
+        return location['name'] if location else stem.replace('_', ' ').title()
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> list:
+        """
+        The k stations closest to a point.
+
+        Returns:
+            list: (location, distance in km) tuples, closest first.
+        """
+        tree, located = self._spatial_index()
+        k = min(k, len(located))
+        if k == 0:
+            return []
+        distances, indices = tree.query(np.radians([[latitude, longitude]]), k=k)
+        return [(located[i], float(d) * EARTH_RADIUS_KM) for d, i in zip(distances[0], indices[0])]
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> list:
+        """All stations within radius_km of a point, as (location, distance in km), closest first."""
+        tree, located = self._spatial_index()
+        if not located:
+            return []
+        indices, distances = tree.query_radius(np.radians([[latitude, longitude]]), r=radius_km / EARTH_RADIUS_KM,
+                                               return_distance=True, sort_results=True)
+        return [(located[i], float(d) * EARTH_RADIUS_KM) for d, i in zip(distances[0], indices[0])]
+
+    def _spatial_index(self):
+        if self._tree is None:
+            from sklearn.neighbors import BallTree
+
+            located = [loc for loc in self.locations
+                       if not (math.isnan(loc['latitude']) or math.isnan(loc['longitude']))]
+            coords = np.radians([[loc['latitude'], loc['longitude']] for loc in located]).reshape(-1, 2)
+            self._tree = (BallTree(coords, metric='haversine'), located)
+        return self._tree
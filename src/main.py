@@ -1,14 +1,20 @@
 # main.py
+import multiprocessing
 import os
 import sys
 import tkinter as tk
 from tkinter import messagebox, simpledialog
 from tkinter import ttk, messagebox, filedialog
 import subprocess
-from visualizer import AnomalyVisualizer, ClusteringVisualizer, PredictionVisualizer
-from algorithms import ForecastingAlgorithm
-from algorithms import ClusteringAlgorithm 
-import pandas as pd
+from jobs import JobExecutor
+# analysis modules (pandas, matplotlib, sklearn, prophet) are imported inside the
+# handlers that need them so the window opens without waiting for them
+
+# the analyses below start their process pools from job threads while Tk runs: spawn fresh
+# workers instead of forking this process, and cap them so two jobs don't each take every core
+GUI_PROCESS_WORKERS = 2
+
+anomaly_visualizer = None  # created by the first Time Series run
 
 def display_help():
     help_text = (
@@ -16,49 +22,78 @@ def display_help():
         "- Process Data: Optionally create/update the data in the data folder\n"
         "- Clustering: Run KMeans clustering analysis\n"
         "- Predict Trends: Display precipitation trend predictions\n"
-        "- Time Series: Analyze and visualize precipitation time series and anomalies"
+        "- Time Series: Analyze and visualize precipitation time series and anomalies\n"
+        "- Cancel Running: Stop background jobs (Process Data, Predict Trends) after the current city"
     )
     messagebox.showinfo("Help", help_text)
 
+def show_job_progress(job, done, total, item):
+    status_var.set(f"{job.name}: {done}/{total}" + (f" ({item})" if item else ""))
+
+def show_job_cancelled(job):
+    status_var.set(f"{job.name} cancelled.")
+
+def show_job_error(title):
+    def on_error(job, error):
+        status_var.set(f"{job.name} failed.")
+        messagebox.showerror("Error", f"{title}:\n{error}")
+    return on_error
+
+def cancel_jobs():
+    if executor.cancel_all():
+        status_var.set("Cancelling... running cities will finish first.")
+    else:
+        status_var.set("No analyses running.")
+
 def run_data_processing():
     # Check if data files already exist
+    from locations import LocationRegistry
+
     data_dir = 'data'
-    if os.path.exists(data_dir):
-        csv_files = [f for f in os.listdir(data_dir) if f.endswith('_daily.csv')]
-        if len(csv_files) >= 10:  # We expect 10 city files
-            response = messagebox.askyesno("Data Exists", 
-                f"Found {len(csv_files)} data files already exist.\n"
-                "Do you want to refresh the data? (This will take several minutes due to API rate limits)")
-            if not response:
-                messagebox.showinfo("Process Data", "Using existing data files.")
-                return
+    registry = LocationRegistry.load(os.path.join(data_dir, 'locations.csv'))
+    incremental = False
+    stored = [location for location in registry if registry.has_data(location)]
+    if stored and len(stored) == len(registry):  # every registered location has its file
+        response = messagebox.askyesno("Data Exists", 
+            f"Found {len(stored)} data files already exist.\n"
+            "Do you want to refresh the data? Only the days missing from each file will be downloaded.")
+        if not response:
+            messagebox.showinfo("Process Data", "Using existing data files.")
+            return
+        incremental = True
     
     # Show warning about time required
     response = messagebox.askyesno("Process Data", 
-        "Data processing will fetch weather data for 10 cities from 2000-2025.\n"
-        "This will take approximately 10-15 minutes due to API rate limits.\n"
+        f"Data processing will fetch weather data for {len(registry)} cities from 2000-2025.\n"
+        "Cities are fetched concurrently, paced to stay within the API rate limits.\n"
         "Do you want to continue?")
     
     if not response:
         return
         
-    try:
+    def process(job):
         # Import and run data processor directly to avoid subprocess issues
-        from data_processor import WeatherDataProcessor, cities
-        
-        messagebox.showinfo("Processing", "Data processing started. This will take several minutes...")
-        
+        from data_processor import WeatherDataProcessor
+
         # Use the correct data directory path
         output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
         processor = WeatherDataProcessor()
-        # Use shorter delay for testing (10 seconds instead of 60)
-        processor.process_and_save(cities, output_dir, delay=10)
-        
+        return processor.process_and_save_concurrent(registry.locations, output_dir, incremental=incremental,
+                                                     batch_size=5, progress=job.progress)
+
+    def done(job, saved):
+        status_var.set(f"{job.name}: updated {len(saved)} files.")
         messagebox.showinfo("Process Data", "Data processing complete. Data files are updated.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Error processing data:\n{e}")
+
+    # runs in the background so the window stays responsive during the download
+    executor.submit("Process Data", process, on_progress=show_job_progress, on_done=done,
+                    on_error=show_job_error("Error processing data"), on_cancel=show_job_cancelled)
+    status_var.set("Process Data: started...")
 
 def run_climate_clustering():
+    from algorithms import ClusteringAlgorithm
+    from visualizer import ClusteringVisualizer
+
     algorithm = ClusteringAlgorithm() #initialize clustering algorithm
     cities = list(algorithm.cityFiles.keys()) #get list of cities
 
@@ -75,7 +110,7 @@ def run_climate_clustering():
         city_listbox.insert(tk.END, city)
     city_listbox.grid(column=0, row=1, rowspan=10, sticky='w')
 
-    ttk.Label(frame, text="Number of Clusters (k):").grid(column=1, row=0, sticky='w') #label for number of clusters
+    ttk.Label(frame, text="Number of Clusters (k, blank = auto):").grid(column=1, row=0, sticky='w') #label for number of clusters
     k_entry = ttk.Entry(frame, width=5)
     k_entry.grid(column=1, row=1, sticky='w')
 
@@ -85,6 +120,15 @@ def run_climate_clustering():
 
     def run():  # run clustering algorithm
         selected = get_selected_cities()
+        if k_entry.get().strip().lower() in ('', 'auto'):
+            # no k given: cluster on climate features and pick k by silhouette score
+            if len(selected) < 3:
+                messagebox.showerror("Invalid Input", "Select at least three cities to choose k automatically.")
+                raise ValueError("Too few cities for automatic k.")
+            result = algorithm.run_feature_clustering(selected, max_workers=GUI_PROCESS_WORKERS,
+                                                      mp_context=multiprocessing.get_context('spawn'))
+            print(f"\nScores per k:\n{result.scores}")
+            return ClusteringVisualizer().plot(result.yearly, result, result.k)
         try:
             k = int(k_entry.get())
             if k < 1 or len(selected) < k:
@@ -119,31 +163,56 @@ def run_climate_clustering():
     root.mainloop()
 
 def predict_trends():
-    data_directory = 'data'
-    predictor = ForecastingAlgorithm()
-    all_city_data = []
-
-    for filename in os.listdir(data_directory):
-        if filename.endswith('_daily.csv'):
-            city_name = filename.replace('_daily.csv', '')
-            filepath = os.path.join(data_directory, filename)
-            df = pd.read_csv(filepath)
-            df['city'] = city_name  
-            all_city_data.append(df)
-
-    if all_city_data:
-        combined_df = pd.concat(all_city_data, ignore_index=True)
-        try:
-            forecast_results = predictor.predict_all_cities(combined_df, target_column='precipitation_sum', forecast_days=30)
-            PredictionVisualizer.plot_precipitation_forecast_all_cities(forecast_results)
-        except Exception as e:
-            messagebox.showerror("Error", f"Prediction failed: {e}")
-    else:
+    from locations import LocationRegistry
+
+    city_files = LocationRegistry.from_data_dir('data').city_files()
+    if not city_files:
         messagebox.showerror("Error", "No data files found. Please run 'Process Data' first.")
+        return
+
+    def forecast(job):
+        from algorithms import ForecastingAlgorithm
+        from city_store import default_store
+        from model_cache import ProphetModelCache
+        from panel import CityPanel
+
+        predictor = ForecastingAlgorithm()
+        model_cache = ProphetModelCache()
+        panel = CityPanel.from_files(city_files, 'precipitation_sum')
+        job.check_cancelled()
+
+        forecast_results = predictor.predict_all_cities(panel, target_column='precipitation_sum', forecast_days=30,
+                                                        max_workers=GUI_PROCESS_WORKERS, cache=model_cache,
+                                                        progress=job.progress,
+                                                        mp_context=multiprocessing.get_context('spawn'))
+        print(f"Model cache: {model_cache.stats()}")
+        print(f"Data cache: {default_store.stats()}")
+        return forecast_results
+
+    def done(job, forecast_results):
+        # plotting has to happen here, on the Tk thread
+        from visualizer import PredictionVisualizer
+
+        status_var.set(f"{job.name}: done.")
+        failed = forecast_results.attrs['errors']
+        if failed:
+            messagebox.showwarning("Prediction", "Forecast failed for:\n" +
+                                   "\n".join(f"{e['city']}: {e['error']}" for e in failed))
+        PredictionVisualizer.plot_precipitation_forecast_all_cities(forecast_results)
+
+    executor.submit("Predict Trends", forecast, on_progress=show_job_progress, on_done=done,
+                    on_error=show_job_error("Prediction failed"), on_cancel=show_job_cancelled)
+    status_var.set("Predict Trends: started...")
 
 def run_time_series_analysis():
-    data_directory = 'data'
-    anomaly_visualizer = AnomalyVisualizer(root, data_directory)
+    global anomaly_visualizer
+    from visualizer import AnomalyVisualizer
+
+    if anomaly_visualizer is None:
+        # kept for the whole session so its figures are reused between runs
+        anomaly_visualizer = AnomalyVisualizer(root, 'data', downsample='minmax')
+    else:
+        anomaly_visualizer.refresh_locations()
     selected_files = anomaly_visualizer.select_cities_dialog()
     if selected_files:
         window_size = anomaly_visualizer.get_window_size_dialog()
@@ -157,22 +226,37 @@ def run_time_series_analysis():
         messagebox.showinfo("Info", "No cities selected for time series analysis.")
 
 def exit_app():
+    executor.shutdown(wait=False)
     root.destroy()
 
-# Create the main window
-root = tk.Tk()
-root.title("Climate Analyzer")
-root.geometry("300x400")
+def build_main_window():
+    """Create the main window and its buttons; run it with root.mainloop()."""
+    global root, executor, status_var
+    root = tk.Tk()
+    root.title("Climate Analyzer")
+    root.geometry("300x460")
+    executor = JobExecutor(max_workers=2)
+    executor.attach(root)
+    status_var = tk.StringVar(root, value="Ready.")
+
+    # Title label
+    tk.Label(root, text="Climate Analyzer", font=("Helvetica", 14)).pack(pady=10)
 
-# Title label
-tk.Label(root, text="Climate Analyzer", font=("Helvetica", 14)).pack(pady=10)
+    # Add UI Buttons
+    tk.Button(root, text="Process Data", width=20, command=run_data_processing).pack(pady=5)
+    tk.Button(root, text="Clustering", width=20, command=run_climate_clustering).pack(pady=5)
+    tk.Button(root, text="Predict Trends", width=20, command=predict_trends).pack(pady=5)
+    tk.Button(root, text="Time Series", width=20, command=run_time_series_analysis).pack(pady=5)
+    tk.Button(root, text="Cancel Running", width=20, command=cancel_jobs).pack(pady=5)
+    tk.Button(root, text="Help", width=20, command=display_help).pack(pady=5)
+    tk.Button(root, text="Exit", width=20, command=exit_app).pack(pady=10)
+    tk.Label(root, textvariable=status_var, wraplength=280).pack(pady=5)
+    root.protocol("WM_DELETE_WINDOW", exit_app)
+    return root
 
-# Add UI Buttons
-tk.Button(root, text="Process Data", width=20, command=run_data_processing).pack(pady=5)
-tk.Button(root, text="Clustering", width=20, command=run_climate_clustering).pack(pady=5)
-tk.Button(root, text="Predict Trends", width=20, command=predict_trends).pack(pady=5)
-tk.Button(root, text="Time Series", width=20, command=run_time_series_analysis).pack(pady=5)
-tk.Button(root, text="Help", width=20, command=display_help).pack(pady=5)
-tk.Button(root, text="Exit", width=20, command=exit_app).pack(pady=10)
+# Create the main window (guarded so worker processes that re-import this module do not open one)
+if __name__ == "__main__":
+    import tracing
 
-root.mainloop()
+    tracing.enable_from_env()  # CLIMATE_TRACE=1 writes traces/trace.json on exit
+    build_main_window().mainloop()
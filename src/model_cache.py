@@ -0,0 +1,116 @@
+# model_cache.py
+import hashlib
+import json
+import os
+import pandas as pd
+
+
+class ProphetModelCache:
+    """
+    On-disk cache of fitted Prophet models.
+
+    Entries are keyed by city, target column, a hash of the training data and the
+    model parameters, so a model is only reused when all four are unchanged.
+    The cache is bounded by total size and evicts least recently used entries.
+    """
+    def __init__(self, cache_dir: str = '.model_cache', max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, city: str, target_column: str, train_df: pd.DataFrame, params: dict) -> str:
+        """Build the cache key for a training frame with 'ds' and 'y' columns."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'city': city, 'target': target_column, 'params': params},
+                                 sort_keys=True, default=str).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(train_df[['ds', 'y']], index=False).to_numpy().tobytes())
+        return f"{_slug(city)}__{_slug(target_column)}__{digest.hexdigest()[:32]}"
+
+    def get(self, key: str):
+        """Return the cached fitted model for key, or None on a miss."""
+        from prophet.serialize import model_from_json
+
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                model = model_from_json(f.read())
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)  # mark as recently used
+        self.hits += 1
+        return model
+
+    def put(self, key: str, model) -> None:
+        """Store a fitted model and evict old entries if the cache is over budget."""
+        from prophet.serialize import model_to_json
+
+        path = self._path(key)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(model_to_json(model))
+        os.replace(tmp_path, path)
+        self._evict(keep=path)
+
+    def invalidate(self, city: str | None = None) -> int:
+        """Remove every entry for city, or the whole cache when city is None. Returns the count."""
+        prefix = f"{_slug(city)}__" if city is not None else ''
+        removed = 0
+        for path in self._entries():
+            if os.path.basename(path).startswith(prefix):
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters plus the current size of the cache."""
+        entries = self._entries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': sum(os.path.getsize(p) for p in entries),
+        }
+
+    def counters(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def add_counters(self, counts: dict) -> None:
+        """Fold in counters recorded by a copy of this cache, e.g. in a worker process."""
+        self.hits += counts.get('hits', 0)
+        self.misses += counts.get('misses', 0)
+        self.evictions += counts.get('evictions', 0)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _entries(self):
+        return [os.path.join(self.cache_dir, f) for f in os.listdir(self.cache_dir) if f.endswith('.json')]
+
+    def _evict(self, keep):
+        entries = []
+        for path in self._entries():
+            try:
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+            except FileNotFoundError:
+                pass  # removed by another process sharing the cache
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            total -= size
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+
+
+def _slug(text):
+    return str(text).lower().replace(' ', '_').replace('__', '_')
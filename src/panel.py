@@ -0,0 +1,173 @@
+# panel.py
+import numpy as np
+import pandas as pd
+from city_store import day_number, default_store
+
+
+class CityPanel:
+    """
+    One variable for many cities as a cities x days float32 array.
+
+    Columns share one int32 day axis (days since 1970-01-01, first_day onwards)
+    and missing days are NaN. Compared with one DataFrame per city this drops the
+    datetime column, the normalized copy of the values and the repeated city
+    names of the long format. city() and between() return views, not copies.
+    """
+    def __init__(self, values: np.ndarray, cities, first_day: int, time_offset: int = 0,
+                 variable: str = 'precipitation_sum'):
+        values = np.asarray(values, dtype=np.float32)
+        if values.ndim != 2:
+            raise ValueError("values must be a 2-D cities x days array.")
+        self.cities = pd.Index(cities, name='city')
+        if len(self.cities) != values.shape[0]:
+            raise ValueError("Need one city name per row of values.")
+        if not self.cities.is_unique:
+            raise ValueError("City names must be unique.")
+        self.values = values
+        self.first_day = int(first_day)
+        self.time_offset = int(time_offset)  # seconds after UTC midnight of every timestamp
+        self.variable = variable
+
+    @classmethod
+    def from_frames(cls, frames: dict, column: str = 'precipitation_sum') -> 'CityPanel':
+        """Build a panel from {city: DataFrame with 'date' and column}."""
+        days = {}
+        offset = 0
+        for city, df in frames.items():
+            utc = pd.to_datetime(df['date'], utc=True, cache=False).dt.tz_convert(None).to_numpy()
+            seconds = utc.astype('datetime64[s]').astype(np.int64)
+            days[city] = seconds // 86400
+            if len(seconds) and not offset:
+                offset = int(seconds[0] - days[city][0] * 86400)
+        non_empty = [d for d in days.values() if len(d)]
+        first_day = min(d.min() for d in non_empty) if non_empty else 0
+        last_day = max(d.max() for d in non_empty) if non_empty else -1
+        values = np.full((len(frames), last_day - first_day + 1), np.nan, dtype=np.float32)
+        for row, (city, df) in enumerate(frames.items()):
+            values[row, days[city] - first_day] = df[column].to_numpy(dtype=np.float32)
+        return cls(values, list(frames), first_day, offset, column)
+
+    @classmethod
+    def from_files(cls, city_files: dict, column: str = 'precipitation_sum', loader=default_store,
+                   start=None, end=None) -> 'CityPanel':
+        """Build a panel from {city: data file path}, loading only the needed column and start..end (inclusive)."""
+        if start is None and end is None:
+            frames = {city: loader(path, [column]) for city, path in city_files.items()}
+        else:
+            frames = {city: loader(path, [column], start, end) for city, path in city_files.items()}
+        return cls.from_frames(frames, column)
+
+    @classmethod
+    def from_long_frame(cls, df: pd.DataFrame, column: str = 'precipitation_sum') -> 'CityPanel':
+        """Build a panel from a long frame with 'city', 'date' and column, keeping city order."""
+        return cls.from_frames({city: city_df for city, city_df in df.groupby('city', sort=False)}, column)
+
+    @property
+    def n_days(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes
+
+    def __len__(self):
+        return len(self.cities)
+
+    def __repr__(self):
+        return f"CityPanel({len(self.cities)} cities x {self.n_days} days, {self.variable})"
+
+    @property
+    def days(self) -> np.ndarray:
+        """int32 day numbers of the columns."""
+        return np.arange(self.first_day, self.first_day + self.n_days, dtype=np.int32)
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        """UTC timestamps of the columns, matching the 'date' column of the city files."""
+        seconds = self.days.astype(np.int64) * 86400 + self.time_offset
+        return pd.to_datetime(seconds, unit='s', utc=True)
+
+    def city(self, name: str) -> np.ndarray:
+        """One city's row as a view into the panel."""
+        return self.values[self.cities.get_loc(name)]
+
+    def select(self, cities: list) -> 'CityPanel':
+        """Panel with only the given cities, in the given order (copies the rows)."""
+        rows = self.cities.get_indexer(cities)
+        if (rows < 0).any():
+            raise KeyError(f"Unknown cities: {[c for c, r in zip(cities, rows) if r < 0]}")
+        return CityPanel(self.values[rows], cities, self.first_day, self.time_offset, self.variable)
+
+    def between(self, start, end) -> 'CityPanel':
+        """Panel restricted to start..end (inclusive dates or day numbers) as a view."""
+        lo = max(self._day_number(start) - self.first_day, 0)
+        hi = min(self._day_number(end) - self.first_day + 1, self.n_days)
+        hi = max(hi, lo)
+        return CityPanel(self.values[:, lo:hi], self.cities, self.first_day + lo, self.time_offset, self.variable)
+
+    def yearly_means(self, first_year: int | None = None, last_year: int | None = None) -> pd.DataFrame:
+        """Mean per calendar year (rows) and city (columns), ignoring missing days."""
+        years = self.days.astype('datetime64[D]').astype('datetime64[Y]').astype(np.int64) + 1970
+        use = np.ones(self.n_days, dtype=bool)
+        if first_year is not None:
+            use &= years >= first_year
+        if last_year is not None:
+            use &= years <= last_year
+        years = years[use]
+        values = self.values[:, use]
+        if len(years) == 0:
+            return pd.DataFrame(columns=list(self.cities), index=pd.Index([], name='Year'), dtype=np.float64)
+        # the day axis is sorted, so each year is one contiguous run of columns
+        starts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+        valid = ~np.isnan(values)
+        sums = np.add.reduceat(np.where(valid, values, 0), starts, axis=1, dtype=np.float64)
+        counts = np.add.reduceat(valid, starts, axis=1, dtype=np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        unique_years = years[starts]
+        return pd.DataFrame(means.T, index=pd.Index(unique_years, name='Year'), columns=list(self.cities))
+
+    def monthly_means(self) -> np.ndarray:
+        """Mean per calendar month over all years, as a cities x 12 array (NaN-aware)."""
+        months = self.days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12
+        one_hot = np.zeros((self.n_days, 12), dtype=np.float32)
+        one_hot[np.arange(self.n_days), months] = 1
+        valid = ~np.isnan(self.values)
+        sums = np.where(valid, self.values, 0).astype(np.float64) @ one_hot
+        counts = valid.astype(np.float32) @ one_hot
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums / counts
+
+    def to_frame(self, city: str) -> pd.DataFrame:
+        """One city as a 'date' + variable frame, without the NaN padding at either end."""
+        row = self.city(city)
+        present = np.flatnonzero(~np.isnan(row))
+        if len(present) == 0:
+            return pd.DataFrame({'date': pd.to_datetime([], utc=True), self.variable: np.array([], np.float32)})
+        span = slice(present[0], present[-1] + 1)
+        return pd.DataFrame({'date': self.dates[span], self.variable: row[span]})
+
+    def to_long_frame(self) -> pd.DataFrame:
+        """Long format with 'city', 'date' and the variable, one row per present value."""
+        rows, cols = np.nonzero(~np.isnan(self.values))
+        return pd.DataFrame({
+            'city': np.asarray(self.cities, dtype=object)[rows],
+            'date': self.dates[cols],
+            self.variable: self.values[rows, cols],
+        })
+
+    def last_dates(self) -> np.ndarray:
+        """Naive UTC datetime64 of each city's last present value (NaT for empty rows)."""
+        valid = ~np.isnan(self.values)
+        last = self.n_days - 1 - np.argmax(valid[:, ::-1], axis=1)
+        seconds = (self.first_day + last).astype(np.int64) * 86400 + self.time_offset
+        dates = seconds.astype('datetime64[s]').astype('datetime64[ns]')
+        dates[~valid.any(axis=1)] = np.datetime64('NaT')
+        return dates
+
+    def _day_number(self, value):
+        return day_number(value)
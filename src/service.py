@@ -0,0 +1,268 @@
+# service.py
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+import numpy as np
+from algorithms import AnomalyDetector, ForecastingAlgorithm
+from city_store import CityDataStore, file_signature
+from locations import LocationRegistry
+from panel import CityPanel
+from tracing import span
+
+DEFAULT_PORT = 8765
+
+
+class ResultStore:
+    """
+    Precomputed forecasts and anomaly flags for every location with data, held in memory.
+
+    refresh() compares each data file's signature (mtime and size) with the one its
+    results were built from and recomputes only the changed or new locations. Every
+    response body is rendered to JSON bytes with its ETag once per refresh, and the
+    whole set is swapped in one assignment, so readers never see a half-updated state.
+    """
+    def __init__(self, data_dir: str = 'data', backend: str = 'climatology', forecast_days: int = 30,
+                 window_size: int = 30, threshold: float = 3.0, registry: LocationRegistry | None = None,
+                 model_cache=None):
+        self.data_dir = data_dir
+        self.backend = backend
+        self.forecast_days = forecast_days
+        self.detector = AnomalyDetector(window_size, threshold)
+        self.registry = registry
+        self.model_cache = model_cache
+        self.loader = CityDataStore()
+        self.refreshes = 0
+        self.last_error = None
+        self._results = {}  # city -> {'signature', 'computed_at', 'forecast', 'anomalies', 'last_date'}
+        self._responses = {}  # path -> (body bytes, etag)
+        self._lock = threading.Lock()  # one refresh at a time
+
+    def refresh(self) -> list:
+        """
+        Recompute results for locations whose data file changed.
+
+        Returns:
+            list: Names of the locations that were recomputed or dropped.
+        """
+        with self._lock, span('service.refresh'):
+            registry = self.registry or LocationRegistry.from_data_dir(self.data_dir)
+            city_files = registry.city_files()
+            signatures = {city: file_signature(path) for city, path in city_files.items()}
+            changed = [city for city in city_files
+                       if self._results.get(city, {}).get('signature') != signatures[city]]
+            removed = [city for city in self._results if city not in city_files]
+            if not changed and not removed and self._responses:
+                return []
+
+            results = {city: result for city, result in self._results.items() if city in city_files}
+            if changed:
+                # the loader re-reads a file by itself once its signature changes
+                results.update(self._compute({city: city_files[city] for city in changed}, signatures))
+            self._results = results
+            self._responses = self._render(registry, results)
+            self.refreshes += 1
+            return changed + removed
+
+    def response(self, path: str):
+        """(body, etag) for a request path, or None when there is no such resource."""
+        return self._responses.get(path)
+
+    def _compute(self, city_files, signatures):
+        panel = CityPanel.from_files(city_files, 'precipitation_sum', loader=self.loader)
+        forecast = ForecastingAlgorithm.predict_all_cities(panel, 'precipitation_sum', self.forecast_days,
+                                                           cache=self.model_cache, backend=self.backend)
+        by_city = {city: city_df for city, city_df in forecast.groupby('city', sort=False)}
+        flags = self.detector.detect(panel)
+        computed_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        dates = panel.dates
+        last_dates = panel.last_dates()
+        results = {}
+        for row, city in enumerate(panel.cities):
+            city_forecast = by_city.get(city)
+            forecast_records = [] if city_forecast is None else [
+                {'date': date.isoformat(), 'precipitation_sum': round(float(value), 4)}
+                for date, value in zip(city_forecast['date'], city_forecast['predicted_precipitation_sum'])]
+            flagged = np.flatnonzero(flags[row])
+            results[city] = {
+                'signature': signatures[city],
+                'computed_at': computed_at,
+                'forecast': forecast_records,
+                'anomalies': [{'date': dates[i].isoformat(),
+                               'precipitation_sum': round(float(panel.values[row, i]), 4)} for i in flagged],
+                'last_date': None if np.isnat(last_dates[row]) else str(last_dates[row].astype('datetime64[D]')),
+            }
+        errors = {e['city']: e['error'] for e in forecast.attrs['errors']}
+        for city, error in errors.items():
+            results[city]['forecast_error'] = error
+        return results
+
+    def _render(self, registry, results):
+        # bodies carry when their results were computed, not when they were rendered, so an
+        # unchanged location keeps its ETag across refreshes
+        generated_at = max((r['computed_at'] for r in results.values()), default=None)
+        meta = {'backend': self.backend, 'forecast_days': self.forecast_days,
+                'window_size': self.detector.window_size, 'threshold': self.detector.threshold}
+        responses = {}
+
+        def add(paths, payload):
+            body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            for path in paths:
+                responses[path] = (body, etag)
+
+        cities = []
+        for city, result in results.items():
+            location = registry.get(city) or {'id': city, 'name': city}
+            cities.append({'id': location['id'], 'name': city, 'latitude': _finite(location.get('latitude')),
+                           'longitude': _finite(location.get('longitude')), 'last_date': result['last_date']})
+            keys = {location['id'], city, city.lower()}  # /forecast/boston, /forecast/Boston
+            computed = {**meta, 'computed_at': result['computed_at'], 'city': city}
+            add([f"/forecast/{key}" for key in keys],
+                {**computed, 'forecast': result['forecast'], 'error': result.get('forecast_error')})
+            add([f"/anomalies/{key}" for key in keys], {**computed, 'anomalies': result['anomalies']})
+        add(['/cities'], {'generated_at': generated_at, 'cities': cities})
+        add(['/forecast'], {**meta, 'generated_at': generated_at,
+                            'forecast': {city: r['forecast'] for city, r in results.items()}})
+        add(['/anomalies'], {**meta, 'generated_at': generated_at,
+                             'anomalies': {city: r['anomalies'] for city, r in results.items()}})
+        return responses
+
+
+class ForecastRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, every response has a Content-Length
+    server_version = 'ClimateAnalyzer/1.0'
+    disable_nagle_algorithm = True  # headers and body go out as separate writes, don't wait on the ACK
+
+    def do_GET(self):
+        path = unquote(urlsplit(self.path).path).rstrip('/') or '/'
+        store = self.server.store
+        if path == '/health':
+            self._send_json(200, {'status': 'ok' if store.refreshes else 'starting', 'refreshes': store.refreshes,
+                                  'last_error': store.last_error})
+            return
+        response = store.response(path)
+        if response is None:
+            status = 503 if not store.refreshes else 404
+            self._send_json(status, {'error': 'results not ready yet' if status == 503 else f"no resource {path}"})
+            return
+        body, etag = response
+        tags = _etags(self.headers.get('If-None-Match'))
+        if etag in tags or '*' in tags:  # '*' matches any current representation
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')  # clients revalidate with If-None-Match
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ForecastServer(ThreadingHTTPServer):
+    """
+    Serves a ResultStore over HTTP and refreshes it every refresh_interval seconds
+    on a background thread (a cheap file-signature check when nothing changed).
+    """
+    daemon_threads = True
+
+    def __init__(self, address, store: ResultStore, refresh_interval: float = 30.0, verbose: bool = False):
+        super().__init__(address, ForecastRequestHandler)
+        self.store = store
+        self.refresh_interval = refresh_interval
+        self.verbose = verbose
+        self._stop = threading.Event()
+        self._refresher = threading.Thread(target=self._refresh_loop, name='result-refresh', daemon=True)
+
+    def start_refresh(self) -> None:
+        self._refresher.start()
+
+    def server_close(self):
+        self._stop.set()
+        super().server_close()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                changed = self.store.refresh()
+                self.store.last_error = None
+                if changed:
+                    print(f"Refreshed results for {len(changed)} location(s)", file=sys.stderr)
+            except Exception as e:
+                # keep serving the previous results
+                self.store.last_error = f"{type(e).__name__}: {e}"
+                print(f"Refresh failed: {self.store.last_error}", file=sys.stderr)
+            self._stop.wait(self.refresh_interval)
+
+
+def _finite(value):
+    # NaN is not valid JSON
+    return None if value is None or value != value else value
+
+
+def _etags(header):
+    if not header:
+        return set()
+    return {tag.strip().removeprefix('W/') for tag in header.split(',')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='service.py', description='Serve precomputed forecasts and anomalies as JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                           'data'))
+    parser.add_argument('--backend', choices=['prophet', 'climatology'], default='climatology')
+    parser.add_argument('--days', type=int, default=30, help='days to forecast')
+    parser.add_argument('--window', type=int, default=30, help='anomaly detector window size')
+    parser.add_argument('--threshold', type=float, default=3.0, help='anomaly Z-score threshold')
+    parser.add_argument('--refresh-interval', type=float, default=30.0, help='seconds between data file checks')
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+
+    model_cache = None
+    if args.backend == 'prophet':
+        from model_cache import ProphetModelCache
+
+        model_cache = ProphetModelCache()
+    store = ResultStore(args.data_dir, args.backend, args.days, args.window, args.threshold, model_cache=model_cache)
+    start = time.perf_counter()
+    store.refresh()
+    print(f"Computed results in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    server = ForecastServer((args.host, args.port), store, args.refresh_interval, args.verbose)
+    server.start_refresh()
+    print(f"Serving on http://{args.host}:{server.server_address[1]} "
+          "(/cities, /forecast[/<city>], /anomalies[/<city>], /health)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
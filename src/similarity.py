@@ -0,0 +1,214 @@
+# similarity.py
+import json
+import os
+import numpy as np
+import pandas as pd
+from city_store import file_signature
+
+METRICS = ('correlation', 'euclidean')
+PROFILES = ('monthly', 'yearly')
+
+
+class SimilarityIndex:
+    """
+    Pairwise distances between cities' precipitation profiles, for nearest-neighbour lookups.
+
+    A profile is one row of numbers per city: the 12 monthly means from
+    ClusteringAlgorithm.climate_features or the 2001-2024 yearly averages from
+    compute_yearly_averages. 'correlation' compares the shape of the profiles
+    (1 - Pearson r) and 'euclidean' also their level. The full matrix is kept in
+    memory, so a query is one argpartition over a row, and update() recomputes
+    a single row and column instead of the whole matrix.
+    """
+    def __init__(self, profiles: pd.DataFrame, metric: str = 'correlation', profile: str = 'monthly'):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}.")
+        self.metric = metric
+        self.profile = profile
+        self.columns = [str(c) for c in profiles.columns]
+        self.sources = {}  # city -> file signature the profile was built from (see sync)
+        self.cities = []
+        self._position = {}
+        width = len(self.columns)
+        self._profiles = np.empty((0, width))
+        self._distances = np.empty((0, 0))
+        self._n = 0
+        self._reserve(len(profiles))
+        values = np.asarray(profiles, dtype=np.float64)
+        for city, row in zip(profiles.index, values):
+            self._check(city, row)
+            self._position[city] = len(self.cities)
+            self.cities.append(city)
+        self._n = len(self.cities)
+        self._profiles[:self._n] = values
+        self._distances[:self._n, :self._n] = self._pairwise(values, values)
+
+    @classmethod
+    def from_algorithm(cls, algorithm, cities: list, metric: str = 'correlation',
+                       profile: str = 'monthly') -> 'SimilarityIndex':
+        """Build the index from a ClusteringAlgorithm's city files."""
+        index = cls(_profiles(algorithm, cities, profile), metric, profile)
+        index.sources = {city: _signature(algorithm, city) for city in cities}
+        return index
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, city):
+        return city in self._position
+
+    @property
+    def distances(self) -> pd.DataFrame:
+        """The distance matrix as a labelled frame (a copy)."""
+        return pd.DataFrame(self._distances[:self._n, :self._n], index=self.cities, columns=self.cities)
+
+    def distance(self, city_a: str, city_b: str) -> float:
+        return float(self._distances[self._position[city_a], self._position[city_b]])
+
+    def nearest(self, city: str, k: int = 5) -> list:
+        """
+        The k cities most similar to city, closest first.
+
+        Returns:
+            list: (city, distance) tuples, not including city itself.
+        """
+        row = self._position[city]
+        distances = self._distances[row, :self._n].copy()
+        distances[row] = np.inf
+        k = min(k, self._n - 1)
+        if k <= 0:
+            return []
+        candidates = np.argpartition(distances, k - 1)[:k]  # city itself is at inf, so never picked
+        order = candidates[np.argsort(distances[candidates], kind='stable')]
+        return [(self.cities[i], float(distances[i])) for i in order]
+
+    def update(self, city: str, profile) -> None:
+        """Add city or replace its profile, recomputing only its row and column of the matrix."""
+        values = np.asarray(profile, dtype=np.float64).reshape(-1)
+        if len(values) != len(self.columns):
+            raise ValueError(f"Expected a profile of {len(self.columns)} values, got {len(values)}.")
+        self._check(city, values)
+        row = self._position.get(city)
+        if row is None:
+            self._reserve(self._n + 1)
+            row = self._n
+            self._position[city] = row
+            self.cities.append(city)
+            self._n += 1
+        self._profiles[row] = values
+        distances = self._pairwise(values[None, :], self._profiles[:self._n])[0]
+        distances[row] = 0.0
+        self._distances[row, :self._n] = distances
+        self._distances[:self._n, row] = distances
+
+    def remove(self, city: str) -> None:
+        """Drop city, moving the last city into its slot so nothing else is recomputed."""
+        row = self._position.pop(city)
+        last = self._n - 1
+        if row != last:
+            moved = self.cities[last]
+            self._profiles[row] = self._profiles[last]
+            self._distances[row, :self._n] = self._distances[last, :self._n]
+            self._distances[:self._n, row] = self._distances[:self._n, last]
+            self._distances[row, row] = 0.0
+            self.cities[row] = moved
+            self._position[moved] = row
+        self.cities.pop()
+        self.sources.pop(city, None)
+        self._n -= 1
+
+    def sync(self, algorithm, cities: list | None = None) -> dict:
+        """
+        Bring the index in line with algorithm's city files.
+
+        Only cities whose file changed (mtime or size) or that are new get their profile
+        rebuilt; cities no longer listed are removed.
+
+        Returns:
+            dict: {'updated': [...], 'removed': [...]}
+        """
+        cities = list(algorithm.cityFiles) if cities is None else list(cities)
+        removed = [city for city in self.cities if city not in cities]
+        for city in removed:
+            self.remove(city)
+        changed = [city for city in cities if self.sources.get(city) != _signature(algorithm, city)]
+        if changed:
+            profiles = _profiles(algorithm, changed, self.profile)
+            for city in changed:
+                self.update(city, profiles.loc[city].reindex(self.columns))
+                self.sources[city] = _signature(algorithm, city)
+        return {'updated': changed, 'removed': removed}
+
+    def save(self, path: str) -> str:
+        """Write the index to an .npz file (atomically). Returns the path."""
+        meta = {'metric': self.metric, 'profile': self.profile, 'columns': self.columns,
+                'cities': self.cities, 'sources': self.sources}
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, profiles=self._profiles[:self._n], distances=self._distances[:self._n, :self._n],
+                 meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> 'SimilarityIndex':
+        """Read an index written by save() without recomputing any distances."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            index = cls.__new__(cls)
+            index.metric = meta['metric']
+            index.profile = meta['profile']
+            index.columns = meta['columns']
+            index.cities = meta['cities']
+            index.sources = {city: _as_signature(s) for city, s in meta['sources'].items()}
+            index._position = {city: i for i, city in enumerate(index.cities)}
+            index._profiles = data['profiles']
+            index._distances = data['distances']
+            index._n = len(index.cities)
+        return index
+
+    def _reserve(self, size):
+        """Grow the backing arrays geometrically so repeated additions stay cheap."""
+        capacity = self._profiles.shape[0]
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 16)
+        profiles = np.empty((capacity, len(self.columns)))
+        profiles[:self._n] = self._profiles[:self._n]
+        distances = np.empty((capacity, capacity))
+        distances[:self._n, :self._n] = self._distances[:self._n, :self._n]
+        self._profiles, self._distances = profiles, distances
+
+    def _check(self, city, values):
+        if not np.isfinite(values).all():
+            raise ValueError(f"Profile for {city} has missing values.")
+
+    def _pairwise(self, a, b):
+        if self.metric == 'euclidean':
+            squared = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2 * a @ b.T
+            return np.sqrt(np.maximum(squared, 0.0))
+        return np.clip(1.0 - _standardized(a) @ _standardized(b).T, 0.0, 2.0)
+
+
+def _standardized(values):
+    # rows scaled so that a dot product of two rows is their Pearson correlation
+    centred = values - values.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centred, axis=1, keepdims=True)
+    return np.divide(centred, norms, out=np.zeros_like(centred), where=norms > 0)
+
+
+def _profiles(algorithm, cities, profile):
+    if profile == 'monthly':
+        features = algorithm.climate_features(cities)
+        return features[[f'month_{m:02d}' for m in range(1, 13)]]
+    if profile == 'yearly':
+        return algorithm.compute_yearly_averages(cities).T.rename(columns=str)
+    raise ValueError(f"Unknown profile '{profile}', expected one of {PROFILES}.")
+
+
+def _signature(algorithm, city):
+    return file_signature(algorithm.cityFiles[city])
+
+
+def _as_signature(value):
+    # JSON turns the signature's tuples into lists
+    return tuple(tuple(part) if part is not None else None for part in value)
@@ -0,0 +1,252 @@
+# tracing.py
+import atexit
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+TRACE_ENV = 'CLIMATE_TRACE'  # 1/true, or a directory for trace.json and trace_summary.txt
+PROFILE_ENV = 'CLIMATE_PROFILE'  # comma-separated span names to run under cProfile
+DEFAULT_TRACE_DIR = 'traces'
+
+_tracer = None
+
+
+class Tracer:
+    """
+    Collects nested timing spans: wall time, CPU time of the calling thread and,
+    with memory=True, the peak traced Python allocation (tracemalloc) while the
+    span was open, relative to the allocation when it started.
+
+    tracemalloc is process-wide, so the peak of a span that overlaps spans on
+    other threads includes their allocations too. Spans opened inside worker
+    processes (parallel Prophet fits, figure export) are not recorded.
+    """
+    def __init__(self, memory: bool = True, profile: set | None = None, profile_dir: str = DEFAULT_TRACE_DIR):
+        self.memory = memory
+        self.profile = set(profile or ())
+        self.profile_dir = profile_dir
+        self.events = []
+        self.profiles = []
+        self._origin = time.perf_counter_ns()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profiling = False
+        self._started_tracemalloc = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def span(self, name: str, **attrs):
+        return _Span(self, name, attrs)
+
+    def close(self) -> None:
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def summary(self, by: str | None = None) -> list:
+        """
+        Totals per span name (and per value of attribute by, e.g. 'city').
+
+        Returns:
+            list: Dicts with name, count, wall_ms, cpu_ms and peak_kb (max), slowest first.
+        """
+        rows = {}
+        for event in self.events:
+            group = event['args'].get(by) if by else None
+            if by and group is None:
+                continue  # e.g. stage spans in a per-city summary
+            row = rows.get((event['name'], group))
+            if row is None:
+                row = rows[(event['name'], group)] = {'name': event['name'], 'count': 0, 'wall_ms': 0.0,
+                                                      'cpu_ms': 0.0, 'peak_kb': None}
+                if by:
+                    row[by] = group
+            row['count'] += 1
+            row['wall_ms'] += event['dur'] / 1000
+            row['cpu_ms'] += event['args']['cpu_ms']
+            peak = event['args'].get('peak_kb')
+            if peak is not None:
+                row['peak_kb'] = max(row['peak_kb'] or 0.0, peak)
+        return sorted(rows.values(), key=lambda row: row['wall_ms'], reverse=True)
+
+    def format_summary(self, by: str | None = None) -> str:
+        """The summary as a fixed-width text table."""
+        lines = [f"{'name':32s} {by or '':20s} {'count':>6s} {'wall ms':>11s} {'cpu ms':>11s} {'peak KB':>10s}"]
+        for row in self.summary(by):
+            peak = f"{row['peak_kb']:10.0f}" if row['peak_kb'] is not None else f"{'-':>10s}"
+            group = str(row[by]) if by else ''
+            lines.append(f"{row['name'][:32]:32s} {group[:20]:20s} {row['count']:6d} {row['wall_ms']:11.1f} "
+                         f"{row['cpu_ms']:11.1f} {peak}")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        """The spans as Chrome trace-event JSON (load in chrome://tracing or ui.perfetto.dev)."""
+        return {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+
+    def write(self, output_dir: str) -> list:
+        """Write trace.json and trace_summary.txt (per span, then per city and per file) to output_dir."""
+        os.makedirs(output_dir, exist_ok=True)
+        trace_path = os.path.join(output_dir, 'trace.json')
+        with open(trace_path, 'w') as f:
+            json.dump(self.chrome_trace(), f, default=str)
+        tables = [self.format_summary()]
+        for by in ('city', 'file'):
+            if any(by in event['args'] for event in self.events):
+                tables.append(self.format_summary(by))
+        summary_path = os.path.join(output_dir, 'trace_summary.txt')
+        with open(summary_path, 'w') as f:
+            f.write("\n\n".join(tables) + "\n")
+        return [trace_path, summary_path] + self.profiles
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'attrs', 'start', 'cpu_start', 'mem_start', 'child_peak', 'profiler')
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        tracer = self.tracer
+        tracer._stack().append(self)
+        self.child_peak = 0
+        self.profiler = None
+        if self.name in tracer.profile:
+            with tracer._lock:
+                if not tracer._profiling:  # cProfile cannot nest
+                    tracer._profiling = True
+                    self.profiler = cProfile.Profile()
+            if self.profiler is not None:
+                self.profiler.enable()
+        if tracer.memory:
+            self.mem_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.cpu_start = time.thread_time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        cpu = time.thread_time_ns() - self.cpu_start
+        tracer = self.tracer
+        args = dict(self.attrs, cpu_ms=round(cpu / 1e6, 3))
+        peak = None
+        if tracer.memory:
+            # reset_peak() in nested spans dropped our earlier peak, so fold theirs back in
+            peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+            args['peak_kb'] = round(max(peak - self.mem_start, 0) / 1024, 1)
+        if exc_type is not None:
+            args['error'] = exc_type.__name__
+        if self.profiler is not None:
+            self.profiler.disable()
+            args['profile'] = self._dump_profile()
+        stack = tracer._stack()
+        stack.pop()
+        if stack and peak is not None:
+            stack[-1].child_peak = max(stack[-1].child_peak, peak)
+        tracer.events.append({
+            'name': self.name, 'cat': self.name.split('.')[0], 'ph': 'X',
+            'ts': (self.start - tracer._origin) / 1000, 'dur': (end - self.start) / 1000,
+            'pid': os.getpid(), 'tid': threading.get_native_id(), 'args': args,
+        })
+        return False
+
+    def _dump_profile(self):
+        tracer = self.tracer
+        os.makedirs(tracer.profile_dir, exist_ok=True)
+        with tracer._lock:
+            path = os.path.join(tracer.profile_dir, f"{self.name}-{len(tracer.profiles) + 1}.prof")
+            tracer.profiles.append(path)
+            tracer._profiling = False
+        self.profiler.dump_stats(path)
+        return path
+
+
+class _NullSpan:
+    """What span() returns while tracing is off: entering and leaving it does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **attrs):
+    """Context manager timing a block as a span named name, e.g. span('forecast.city', city='Boston')."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, **attrs)
+
+
+def traced(name: str | None = None):
+    """Decorator running each call of a function inside a span (the function's qualified name by default)."""
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def enable(memory: bool = True, profile=None, profile_dir: str = DEFAULT_TRACE_DIR) -> Tracer:
+    """Start recording spans (replacing any previous tracer). Returns the tracer."""
+    global _tracer
+    disable()
+    _tracer = Tracer(memory, profile, profile_dir)
+    return _tracer
+
+
+def disable() -> Tracer | None:
+    """Stop recording. Returns the tracer that was active, with its events."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+    return tracer
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def current() -> Tracer | None:
+    return _tracer
+
+
+def enable_from_env() -> Tracer | None:
+    """
+    Turn tracing on when CLIMATE_TRACE is set, writing the trace when the process exits.
+
+    CLIMATE_TRACE=1 writes to ./traces, any other value is taken as the directory.
+    CLIMATE_PROFILE=stage.forecast,... additionally profiles those spans with cProfile.
+    """
+    value = os.environ.get(TRACE_ENV, '').strip()
+    if not value or value.lower() in ('0', 'false', 'no'):
+        return None
+    output_dir = DEFAULT_TRACE_DIR if value.lower() in ('1', 'true', 'yes') else value
+    profile = [name.strip() for name in os.environ.get(PROFILE_ENV, '').split(',') if name.strip()]
+    tracer = enable(profile=profile, profile_dir=output_dir)
+    atexit.register(lambda: tracer.write(output_dir))
+    return tracer
@@ -2,29 +2,49 @@
 import os
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
 import algorithms
+from city_store import default_store
+from downsample import downsample_indices
+from locations import LocationRegistry
+from tracing import span, traced
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from tkinter import Listbox, MULTIPLE
 import numpy as np
 
+RASTERIZE_THRESHOLD = 1000  # artists with more points than this are rasterized in vector output
+
 class AnomalyVisualizer:
     """
     Visualizes precipitation data and detected anomalies using Tkinter menus.
+
+    With downsample='minmax' or 'lttb' each series is reduced to about two points per
+    pixel column of its axes before drawing (anomalies are always kept), and dense
+    artists are rasterized so SVG/PDF output stays small. Figures are reused between
+    calls with the same layout instead of being rebuilt.
     """
-    def __init__(self, master, data_dir='../data'):
+    def __init__(self, master, data_dir='../data', loader=default_store, registry=None, downsample=None,
+                 rasterize_threshold=RASTERIZE_THRESHOLD):
         self.master = master
         self.data_dir = data_dir
+        self.loader = loader
+        self.registry = registry or LocationRegistry.from_data_dir(data_dir)
+        self.downsample = downsample  # None draws every point
+        self.rasterize_threshold = rasterize_threshold  # float('inf') keeps every artist as vectors
+        self._scan_data_dir = registry is None
+        self.city_files = self._find_csv_files()
+        self._figures = {}
+
+    def refresh_locations(self):
+        """Re-read the locations with data, e.g. after Process Data wrote new files."""
+        if self._scan_data_dir:
+            self.registry = LocationRegistry.from_data_dir(self.data_dir)
         self.city_files = self._find_csv_files()
 
     def _find_csv_files(self):
-        files = {}
-        for file in os.listdir(self.data_dir):
-            if file.endswith('.csv'):
-                city_name = file.split('.')[0].replace('_', ' ').title()
-                files[city_name] = os.path.join(self.data_dir, file)
-        return files
+        return self.registry.city_files()
 
     def select_cities_dialog(self):
         top = tk.Toplevel(self.master)
@@ -60,7 +80,8 @@ class AnomalyVisualizer:
         )
         return window_size
 
-    def plot_anomalies(self, file_paths, window_size=30, threshold=3.0):
+    @traced('plot.anomalies')
+    def plot_anomalies(self, file_paths, window_size=30, threshold=3.0, output_path='anomalies_subplots.png'):
         if not file_paths:
             messagebox.showinfo("Info", "No cities selected for anomaly analysis.")
             return
@@ -70,23 +91,33 @@ class AnomalyVisualizer:
         num_plots = len(file_paths)
         cols = 2
         rows = (num_plots + 1) // cols
-        fig, axes = plt.subplots(rows, cols, figsize=(20, 5 * rows), sharex=True,
+        fig, axes = self._figure('anomalies', (20, 5 * rows), rows, cols, sharex=True,
                                  gridspec_kw={'hspace': 0.5, 'wspace': 0.3})
 
         axes = np.ravel(axes)
 
-        for i, file_path in enumerate(file_paths):
-            df = pd.read_csv(file_path, parse_dates=['date'], index_col='date')
+        frames = [self.loader(file_path, ['precipitation_sum']).set_index('date') for file_path in file_paths]
+        # score every selected city in one call, padding shorter histories with NaN
+        longest = max(len(df) for df in frames)
+        batch = np.full((len(frames), longest), np.nan)
+        for i, df in enumerate(frames):
+            batch[i, :len(df)] = df['precipitation_sum'].to_numpy()
+        batch_anomalies = detector.detect(batch)
+
+        for i, (file_path, df) in enumerate(zip(file_paths, frames)):
             precipitation = df['precipitation_sum']
-            anomalies = detector.detect(precipitation)
+            anomalies = batch_anomalies[i, :len(df)]
 
             ax = axes[i]
-            ax.plot(df.index, precipitation, label='Precipitation', linewidth=0.5)
+            shown = self._visible_points(ax, df.index, precipitation, keep=anomalies)
+            ax.plot(df.index[shown], precipitation.iloc[shown], label='Precipitation', linewidth=0.5,
+                    rasterized=len(shown) > self.rasterize_threshold)
             anomaly_dates = df.index[anomalies]
             anomaly_values = precipitation[anomalies]
-            ax.scatter(anomaly_dates, anomaly_values, color='red', label='Anomalies', s=20)
+            ax.scatter(anomaly_dates, anomaly_values, color='red', label='Anomalies', s=20,
+                       rasterized=len(anomaly_dates) > self.rasterize_threshold)
 
-            location_name = os.path.basename(file_path).split('.')[0].replace('_', ' ').title()
+            location_name = self.registry.name_for_file(file_path)
             ax.set_title(location_name)
             ax.set_ylabel('Precipitation (inch)')
             ax.tick_params(axis='x', rotation=45)
@@ -96,30 +127,51 @@ class AnomalyVisualizer:
                 fig.delaxes(axes[j])
 
         fig.text(0.5, 0.02, 'Date', ha='center', va='center')
-        plt.tight_layout(rect=[0, 0.03, 1, 1])
-        plt.savefig('anomalies_subplots.png')
-        plt.close()
+        fig.tight_layout(rect=[0, 0.03, 1, 1])
+        with span('savefig', file=os.path.basename(output_path)):
+            fig.savefig(output_path)
 
-    def plot_scatter_overlay(self, file_paths):
+    @traced('plot.scatter_overlay')
+    def plot_scatter_overlay(self, file_paths, output_path='scatter_overlay.png'):
         if not file_paths:
             messagebox.showinfo("Info", "No cities selected for scatter plot.")
             return
 
-        fig, ax = plt.subplots(figsize=(15, 8))
+        fig, ax = self._figure('scatter_overlay', (15, 8))
         for file_path in file_paths:
-            df = pd.read_csv(file_path, parse_dates=['date'], index_col='date')
-            location_name = os.path.basename(file_path).split('.')[0].replace('_', ' ').title()
-            ax.scatter(df.index, df['precipitation_sum'], label=location_name, s=10, alpha=0.7)
+            df = self.loader(file_path, ['precipitation_sum']).set_index('date')
+            location_name = self.registry.name_for_file(file_path)
+            shown = self._visible_points(ax, df.index, df['precipitation_sum'])
+            ax.scatter(df.index[shown], df['precipitation_sum'].iloc[shown], label=location_name, s=10, alpha=0.7,
+                       rasterized=len(shown) > self.rasterize_threshold)
         ax.set_xlabel('Date')
         ax.set_ylabel('Precipitation (inch)')
         ax.set_title('Overlay Scatter Plot of Precipitation for Selected Cities')
         ax.legend(loc='upper right', fontsize='small', ncol=2)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig('scatter_overlay.png')
-        plt.close()
+        ax.tick_params(axis='x', rotation=45)
+        fig.tight_layout()
+        with span('savefig', file=os.path.basename(output_path)):
+            fig.savefig(output_path)
+
+    def _figure(self, name, figsize, rows=1, cols=1, **subplot_kw):
+        """A cleared figure for this plot, reused across calls (no pyplot state, nothing to close)."""
+        fig = self._figures.get(name)
+        if fig is None:
+            fig = self._figures[name] = Figure()
+        else:
+            fig.clear()
+        fig.set_size_inches(figsize)
+        return fig, fig.subplots(rows, cols, **subplot_kw)
+
+    def _visible_points(self, ax, dates, values, keep=None):
+        """Positions of the points to draw on ax: all of them, or about two per pixel column."""
+        if self.downsample is None:
+            return np.arange(len(values))
+        width = max(int(ax.get_window_extent().width), 1)
+        return downsample_indices(dates.asi8, np.asarray(values, dtype=np.float64), 2 * width, self.downsample, keep)
 
 class ClusteringVisualizer:
+    @traced('plot.clustering')
     def plot(self, df, kmeans, k):
         labels = kmeans.labels_ #get labels via kmeans
         cluster_assignments = {i: [] for i in range(k)} #dict to store cities
@@ -162,6 +214,7 @@ class ClusteringVisualizer:
 
 class PredictionVisualizer:
     @staticmethod
+    @traced('plot.forecast')
     def plot_precipitation_forecast(forecast_df, city=None):
         if city:
             forecast_df = forecast_df[forecast_df['city'] == city]
@@ -187,7 +240,8 @@ class PredictionVisualizer:
         plt.show()
 
     @staticmethod
-    def plot_precipitation_forecast_all_cities(forecast_df):
+    @traced('plot.forecast_all_cities')
+    def plot_precipitation_forecast_all_cities(forecast_df, output_path='prediction_plot.png'):
         plt.figure(figsize=(14, 7))
         for city in forecast_df['city'].unique():
             city_df = forecast_df[forecast_df['city'] == city]
@@ -206,5 +260,6 @@ class PredictionVisualizer:
         plt.ylim(0, ymax * 1.1)
         plt.legend(loc='upper left', fontsize='small', ncol=2)
         plt.tight_layout()
-        plt.savefig('prediction_plot.png')
+        with span('savefig', file=os.path.basename(output_path)):
+            plt.savefig(output_path)
         plt.show()
@@ -0,0 +1,128 @@
+# Local stand-in for the Open-Meteo archive endpoint, used by the data processor tests.
+# Serves size-prefixed flatbuffer WeatherApiResponse messages (one per requested
+# location) and can answer the first few requests with 429 like the real API.
+import json
+import threading
+from datetime import date, datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import flatbuffers
+import numpy as np
+
+UTC_OFFSET = -4 * 3600  # America/New_York as stored in the bundled CSVs
+
+
+def fake_values(latitude, longitude, n, offset=0):
+    """Deterministic non-negative series per location so tests can check values."""
+    t = np.arange(offset, offset + n)
+    return (np.abs(np.sin(t * 0.3 + latitude)) * (1 + abs(longitude) / 100)).astype(np.float32)
+
+
+def _variables_with_time(builder, start, end, interval, series):
+    variable_offsets = []
+    for values in series:
+        builder.StartVector(4, len(values), 4)
+        for v in reversed(values):
+            builder.PrependFloat32(float(v))
+        values_vector = builder.EndVector()
+        builder.StartObject(14)
+        builder.PrependUint8Slot(0, 1, 0)  # Variable
+        builder.PrependUOffsetTRelativeSlot(3, values_vector, 0)  # Values
+        variable_offsets.append(builder.EndObject())
+
+    builder.StartVector(4, len(variable_offsets), 4)
+    for offset in reversed(variable_offsets):
+        builder.PrependUOffsetTRelative(offset)
+    variables_vector = builder.EndVector()
+
+    builder.StartObject(4)
+    builder.PrependInt64Slot(0, start, 0)  # Time
+    builder.PrependInt64Slot(1, end, 0)  # TimeEnd
+    builder.PrependInt32Slot(2, interval, 0)  # Interval
+    builder.PrependUOffsetTRelativeSlot(3, variables_vector, 0)  # Variables
+    return builder.EndObject()
+
+
+def build_response(latitude, longitude, start_date, end_date, variables=("precipitation_sum",),
+                   hourly=False, location_id=0):
+    """Encode one location's response as a size-prefixed flatbuffer."""
+    start = int(datetime.combine(date.fromisoformat(start_date), datetime.min.time(),
+                                 timezone.utc).timestamp()) - UTC_OFFSET
+    end = int(datetime.combine(date.fromisoformat(end_date), datetime.min.time(),
+                               timezone.utc).timestamp()) - UTC_OFFSET + 86400
+    interval = 3600 if hourly else 86400
+    n = (end - start) // interval
+    first = (start + UTC_OFFSET) // interval  # absolute index so overlapping requests agree
+    series = [fake_values(latitude + i, longitude, n, first) for i in range(len(variables))]
+
+    builder = flatbuffers.Builder(1024)
+    block = _variables_with_time(builder, start, end, interval, series)
+    builder.StartObject(14)
+    builder.PrependFloat32Slot(0, latitude, 0)
+    builder.PrependFloat32Slot(1, longitude, 0)
+    builder.PrependInt64Slot(4, location_id, 0)
+    builder.PrependInt32Slot(6, UTC_OFFSET, 0)
+    builder.PrependUOffsetTRelativeSlot(11 if hourly else 10, block, 0)
+    builder.Finish(builder.EndObject())
+    body = bytes(builder.Output())
+    return len(body).to_bytes(4, 'little') + body
+
+
+class ArchiveStubServer:
+    """
+    Threaded HTTP server mimicking /v1/archive.
+
+    rate_limit_first: answer this many requests with 429 before serving data.
+    Every request's query is recorded in self.requests.
+    """
+    def __init__(self, rate_limit_first=0, retry_after=0):
+        self.rate_limit_first = rate_limit_first
+        self.retry_after = retry_after
+        self.requests = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                with stub.lock:
+                    stub.requests.append(query)
+                    limited = len(stub.requests) <= stub.rate_limit_first
+                if limited:
+                    self._send(429, json.dumps({"error": True, "reason": "Too many requests"}).encode(),
+                               "application/json", {"Retry-After": str(stub.retry_after)})
+                    return
+                latitudes = [float(v) for item in query["latitude"] for v in item.split(",")]
+                longitudes = [float(v) for item in query["longitude"] for v in item.split(",")]
+                hourly = "hourly" in query
+                variables = [v for item in query["hourly" if hourly else "daily"] for v in item.split(",")]
+                body = b"".join(
+                    build_response(lat, lon, query["start_date"][0], query["end_date"][0], variables,
+                                   hourly=hourly, location_id=i)
+                    for i, (lat, lon) in enumerate(zip(latitudes, longitudes)))
+                self._send(200, body, "application/octet-stream")
+
+            def _send(self, status, body, content_type, headers=None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/archive"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
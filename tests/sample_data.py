@@ -0,0 +1,21 @@
+# Sample inputs for test_jobs, kept here so test modules do not import each other.
+import numpy as np
+import pandas as pd
+
+test_cities = [
+    {"name": "Tallahassee", "latitude": 30.4382, "longitude": -84.2806},
+    {"name": "New York", "latitude": 40.7128, "longitude": -74.0060},
+    {"name": "Boston", "latitude": 42.3601, "longitude": -71.0589},
+]
+
+def generate_mock_df():
+    dates = pd.date_range(start="2024-01-01", periods=60)
+    data = []
+    for city in ["New York", "Los Angeles"]:
+        for date in dates:
+            data.append({
+                "city": city,
+                "date": date,
+                "precipitation_sum": np.random.rand()
+            })
+    return pd.DataFrame(data)
@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from algorithms import AnomalyDetector, StreamingAnomalyDetector
+import json
+import pandas as pd
+import numpy as np
+
+def loop_detect(values, window_size, threshold):
+    # the original per-day loop, kept as the reference behaviour
+    series = pd.Series(values)
+    anomalies = np.full(len(series), False)
+    for i in range(window_size, len(series)):
+        window = series.iloc[i - window_size:i]
+        mean = window.mean()
+        std = window.std()
+        if std == 0 or pd.isna(std):
+            std = 1e-10
+        anomalies[i] = abs(series.iloc[i] - mean) / std > threshold
+    return anomalies
+
+def generate_precipitation(n, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(0.5, 0.3, size=n)
+    values[rng.random(n) < 0.6] = 0.0  # dry days give zero-std windows
+    return values
+
+def test_detect_matches_loop():
+    values = generate_precipitation(500)
+    for window_size, threshold in [(30, 3.0), (7, 2.0), (1, 1.0)]:
+        detector = AnomalyDetector(window_size=window_size, threshold=threshold)
+        np.testing.assert_array_equal(detector.detect(values), loop_detect(values, window_size, threshold))
+
+def test_detect_matches_loop_with_gaps():
+    values = generate_precipitation(300, seed=1)
+    values[np.random.default_rng(2).random(300) < 0.1] = np.nan
+    detector = AnomalyDetector(window_size=10, threshold=2.0)
+    np.testing.assert_array_equal(detector.detect(pd.Series(values)), loop_detect(values, 10, 2.0))
+
+def test_detect_batch_matches_single_series():
+    batch = np.vstack([generate_precipitation(200, seed=s) for s in range(4)])
+    detector = AnomalyDetector(window_size=30, threshold=3.0)
+    result = detector.detect(batch)
+    assert result.shape == batch.shape
+    assert not result[:, :30].any()
+    for row, values in zip(result, batch):
+        np.testing.assert_array_equal(row, detector.detect(values))
+
+def test_detect_short_series():
+    detector = AnomalyDetector(window_size=30)
+    result = detector.detect(np.ones(10))
+    assert result.dtype == bool
+    assert not result.any()
+
+def test_streaming_update_matches_detect():
+    values = generate_precipitation(400, seed=3)
+    values[::37] = np.nan
+    streaming = StreamingAnomalyDetector(window_size=30, threshold=2.5)
+    flags = np.array([streaming.update(v) for v in values])
+    np.testing.assert_array_equal(flags, AnomalyDetector(window_size=30, threshold=2.5).detect(values))
+
+def test_streaming_update_many_matches_detect():
+    values = generate_precipitation(400, seed=4)
+    streaming = StreamingAnomalyDetector(window_size=14, threshold=2.0)
+    flags = np.concatenate([streaming.update_many(chunk) for chunk in np.array_split(values, 9)])
+    np.testing.assert_array_equal(flags, AnomalyDetector(window_size=14, threshold=2.0).detect(values))
+
+def test_streaming_checkpoint_resume():
+    values = generate_precipitation(300, seed=5)
+    uninterrupted = StreamingAnomalyDetector(window_size=20)
+    expected = [uninterrupted.update(v) for v in values]
+
+    streaming = StreamingAnomalyDetector(window_size=20)
+    flags = [streaming.update(v) for v in values[:150]]
+    state = json.loads(json.dumps(streaming.state_dict()))
+    resumed = StreamingAnomalyDetector.from_state_dict(state)
+    flags += [resumed.update(v) for v in values[150:]]
+    assert flags == expected
+
+def test_detect_matches_loop_after_scale_change():
+    rng = np.random.default_rng(3)
+    values = np.concatenate([1e6 + rng.normal(0, 1e5, 400), generate_precipitation(600, seed=3)])
+    for window in (5, 30):
+        expected = loop_detect(values, window, 3.0)
+        np.testing.assert_array_equal(AnomalyDetector(window, 3.0).detect(values), expected)
+        streaming = StreamingAnomalyDetector(window, 3.0)
+        np.testing.assert_array_equal(streaming.update_many(values), expected)
@@ -0,0 +1,78 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from city_store import CityDataStore
+
+def write_city(path, values):
+    dates = pd.date_range("2020-01-01 05:00", periods=len(values), freq="D", tz="UTC")
+    pd.DataFrame({"date": dates, "precipitation_sum": values}).to_csv(path, index=False)
+
+def test_second_load_is_a_hit(tmp_path):
+    path = str(tmp_path / "boston_daily.csv")
+    write_city(path, [0.1, 0.2, 0.3])
+    store = CityDataStore()
+    first = store.load(path)
+    second = store.load(path)
+    pd.testing.assert_frame_equal(first, second)
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] > 0
+
+def test_rewritten_file_is_reloaded(tmp_path):
+    path = str(tmp_path / "boston_daily.csv")
+    write_city(path, [0.1, 0.2, 0.3])
+    store = CityDataStore()
+    store.load(path)
+    time.sleep(0.01)
+    write_city(path, [0.5, 0.6, 0.7, 0.8])
+    reloaded = store.load(path)
+    assert len(reloaded) == 4
+    assert store.stats()["invalidations"] == 1
+
+def test_views_cannot_corrupt_cache(tmp_path):
+    path = str(tmp_path / "boston_daily.csv")
+    write_city(path, [0.1, 0.2, 0.3])
+    store = CityDataStore()
+    view = store.load(path)
+    with pytest.raises(ValueError):
+        view.loc[0, "precipitation_sum"] = 99.0
+    view["city"] = "Boston"  # adding or replacing columns only affects this view
+    view["precipitation_sum"] = 0.0
+    again = store.load(path)
+    assert "city" not in again.columns
+    np.testing.assert_allclose(again["precipitation_sum"], [0.1, 0.2, 0.3])
+
+def test_lru_eviction_bounds_memory(tmp_path):
+    paths = []
+    for i in range(3):
+        paths.append(str(tmp_path / f"city{i}_daily.csv"))
+        write_city(paths[-1], np.arange(100, dtype=float))
+    probe = CityDataStore()
+    probe.load(paths[0])
+    store = CityDataStore(max_bytes=2 * probe.stats()["bytes"])
+    store.load(paths[0])
+    store.load(paths[1])
+    store.load(paths[0])  # paths[1] is now least recently used
+    store.load(paths[2])
+    stats = store.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+    store.load(paths[0])
+    assert store.stats()["hits"] == 2
+
+def test_range_is_cut_from_cached_full_history(tmp_path):
+    path = str(tmp_path / "boston_daily.csv")
+    write_city(path, [0.1, 0.2, 0.3, 0.4, 0.5])
+    store = CityDataStore()
+    assert store.load(path, ["precipitation_sum"], "2020-01-02", "2020-01-03")["precipitation_sum"].tolist() == [0.2, 0.3]
+    store.load(path, ["precipitation_sum"])
+    cut = store.load(path, ["precipitation_sum"], "2020-01-04")
+    assert cut["precipitation_sum"].tolist() == [0.4, 0.5]
+    with pytest.raises(ValueError):
+        cut.loc[0, "precipitation_sum"] = 99.0
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
@@ -0,0 +1,119 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from city_store import (CityBinaryWriter, binary_path_for, convert_csv_dir, load_city_frame, open_city_binary,
+                        read_city_binary, write_city_binary)
+import pandas as pd
+import numpy as np
+
+def generate_city_df(days=40):
+    dates = pd.date_range(start="2024-01-01 04:00", periods=days, freq="D", tz="UTC")
+    precipitation = np.random.default_rng(0).random(days)
+    return pd.DataFrame({
+        "date": dates,
+        "precipitation_sum": precipitation,
+        "precipitation_normalized": precipitation / precipitation.max(),
+    })
+
+def test_binary_round_trip(tmp_path):
+    df = generate_city_df()
+    path = write_city_binary(df, str(tmp_path / "test_daily.cbin"))
+    loaded = read_city_binary(path)
+    assert list(loaded.columns) == list(df.columns)
+    pd.testing.assert_series_equal(loaded["date"], df["date"].astype(loaded["date"].dtype))
+    np.testing.assert_allclose(loaded["precipitation_sum"], df["precipitation_sum"], rtol=1e-6)
+    assert loaded["precipitation_sum"].dtype == np.float64
+
+def test_open_city_binary_maps_requested_columns(tmp_path):
+    path = write_city_binary(generate_city_df(), str(tmp_path / "test_daily.cbin"))
+    header, arrays = open_city_binary(path, ["precipitation_sum"])
+    assert header["rows"] == 40
+    assert set(arrays) == {"day", "precipitation_sum"}
+    assert arrays["day"].dtype == np.int32
+
+def test_load_city_frame_prefers_fresh_binary(tmp_path):
+    df = generate_city_df()
+    csv_path = str(tmp_path / "test_daily.csv")
+    df.to_csv(csv_path, index=False)
+    assert load_city_frame(csv_path)["precipitation_sum"].dtype == np.float64
+
+    # the binary copy holds doubled values so it can be told apart from the CSV
+    write_city_binary(df.assign(precipitation_sum=df["precipitation_sum"] * 2), binary_path_for(csv_path))
+    loaded = load_city_frame(csv_path)
+    np.testing.assert_allclose(loaded["precipitation_sum"], df["precipitation_sum"] * 2, rtol=1e-6)
+    assert loaded["precipitation_sum"].dtype == np.float64
+
+    # a CSV rewritten after the binary copy wins again
+    later = time.time() + 10
+    os.utime(csv_path, (later, later))
+    np.testing.assert_allclose(load_city_frame(csv_path)["precipitation_sum"], df["precipitation_sum"])
+
+def test_binary_and_csv_frames_have_the_same_dtypes(tmp_path):
+    df = generate_city_df()
+    csv_path = str(tmp_path / "test_daily.csv")
+    df.to_csv(csv_path, index=False)
+    from_csv = load_city_frame(csv_path)
+    write_city_binary(df, binary_path_for(csv_path))
+    pd.testing.assert_series_equal(load_city_frame(csv_path).dtypes, from_csv.dtypes)
+    pd.testing.assert_series_equal(load_city_frame(csv_path, None, "2024-01-05", "2024-01-20").dtypes,
+                                   from_csv.dtypes)
+
+def test_binary_writer_appends_chunks(tmp_path):
+    df = generate_city_df(100)
+    path = str(tmp_path / "chunked_daily.cbin")
+    with CityBinaryWriter(path, ["precipitation_sum", "precipitation_normalized"]) as writer:
+        for start in range(0, 100, 30):
+            writer.append(df.iloc[start:start + 30])
+    with open(path, "rb") as f:
+        chunked = f.read()
+    with open(write_city_binary(df, str(tmp_path / "whole_daily.cbin")), "rb") as f:
+        assert chunked == f.read()
+
+    hourly = pd.DataFrame({"date": pd.date_range("2024-01-01", periods=50, freq="h", tz="UTC"),
+                           "precipitation": np.arange(50.0)})
+    hourly_path = str(tmp_path / "test_hourly.cbin")
+    with CityBinaryWriter(hourly_path, ["precipitation"], time_column="hour") as writer:
+        writer.append(hourly)
+    pd.testing.assert_series_equal(read_city_binary(hourly_path)["date"], hourly["date"].astype("datetime64[ns, UTC]"))
+
+def test_range_read_matches_filtered_csv(tmp_path):
+    df = generate_city_df(400)
+    csv_path = str(tmp_path / "test_daily.csv")
+    df.to_csv(csv_path, index=False)
+    from_csv = load_city_frame(csv_path, ["precipitation_sum"], "2024-03-01", "2024-06-30")
+    write_city_binary(df, binary_path_for(csv_path))
+    from_binary = load_city_frame(csv_path, ["precipitation_sum"], "2024-03-01", "2024-06-30")
+    assert len(from_binary) == 122
+    assert from_binary["date"].iloc[0].strftime("%Y-%m-%d") == "2024-03-01"
+    assert from_binary["date"].iloc[-1].strftime("%Y-%m-%d") == "2024-06-30"
+    pd.testing.assert_series_equal(from_binary["date"], from_csv["date"].astype(from_binary["date"].dtype))
+    np.testing.assert_allclose(from_binary["precipitation_sum"], from_csv["precipitation_sum"], rtol=1e-6)
+    assert len(read_city_binary(binary_path_for(csv_path), start="2030-01-01")) == 0
+
+    # without a binary copy the CSV is bisected on byte offsets
+    csv_only = str(tmp_path / "csv_only_daily.csv")
+    df.to_csv(csv_only, index=False)
+    pd.testing.assert_frame_equal(load_city_frame(csv_only, ["precipitation_sum"], end="2024-02-10"),
+                                  load_city_frame(csv_only, ["precipitation_sum"]).iloc[:41])
+    pd.testing.assert_frame_equal(load_city_frame(csv_only, ["precipitation_sum"], "2024-03-01", "2024-06-30"),
+                                  from_csv)
+    assert load_city_frame(csv_only, None, "2030-01-01", "2030-12-31")["precipitation_sum"].dtype == np.float64
+
+    hourly = pd.DataFrame({"date": pd.date_range("2024-01-01", periods=72, freq="h", tz="UTC"),
+                           "precipitation": np.arange(72.0)})
+    hourly_path = write_city_binary(hourly, str(tmp_path / "test_hourly.cbin"), time_column="hour")
+    day = read_city_binary(hourly_path, start="2024-01-02", end="2024-01-02")
+    assert day["precipitation"].tolist() == list(np.arange(24.0, 48.0))
+
+def test_convert_csv_dir_skips_registry(tmp_path):
+    generate_city_df().to_csv(tmp_path / "boston_daily.csv", index=False)
+    (tmp_path / "locations.csv").write_text("id,name,latitude,longitude\nboston,Boston,42.36,-71.06\n")
+    hourly = pd.DataFrame({"date": pd.date_range("2024-01-01", periods=50, freq="h", tz="UTC"),
+                           "precipitation": np.arange(50.0)})
+    hourly.to_csv(tmp_path / "boston_hourly.csv", index=False)
+    assert convert_csv_dir(str(tmp_path)) == [str(tmp_path / "boston_daily.cbin"), str(tmp_path / "boston_hourly.cbin")]
+    assert len(read_city_binary(str(tmp_path / "boston_daily.cbin"))) == 40
+    pd.testing.assert_series_equal(read_city_binary(str(tmp_path / "boston_hourly.cbin"))["date"],
+                                   hourly["date"].astype("datetime64[ns, UTC]"))
@@ -0,0 +1,45 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import json
+import pytest
+import cli
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def test_run_stages_writes_outputs(tmp_path):
+    out = tmp_path / 'out'
+    code = cli.main(['run', '--stages', 'cluster,forecast,anomaly', '--data-dir', DATA_DIR,
+                     '--output-dir', str(out), '--backend', 'climatology', '--days', '10',
+                     '--cities', 'Boston,Miami,Seattle', '-k', '2'])
+    assert code == 0
+
+    summary = json.loads((out / 'run_summary.json').read_text())
+    assert [s['stage'] for s in summary['stages']] == ['cluster', 'forecast', 'anomaly']
+    assert all(s['status'] == 'ok' and s['seconds'] >= 0 for s in summary['stages'])
+
+    clusters = json.loads((out / 'clusters.json').read_text())
+    assert sorted(c['city'] for c in clusters) == ['Boston', 'Miami', 'Seattle']
+    forecast = json.loads((out / 'forecast.json').read_text())
+    assert len(forecast) == 30
+    anomalies = json.loads((out / 'anomalies.json').read_text())
+    assert {a['city'] for a in anomalies} <= {'Boston', 'Miami', 'Seattle'}
+
+def test_run_reuses_loaded_frames(tmp_path):
+    cli.main(['run', '--stages', 'cluster,anomaly', '--data-dir', DATA_DIR, '--output-dir', str(tmp_path),
+              '--cities', 'Boston,Miami', '-k', '2'])
+    summary = json.loads((tmp_path / 'run_summary.json').read_text())
+    assert summary['data_store']['misses'] == 2
+    assert summary['data_store']['hits'] >= 2
+
+def test_failed_stage_exit_code(tmp_path):
+    code = cli.main(['cluster', '--data-dir', DATA_DIR, '--output-dir', str(tmp_path), '--cities', 'Atlantis'])
+    assert code == 1
+    summary = json.loads((tmp_path / 'run_summary.json').read_text())
+    assert summary['stages'][0]['status'] == 'failed'
+
+def test_unknown_stage_is_usage_error(tmp_path):
+    with pytest.raises(SystemExit) as exc:
+        cli.main(['run', '--stages', 'cluster,bogus', '--output-dir', str(tmp_path)])
+    assert exc.value.code == 2
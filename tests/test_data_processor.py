@@ -0,0 +1,209 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from city_store import load_city_frame
+from data_processor import RateLimiter, StreamingCleaner, WeatherDataProcessor, latest_available_date
+from datetime import date
+from openmeteo_stub import ArchiveStubServer, fake_values
+import pandas as pd
+import numpy as np
+
+test_cities = [
+    {"name": "Tallahassee", "latitude": 30.4382, "longitude": -84.2806},
+    {"name": "New York", "latitude": 40.7128, "longitude": -74.0060},
+    {"name": "Boston", "latitude": 42.3601, "longitude": -71.0589},
+]
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+def make_processor(tmp_path, url):
+    return WeatherDataProcessor(cache_dir=str(tmp_path / "cache"), retries=0, url=url)
+
+def test_rate_limiter_spaces_requests_after_burst():
+    clock = FakeClock()
+    limiter = RateLimiter(per_minute=2, per_hour=100, clock=clock, sleep=clock.sleep)
+    for _ in range(4):
+        limiter.acquire()
+    # two requests burst, the next two wait for the per-minute bucket to refill
+    assert abs(clock.now - 60) < 1e-6
+
+def test_rate_limiter_pause():
+    clock = FakeClock()
+    limiter = RateLimiter(per_minute=100, per_hour=100, clock=clock, sleep=clock.sleep)
+    limiter.pause(5)
+    limiter.acquire()
+    assert clock.now >= 5
+
+def test_concurrent_fetch_saves_every_city(tmp_path):
+    with ArchiveStubServer() as server:
+        processor = make_processor(tmp_path, server.url)
+        saved = processor.process_and_save_concurrent(test_cities, str(tmp_path), max_workers=3,
+                                                      rate_limiter=RateLimiter(per_minute=100, per_hour=100))
+    assert len(saved) == 3
+    df = pd.read_csv(tmp_path / "new_york_daily.csv", parse_dates=["date"])
+    assert df["date"].iloc[0] == pd.Timestamp("2000-11-22 04:00", tz="UTC")
+    assert df["date"].iloc[-1] == pd.Timestamp("2025-04-02 04:00", tz="UTC")
+    assert df["precipitation_normalized"].max() == 1.0
+    expected = fake_values(40.7128, -74.0060, 1, df["date"].iloc[0].value // 86400_000_000_000)[0]
+    assert np.isclose(df["precipitation_sum"].iloc[0], expected, rtol=1e-6)
+
+def test_concurrent_fetch_retries_after_429(tmp_path):
+    with ArchiveStubServer(rate_limit_first=2) as server:
+        processor = make_processor(tmp_path, server.url)
+        results = dict((city["name"], df) for city, df in processor.fetch_cities_concurrently(
+            test_cities, "2024-01-01", "2024-01-31", max_workers=2,
+            rate_limiter=RateLimiter(per_minute=100, per_hour=100)))
+        assert len(server.requests) == 5
+    assert all(df is not None and len(df) == 31 for df in results.values())
+
+def test_latest_available_date_respects_lag():
+    assert latest_available_date(date(2025, 4, 9)) == "2025-04-02"
+
+def test_incremental_refresh_fetches_only_missing_days(tmp_path):
+    city = test_cities[1]
+    with ArchiveStubServer() as server:
+        processor = make_processor(tmp_path, server.url)
+        stored = processor.fetch_city_data(city["latitude"], city["longitude"], "2024-01-01", "2024-01-20")
+        processor.save_city_data(city, stored, str(tmp_path))
+
+        processor.refresh_city(city, str(tmp_path), end_date="2024-02-10")
+        assert server.requests[-1]["start_date"] == ["2024-01-06"]  # 14 days of overlap
+        assert server.requests[-1]["end_date"] == ["2024-02-10"]
+
+        full = processor.fetch_city_data(city["latitude"], city["longitude"], "2024-01-01", "2024-02-10")
+        assert processor.refresh_city(city, str(tmp_path), end_date="2024-02-10") is None
+
+    refreshed = pd.read_csv(tmp_path / "new_york_daily.csv", parse_dates=["date"])
+    expected = processor.normalize_data(processor.clean_data(full))
+    assert len(refreshed) == 41
+    np.testing.assert_allclose(refreshed["precipitation_sum"], expected["precipitation_sum"], rtol=1e-6)
+    np.testing.assert_allclose(refreshed["precipitation_normalized"], expected["precipitation_normalized"], rtol=1e-6)
+
+def test_merge_refresh_interpolates_across_boundary_and_rescales(tmp_path):
+    processor = make_processor(tmp_path, "http://127.0.0.1:9/unused")
+    city = {"name": "Test", "latitude": 0.0, "longitude": 0.0}
+    dates = pd.date_range("2024-01-01 04:00", periods=6, freq="D", tz="UTC")
+    stored = processor.normalize_data(pd.DataFrame({"date": dates[:3], "precipitation_sum": [0.5, 1.0, 1.0]}))
+    new_df = pd.DataFrame({"date": dates[3:], "precipitation_sum": [np.nan, 3.0, 4.0]})
+
+    processor.merge_refresh(city, stored, new_df, str(tmp_path))
+    merged = pd.read_csv(tmp_path / "test_daily.csv")
+    np.testing.assert_allclose(merged["precipitation_sum"], [0.5, 1.0, 1.0, 2.0, 3.0, 4.0])
+    np.testing.assert_allclose(merged["precipitation_normalized"], merged["precipitation_sum"] / 4.0)
+
+def test_merge_refresh_splices_by_day_across_offset_change(tmp_path):
+    processor = make_processor(tmp_path, "http://127.0.0.1:9/unused")
+    city = {"name": "Test", "latitude": 0.0, "longitude": 0.0}
+    stored_dates = pd.date_range("2024-11-01 04:00", periods=5, freq="D", tz="UTC")
+    stored = processor.normalize_data(pd.DataFrame({"date": stored_dates, "precipitation_sum": [1.0] * 5}))
+    # the refresh overlaps the last two stored days and arrives after the DST change
+    new_dates = pd.date_range("2024-11-04 05:00", periods=3, freq="D", tz="UTC")
+    new_df = pd.DataFrame({"date": new_dates, "precipitation_sum": [2.0, 3.0, 4.0]})
+
+    path = processor.merge_refresh(city, stored, new_df, str(tmp_path))
+    merged = load_city_frame(path)
+    assert merged["date"].tolist() == list(pd.date_range("2024-11-01 04:00", periods=6, freq="D", tz="UTC"))
+    np.testing.assert_allclose(merged["precipitation_sum"], [1.0, 1.0, 1.0, 2.0, 3.0, 4.0])
+
+def test_fetch_cities_data_batches_locations(tmp_path):
+    with ArchiveStubServer() as server:
+        processor = make_processor(tmp_path, server.url)
+        results = processor.fetch_cities_data(test_cities, "2024-01-01", "2024-01-10", batch_size=2,
+                                              rate_limiter=RateLimiter(per_minute=100, per_hour=100))
+        assert len(server.requests) == 2
+        assert server.requests[0]["latitude"] == ["30.4382", "40.7128"]
+    assert list(results) == ["Tallahassee", "New York", "Boston"]
+    for city in test_cities:
+        df = results[city["name"]]
+        first_day = df["date"].iloc[0].value // 86400_000_000_000
+        np.testing.assert_allclose(df["precipitation_sum"],
+                                   fake_values(city["latitude"], city["longitude"], 10, first_day), rtol=1e-6)
+
+def test_concurrent_fetch_in_batches(tmp_path):
+    with ArchiveStubServer() as server:
+        processor = make_processor(tmp_path, server.url)
+        results = dict((city["name"], df) for city, df in processor.fetch_cities_concurrently(
+            test_cities, "2024-01-01", "2024-01-31", batch_size=3,
+            rate_limiter=RateLimiter(per_minute=100, per_hour=100)))
+        assert len(server.requests) == 1
+    assert all(len(df) == 31 for df in results.values())
+
+def test_fetch_several_variables_in_one_request(tmp_path):
+    city = test_cities[2]
+    variables = ["precipitation_sum", "temperature_2m_max", "wind_speed_10m_max"]
+    with ArchiveStubServer() as server:
+        processor = WeatherDataProcessor(cache_dir=str(tmp_path / "cache"), retries=0, url=server.url,
+                                         variables=variables)
+        df = processor.fetch_city_data(city["latitude"], city["longitude"], "2024-01-01", "2024-01-10")
+        path = processor.save_city_data(city, df, str(tmp_path))
+        assert len(server.requests) == 1
+        assert [v for item in server.requests[0]["daily"] for v in item.split(",")] == variables
+
+    temperature = load_city_frame(path, ["temperature_2m_max"])  # only the requested column is read
+    assert list(temperature.columns) == ["date", "temperature_2m_max"]
+    first_day = temperature["date"].iloc[0].value // 86400_000_000_000
+    np.testing.assert_allclose(temperature["temperature_2m_max"],
+                               fake_values(city["latitude"] + 1, city["longitude"], 10, first_day), rtol=1e-6)
+
+def test_clean_data_applies_per_variable_rules(tmp_path):
+    processor = make_processor(tmp_path, "http://127.0.0.1:9/unused")
+    df = pd.DataFrame({
+        "date": pd.date_range("2024-01-01 04:00", periods=4, freq="D", tz="UTC"),
+        "precipitation_sum": [np.nan, -1.0, 2.0, np.nan],
+        "temperature_2m_max": [np.nan, -5.0, np.nan, 3.0],
+        "unknown_variable": [np.nan, 100.0, np.nan, 200.0],
+    })
+    cleaned = processor.clean_data(df)
+    np.testing.assert_allclose(cleaned["precipitation_sum"], [0.0, 0.0, 2.0, 2.0])
+    np.testing.assert_allclose(cleaned["temperature_2m_max"], [-5.0, -5.0, -1.0, 3.0])  # negatives are valid here
+    np.testing.assert_allclose(cleaned["unknown_variable"], [np.nan, 100.0, 150.0, 200.0])
+
+def test_streaming_cleaner_matches_cleaning_all_at_once(tmp_path):
+    processor = make_processor(tmp_path, "http://127.0.0.1:9/unused")
+    rng = np.random.default_rng(1)
+    n = 300
+    df = pd.DataFrame({"date": pd.date_range("2024-01-01", periods=n, freq="h", tz="UTC"),
+                       "precipitation": rng.random(n) - 0.1, "temperature_2m": rng.random(n) * 10})
+    for column in ["precipitation", "temperature_2m"]:
+        df.loc[rng.random(n) < 0.3, column] = np.nan
+    df.loc[:30, "precipitation"] = np.nan  # gaps spanning several chunks at both ends
+    df.loc[260:, "temperature_2m"] = np.nan
+    expected = processor.clean_data(df.copy()).reset_index(drop=True)
+    for size in [1, 7, 50, 1000]:
+        cleaner = StreamingCleaner(processor.clean_data)
+        parts = [cleaner.push(df.iloc[i:i + size]) for i in range(0, n, size)] + [cleaner.finish()]
+        pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), expected)
+
+def test_stream_hourly_city_writes_hourly_and_daily_files(tmp_path):
+    city = test_cities[2]
+    variables = ["precipitation", "temperature_2m"]
+    with ArchiveStubServer() as server:
+        processor = make_processor(tmp_path, server.url)
+        hourly_path, daily_path = processor.stream_hourly_city(
+            city, str(tmp_path), "2024-01-01", "2024-01-20", variables, chunk_days=6,
+            rate_limiter=RateLimiter(per_minute=100, per_hour=100))
+        assert len(server.requests) == 4
+        assert server.requests[0]["hourly"] == variables
+        full = processor._request_many([city["latitude"]], [city["longitude"]], "2024-01-01", "2024-01-20",
+                                       variables, hourly=True)[0]
+
+    expected = processor.clean_data(full)
+    hourly = load_city_frame(hourly_path)  # from the .cbin, with hour numbers
+    assert len(hourly) == 20 * 24
+    np.testing.assert_allclose(hourly["temperature_2m"], expected["temperature_2m"], rtol=1e-6)
+
+    daily = pd.read_csv(daily_path, parse_dates=["date"])
+    assert len(daily) == 20 and (daily["date"].dt.hour == 4).all()  # local midnight, like the daily archive
+    totals = expected["precipitation"].to_numpy().reshape(20, 24).sum(axis=1)
+    np.testing.assert_allclose(daily["precipitation_sum"], totals, rtol=1e-6)
+    np.testing.assert_allclose(daily["precipitation_normalized"], totals / totals.max(), rtol=1e-6)
+    assert not any(name.endswith((".spool", ".tmp")) for name in os.listdir(tmp_path))
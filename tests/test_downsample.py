@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import matplotlib
+matplotlib.use('Agg')
+import numpy as np
+import pytest
+from matplotlib.dates import date2num
+from downsample import downsample_indices, lttb_indices, minmax_indices
+from visualizer import AnomalyVisualizer
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def test_minmax_keeps_extremes_of_every_bucket():
+    y = np.random.default_rng(0).gamma(0.5, 0.3, 9000)
+    y[100:250] = np.nan
+    kept = minmax_indices(y, 300)
+    assert len(kept) <= 2 * 300 + 2
+    assert kept[0] == 0 and kept[-1] == len(y) - 1
+    for bucket in np.array_split(np.arange(len(y)), 300):  # 9000 splits evenly, matching the buckets
+        values = y[bucket]
+        if not np.isnan(values).all():
+            assert np.nanmax(values) in y[kept] and np.nanmin(values) in y[kept]
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_forced_points_are_always_kept(method):
+    rng = np.random.default_rng(1)
+    y = rng.gamma(0.5, 0.3, 5000)
+    keep = rng.random(5000) < 0.01
+    kept = downsample_indices(np.arange(5000), y, 400, method, keep)
+    assert set(np.flatnonzero(keep)) <= set(kept)
+    assert len(kept) < 400 + keep.sum() + 2
+
+def test_lttb_returns_requested_count():
+    x = np.linspace(0, 10, 2000)
+    assert len(lttb_indices(x, np.sin(x), 100)) == 100
+
+def test_plots_reuse_figures(tmp_path):
+    visualizer = AnomalyVisualizer(None, DATA_DIR, downsample='minmax')
+    files = list(visualizer.city_files.values())[:3]
+    visualizer.plot_anomalies(files, output_path=str(tmp_path / 'a.png'))
+    figure = visualizer._figures['anomalies']
+    line = figure.axes[0].lines[0]
+    assert len(line.get_xdata()) < 3000  # ~8.9k days drawn as about two points per pixel
+    visualizer.plot_anomalies(files, output_path=str(tmp_path / 'b.png'))
+    assert visualizer._figures['anomalies'] is figure
+    assert len(figure.axes) == 3  # 2x2 grid, the unused subplot is removed again
+    assert (tmp_path / 'b.png').stat().st_size > 0
+
+@pytest.mark.parametrize("method", ["minmax", "lttb"])
+def test_plotted_points_stay_within_budget_and_keep_anomalies(tmp_path, method):
+    visualizer = AnomalyVisualizer(None, DATA_DIR, downsample=method)
+    files = list(visualizer.city_files.values())[:2]
+    visualizer.plot_anomalies(files, output_path=str(tmp_path / 'a.png'))
+    for ax in visualizer._figures['anomalies'].axes:
+        line_dates = set(ax.lines[0].get_xdata())
+        anomaly_dates = ax.collections[0].get_offsets()[:, 0]
+        width = ax.get_window_extent().width
+        assert len(line_dates) <= 2 * width + len(anomaly_dates) + 2
+        assert set(anomaly_dates) <= set(date2num(sorted(line_dates)))
@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+import algorithms
+from algorithms import ClusteringAlgorithm
+from panel import CityPanel
+from visualizer import ClusteringVisualizer
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def synthetic_panel(per_group=15, seed=0):
+    # three climates: dry, wet with a winter peak, wet with a summer peak
+    rng = np.random.default_rng(seed)
+    days = np.arange(10957, 10957 + 6 * 365)  # 2000-01-01 onwards
+    season = np.cos(2 * np.pi * (days - 10957) / 365.25)
+    rows, names = [], []
+    for group, (scale, shape) in enumerate([(0.02, 0.0), (0.3, 1.0), (0.3, -1.0)]):
+        for i in range(per_group):
+            mean = scale * (1 + 0.8 * shape * season)
+            rows.append(rng.gamma(2.0, mean / 2.0))
+            names.append(f"group{group}_{i}")
+    return CityPanel(np.vstack(rows), names, days[0], 4 * 3600)
+
+def test_auto_k_finds_climate_groups():
+    algorithm = ClusteringAlgorithm(DATA_DIR, feature_cache_dir=None)
+    result = algorithm.run_feature_clustering(synthetic_panel(), k_values=range(2, 7))
+    assert result.k == 3
+    assert list(result.scores.index) == [2, 3, 4, 5, 6]
+    groups = [name.split('_')[0] for name in result.features.index]
+    assert len(set(zip(groups, result.labels_))) == 3  # every group lands in a single cluster
+
+def test_parallel_sweep_and_minibatch(monkeypatch):
+    algorithm = ClusteringAlgorithm(DATA_DIR, feature_cache_dir=None)
+    panel = synthetic_panel(per_group=8)
+    serial = algorithm.run_feature_clustering(panel, k_values=range(2, 5))
+    parallel = algorithm.run_feature_clustering(panel, k_values=range(2, 5), max_workers=2)
+    pd.testing.assert_frame_equal(serial.scores, parallel.scores)
+
+    monkeypatch.setattr(algorithms, 'MINIBATCH_THRESHOLD', 10)
+    result = algorithm.run_feature_clustering(panel, k=3)
+    assert type(result.model).__name__ == 'MiniBatchKMeans'
+
+def test_feature_matrix_is_cached(tmp_path, monkeypatch):
+    algorithm = ClusteringAlgorithm(DATA_DIR, feature_cache_dir=str(tmp_path))
+    cities = ["Boston", "Miami", "Phoenix", "Seattle"]
+    features = algorithm.climate_features(cities)
+    assert list(features.index) == cities
+    assert features.shape[1] == 15
+    assert (features['wet_day_frequency'].between(0, 1)).all()
+
+    def no_loading(*args, **kwargs):
+        raise AssertionError("features should come from the cache")
+    monkeypatch.setattr(algorithm, 'load_panel', no_loading)
+    pd.testing.assert_frame_equal(algorithm.climate_features(cities), features)
+
+def test_result_keeps_plot_contract():
+    algorithm = ClusteringAlgorithm(DATA_DIR, feature_cache_dir=None)
+    cities = ["Boston", "Miami", "Phoenix", "Seattle", "Los Angeles"]
+    result = algorithm.run_feature_clustering(cities, k=2)
+    assert result.cluster_centers_.shape == (2, len(result.yearly))
+    fig = ClusteringVisualizer().plot(result.yearly, result, result.k)
+    assert isinstance(fig, plt.Figure)
+    plt.close(fig)
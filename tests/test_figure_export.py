@@ -0,0 +1,42 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import json
+import numpy as np
+import pandas as pd
+import cli
+from figure_export import FigureExporter, city_anomaly_task
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def city_frame(values):
+    dates = pd.date_range("2020-01-01 04:00", periods=len(values), freq="D", tz="UTC")
+    return pd.DataFrame({"date": dates, "precipitation_sum": values})
+
+def test_unchanged_charts_are_not_redrawn(tmp_path):
+    rng = np.random.default_rng(0)
+    frames = {city: city_frame(rng.gamma(0.5, 0.3, 400)) for city in ["Boston", "Miami", "Seattle"]}
+    tasks = [city_anomaly_task(city, df, df['precipitation_sum'].to_numpy() > 1.5) for city, df in frames.items()]
+    exporter = FigureExporter(str(tmp_path), max_workers=2)
+    paths = exporter.export(tasks)
+    assert exporter.stats() == {'rendered': 3, 'cached': 0}
+    assert len(set(paths.values())) == 3 and all(os.path.exists(p) for p in paths.values())
+
+    frames["Miami"].loc[0, 'precipitation_sum'] = 9.0  # only Miami's data changes
+    tasks = [city_anomaly_task(city, df, df['precipitation_sum'].to_numpy() > 1.5) for city, df in frames.items()]
+    new_paths = exporter.export(tasks)
+    assert exporter.stats() == {'rendered': 4, 'cached': 2}
+    assert new_paths["anomalies Miami"] != paths["anomalies Miami"]
+    assert not os.path.exists(paths["anomalies Miami"])  # the stale render is pruned
+    manifest = json.loads((tmp_path / 'figures.json').read_text())
+    assert manifest["anomalies Miami"] == os.path.basename(new_paths["anomalies Miami"])
+
+def test_cli_exports_per_city_and_cluster_figures(tmp_path):
+    args = ['run', '--stages', 'cluster,forecast,anomaly', '--data-dir', DATA_DIR, '--output-dir', str(tmp_path),
+            '--backend', 'climatology', '--days', '10', '--cities', 'Boston,Miami,Seattle', '-k', '2', '--figures']
+    assert cli.main(args) == 0
+    manifest = json.loads((tmp_path / 'figures' / 'figures.json').read_text())
+    assert len(manifest) == 3 + 3 + 2  # anomalies and forecast per city, one chart per cluster
+    summary = json.loads((tmp_path / 'run_summary.json').read_text())
+    assert summary['stages'][-1]['stage'] == 'figures'
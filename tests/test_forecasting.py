@@ -47,3 +47,34 @@ def test_anomaly_detector_detects_known_outlier():
     assert isinstance(result, np.ndarray)
     assert result.shape[0] == len(values)
     assert result[-1] == True
+
+def test_predict_all_cities_parallel_keeps_order():
+    df = generate_mock_df()
+    result = ForecastingAlgorithm.predict_all_cities(df, "precipitation_sum", forecast_days=5, max_workers=2)
+    assert list(result["city"].unique()) == ["New York", "Los Angeles"]
+    assert len(result) == 10
+    assert result.attrs["errors"] == []
+
+def test_predict_all_cities_reports_failed_city():
+    df = generate_mock_df()
+    df.loc[df["city"] == "Los Angeles", "precipitation_sum"] = np.nan  # Prophet cannot fit an all-NaN series
+    result = ForecastingAlgorithm.predict_all_cities(df, "precipitation_sum", forecast_days=5)
+    assert list(result["city"].unique()) == ["New York"]
+    assert [e["city"] for e in result.attrs["errors"]] == ["Los Angeles"]
+
+def test_predict_all_cities_climatology_backend():
+    df = generate_mock_df()
+    result = ForecastingAlgorithm.predict_all_cities(df, "precipitation_sum", forecast_days=7, backend="climatology")
+    prophet_result = ForecastingAlgorithm.predict_with_prophet(df, "precipitation_sum", "New York", forecast_days=7)
+    assert list(result.columns) == ["date", "predicted_precipitation_sum", "city"]
+    assert len(result) == 14
+    new_york = result[result["city"] == "New York"].reset_index(drop=True)
+    assert list(new_york["date"]) == list(prophet_result["date"])
+
+def test_climatology_follows_seasonal_cycle():
+    dates = pd.date_range(start="2015-01-01", end="2024-12-31")
+    seasonal = 1 + np.sin(2 * np.pi * dates.dayofyear / 365.25)
+    df = pd.DataFrame({"city": "Miami", "date": dates, "precipitation_sum": seasonal})
+    result = ForecastingAlgorithm.predict_with_climatology(df, "precipitation_sum", "Miami", forecast_days=30)
+    expected = 1 + np.sin(2 * np.pi * result["date"].dt.dayofyear / 365.25)
+    assert np.abs(result["predicted_precipitation_sum"] - expected).max() < 0.05
@@ -0,0 +1,92 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import threading
+import time
+import pytest
+from jobs import JobExecutor, JobCancelled
+from algorithms import ForecastingAlgorithm
+from data_processor import RateLimiter, WeatherDataProcessor
+from openmeteo_stub import ArchiveStubServer
+from sample_data import generate_mock_df, test_cities
+
+def wait_for(executor, job, timeout=30):
+    deadline = time.monotonic() + timeout
+    while job.status in ('pending', 'running'):
+        assert time.monotonic() < deadline, "job did not finish"
+        executor.poll()
+        time.sleep(0.01)
+
+def test_callbacks_run_on_polling_thread():
+    executor = JobExecutor(max_workers=2)
+    events = []
+    def work(job, n):
+        for i in range(n):
+            job.progress(i + 1, n, f"city {i}")
+        return threading.get_ident()
+    job = executor.submit("count", work, 3,
+                          on_progress=lambda job, done, total, item: events.append((done, total, item)),
+                          on_done=lambda job, result: events.append(threading.get_ident()))
+    wait_for(executor, job)
+    executor.shutdown()
+    assert job.status == 'done'
+    assert events == [(1, 3, "city 0"), (2, 3, "city 1"), (3, 3, "city 2"), threading.get_ident()]
+    assert job.result != threading.get_ident()
+
+def test_cancel_stops_between_cities():
+    executor = JobExecutor()
+    started = threading.Event()
+    release = threading.Event()
+    seen = []
+    def work(job):
+        for i in range(10):
+            started.set()
+            release.wait()
+            seen.append(i)
+            job.progress(i + 1, 10)
+    cancelled = []
+    job = executor.submit("slow", work, on_cancel=cancelled.append)
+    started.wait()
+    job.cancel()
+    release.set()
+    wait_for(executor, job)
+    executor.shutdown()
+    assert job.status == 'cancelled'
+    assert cancelled == [job]
+    assert seen == [0]
+
+def test_failed_job_reports_error():
+    executor = JobExecutor()
+    def work(job):
+        raise ValueError("bad data")
+    errors = []
+    job = executor.submit("broken", work, on_error=lambda job, e: errors.append(e))
+    wait_for(executor, job)
+    executor.shutdown()
+    assert job.status == 'failed'
+    assert isinstance(errors[0], ValueError)
+
+def test_predict_all_cities_reports_progress_and_stops():
+    df = generate_mock_df()
+    progress = []
+    ForecastingAlgorithm.predict_all_cities(df, "precipitation_sum", forecast_days=3,
+                                            progress=lambda *args: progress.append(args))
+    assert progress == [(1, 2, "New York"), (2, 2, "Los Angeles")]
+
+    def stop(done, total, city):
+        raise JobCancelled()
+    with pytest.raises(JobCancelled):
+        ForecastingAlgorithm.predict_all_cities(df, "precipitation_sum", forecast_days=3, max_workers=2,
+                                                progress=stop)
+
+def test_process_and_save_cancelled_after_first_city(tmp_path):
+    def stop(done, total, city):
+        raise JobCancelled()
+    with ArchiveStubServer() as server:
+        processor = WeatherDataProcessor(cache_dir=str(tmp_path / "cache"), retries=0, url=server.url)
+        with pytest.raises(JobCancelled):
+            processor.process_and_save_concurrent(test_cities, str(tmp_path), max_workers=1,
+                                                  rate_limiter=RateLimiter(per_minute=100, per_hour=100),
+                                                  progress=stop)
+    assert len(list(tmp_path.glob("*_daily.csv"))) == 1
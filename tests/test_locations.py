@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+from algorithms import ClusteringAlgorithm
+from data_processor import WeatherDataProcessor
+from locations import EARTH_RADIUS_KM, LocationRegistry
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+def test_spatial_queries_match_brute_force():
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(-60, 70, 500), rng.uniform(-180, 180, 500)
+    registry = LocationRegistry([{'name': f"Station {i}", 'latitude': lat, 'longitude': lon}
+                                 for i, (lat, lon) in enumerate(zip(lats, lons))])
+    distances = haversine_km(lats, lons, 40.0, -75.0)
+
+    nearest = registry.nearest(40.0, -75.0, k=5)
+    assert [loc['id'] for loc, _ in nearest] == [f"station_{i}" for i in np.argsort(distances)[:5]]
+    np.testing.assert_allclose([d for _, d in nearest], np.sort(distances)[:5])
+
+    within = registry.within(40.0, -75.0, 1500)
+    assert sorted(loc['id'] for loc, _ in within) == sorted(f"station_{i}" for i in np.flatnonzero(distances <= 1500))
+    assert [d for _, d in within] == sorted(d for _, d in within)
+
+def test_ids_are_stable_and_round_trip(tmp_path):
+    registry = LocationRegistry.from_data_dir(DATA_DIR)
+    assert registry['new york'] is registry['new_york']
+    added = registry.add("New York ", 40.7, -74.0)  # same slug as an existing location
+    assert added['id'] == 'new_york_2'
+    path = registry.save(str(tmp_path / 'locations.csv'))
+    loaded = LocationRegistry.load(path)
+    assert loaded.locations == registry.locations
+    assert WeatherDataProcessor().city_file_path(added, 'out') == 'out/new_york_2_daily.csv'
+
+def test_loaders_use_registry_names():
+    registry = LocationRegistry.from_data_dir(DATA_DIR)
+    algorithm = ClusteringAlgorithm(DATA_DIR)
+    assert list(algorithm.cityFiles) == registry.names
+    assert 'Locations' not in algorithm.cityFiles  # the registry file itself is not a city
+    assert registry.name_for_file(algorithm.cityFiles['San Francisco']) == 'San Francisco'
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from algorithms import ForecastingAlgorithm
+from model_cache import ProphetModelCache
+import pandas as pd
+import numpy as np
+
+def generate_mock_df(seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start="2024-01-01", periods=60)
+    return pd.DataFrame({
+        "city": "New York",
+        "date": dates,
+        "precipitation_sum": rng.random(60),
+    })
+
+def test_cache_hit_reuses_fitted_model(tmp_path):
+    cache = ProphetModelCache(str(tmp_path))
+    df = generate_mock_df()
+    first = ForecastingAlgorithm.predict_with_prophet(df, "precipitation_sum", "New York", 7, cache=cache)
+    second = ForecastingAlgorithm.predict_with_prophet(df, "precipitation_sum", "New York", 7, cache=cache)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    pd.testing.assert_frame_equal(first, second)
+
+def test_changed_data_misses(tmp_path):
+    cache = ProphetModelCache(str(tmp_path))
+    ForecastingAlgorithm.predict_with_prophet(generate_mock_df(0), "precipitation_sum", "New York", 7, cache=cache)
+    ForecastingAlgorithm.predict_with_prophet(generate_mock_df(1), "precipitation_sum", "New York", 7, cache=cache)
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["entries"] == 2
+
+def test_invalidate_and_eviction(tmp_path):
+    cache = ProphetModelCache(str(tmp_path))
+    ForecastingAlgorithm.predict_with_prophet(generate_mock_df(0), "precipitation_sum", "New York", 7, cache=cache)
+    assert cache.invalidate("Los Angeles") == 0
+    assert cache.invalidate("New York") == 1
+
+    small = ProphetModelCache(str(tmp_path), max_bytes=1)
+    for seed in range(3):
+        ForecastingAlgorithm.predict_with_prophet(generate_mock_df(seed), "precipitation_sum", "New York", 7, cache=small)
+    assert small.stats()["entries"] == 1  # only the newest model is kept
+    assert small.stats()["evictions"] == 2
+
+def test_parallel_counters_merge(tmp_path):
+    cache = ProphetModelCache(str(tmp_path))
+    df = pd.concat([generate_mock_df(0), generate_mock_df(1).assign(city="Boston")], ignore_index=True)
+    ForecastingAlgorithm.predict_all_cities(df, "precipitation_sum", forecast_days=5, max_workers=2, cache=cache)
+    ForecastingAlgorithm.predict_all_cities(df, "precipitation_sum", forecast_days=5, max_workers=2, cache=cache)
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["hits"] == 2
@@ -0,0 +1,51 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import numpy as np
+import pandas as pd
+from algorithms import AnomalyDetector, ClusteringAlgorithm, ForecastingAlgorithm
+from panel import CityPanel
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def city_frame(start, values):
+    dates = pd.date_range(f"{start} 04:00", periods=len(values), freq="D", tz="UTC")
+    return pd.DataFrame({"date": dates, "precipitation_sum": values})
+
+def test_from_frames_aligns_days_with_gaps():
+    boston = city_frame("2020-01-01", [1.0, 2.0, 3.0])
+    miami = city_frame("2020-01-02", [4.0, 5.0, 6.0]).drop(index=1)  # missing 2020-01-03
+    panel = CityPanel.from_frames({"Boston": boston, "Miami": miami})
+    assert panel.shape == (2, 4)
+    assert panel.values.dtype == np.float32
+    np.testing.assert_array_equal(panel.city("Miami"), [np.nan, 4.0, np.nan, 6.0])
+    assert panel.dates[0] == pd.Timestamp("2020-01-01 04:00", tz="UTC")
+    pd.testing.assert_frame_equal(panel.to_frame("Boston"), boston.astype({"precipitation_sum": np.float32}))
+
+def test_slicing_is_zero_copy():
+    panel = CityPanel.from_frames({"Boston": city_frame("2020-01-01", np.arange(10.0))})
+    assert np.shares_memory(panel.city("Boston"), panel.values)
+    window = panel.between("2020-01-03", "2020-01-05")
+    assert np.shares_memory(window.values, panel.values)
+    np.testing.assert_array_equal(window.city("Boston"), [2.0, 3.0, 4.0])
+    assert window.dates[0] == pd.Timestamp("2020-01-03 04:00", tz="UTC")
+
+def test_analyses_accept_panel():
+    algorithm = ClusteringAlgorithm(DATA_DIR)
+    cities = ["Boston", "Miami", "Phoenix"]
+    panel = algorithm.load_panel(cities)
+    expected = algorithm.compute_yearly_averages(cities)
+    np.testing.assert_allclose(algorithm.compute_yearly_averages(panel).to_numpy(), expected.to_numpy(), rtol=1e-6)
+
+    detector = AnomalyDetector()
+    flags = detector.detect(panel)
+    assert flags.shape == panel.shape
+    np.testing.assert_array_equal(flags[1], detector.detect(panel.city("Miami")))
+
+    long_df = pd.concat([algorithm.load_city_data(c).assign(city=c) for c in cities], ignore_index=True)
+    from_panel = ForecastingAlgorithm.predict_all_cities(panel, "precipitation_sum", forecast_days=5,
+                                                         backend="climatology")
+    from_frame = ForecastingAlgorithm.predict_all_cities(long_df, "precipitation_sum", forecast_days=5,
+                                                         backend="climatology")
+    pd.testing.assert_frame_equal(from_panel, from_frame, rtol=1e-5)
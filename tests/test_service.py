@@ -0,0 +1,62 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import json
+import shutil
+import threading
+import urllib.error
+import urllib.request
+import pytest
+from service import ForecastServer, ResultStore
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+@pytest.fixture
+def server(tmp_path):
+    for name in ['boston_daily.csv', 'miami_daily.csv', 'seattle_daily.csv']:
+        shutil.copy(os.path.join(DATA_DIR, name), tmp_path / name)
+    store = ResultStore(str(tmp_path), forecast_days=10)
+    store.refresh()
+    server = ForecastServer(('127.0.0.1', 0), store)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def get(server, path, etag=None):
+    request = urllib.request.Request(f"http://127.0.0.1:{server.server_address[1]}{path}",
+                                     headers={'If-None-Match': etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers['ETag'], response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers['ETag'], e.read()
+
+def test_serves_precomputed_results(server):
+    status, _, body = get(server, '/cities')
+    assert status == 200
+    assert [city['name'] for city in json.loads(body)['cities']] == ['Boston', 'Miami', 'Seattle']
+    status, _, body = get(server, '/forecast/boston')
+    assert status == 200 and len(json.loads(body)['forecast']) == 10
+    assert get(server, '/forecast/Boston')[2] == body
+    assert 'Miami' in json.loads(get(server, '/anomalies')[2])['anomalies']
+    assert get(server, '/forecast/paris')[0] == 404
+
+def test_etag_changes_only_when_the_data_file_does(server, tmp_path):
+    _, boston_etag, _ = get(server, '/forecast/boston')
+    _, miami_etag, _ = get(server, '/forecast/miami')
+    assert get(server, '/forecast/boston', boston_etag)[:2] == (304, boston_etag)
+
+    path = tmp_path / 'miami_daily.csv'
+    lines = path.read_text().splitlines()
+    path.write_text("\n".join(lines[:-60]) + "\n")  # drop the last 60 days
+    assert server.store.refresh() == ['Miami']
+    assert get(server, '/forecast/boston', boston_etag)[0] == 304
+    status, new_etag, _ = get(server, '/forecast/miami', miami_etag)
+    assert status == 200 and new_etag != miami_etag
+
+def test_if_none_match_star_matches_any_existing_resource(server):
+    _, boston_etag, _ = get(server, '/forecast/boston')
+    assert get(server, '/forecast/boston', '*')[:2] == (304, boston_etag)
+    assert get(server, '/forecast/paris', '*')[0] == 404
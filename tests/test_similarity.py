@@ -0,0 +1,67 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import shutil
+import time
+import numpy as np
+import pandas as pd
+import pytest
+from algorithms import ClusteringAlgorithm
+from similarity import SimilarityIndex
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+def random_profiles(n, width=12, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.random((n, width)), index=[f"city{i}" for i in range(n)])
+
+@pytest.mark.parametrize("metric", ["correlation", "euclidean"])
+def test_nearest_matches_brute_force(metric):
+    profiles = random_profiles(50)
+    index = SimilarityIndex(profiles, metric=metric)
+    values = profiles.to_numpy()
+    for city in ["city0", "city17"]:
+        target = values[profiles.index.get_loc(city)]
+        if metric == "euclidean":
+            expected = np.linalg.norm(values - target, axis=1)
+        else:
+            expected = 1 - np.array([np.corrcoef(target, row)[0, 1] for row in values])
+        expected = pd.Series(expected, index=profiles.index).drop(city).sort_values()
+        found = index.nearest(city, k=5)
+        assert [c for c, _ in found] == list(expected.index[:5])
+        np.testing.assert_allclose([d for _, d in found], expected.iloc[:5], atol=1e-9)
+
+def test_incremental_update_equals_rebuild():
+    profiles = random_profiles(30)
+    index = SimilarityIndex(profiles)
+    changed = profiles.copy()
+    changed.loc["city3"] = np.linspace(0, 1, 12)
+    index.update("city3", changed.loc["city3"])
+    index.update("new city", np.linspace(1, 0, 12))
+    changed.loc["new city"] = np.linspace(1, 0, 12)
+    index.remove("city5")
+    rebuilt = SimilarityIndex(changed.drop(index="city5"))
+    pd.testing.assert_frame_equal(index.distances.loc[rebuilt.cities, rebuilt.cities], rebuilt.distances, atol=1e-9)
+
+def test_save_load_and_sync(tmp_path):
+    data_dir = tmp_path / "data"
+    shutil.copytree(DATA_DIR, data_dir, ignore=shutil.ignore_patterns("*.cbin"))
+    algorithm = ClusteringAlgorithm(str(data_dir), feature_cache_dir=None)
+    index = SimilarityIndex.from_algorithm(algorithm, sorted(algorithm.cityFiles))
+    path = index.save(str(tmp_path / "index.npz"))
+
+    loaded = SimilarityIndex.load(path)
+    assert loaded.nearest("Boston", 3) == index.nearest("Boston", 3)
+    assert loaded.sync(algorithm) == {"updated": [], "removed": []}
+
+    time.sleep(0.01)
+    miami = data_dir / "miami_daily.csv"
+    df = pd.read_csv(miami)
+    df["precipitation_sum"] = df["precipitation_sum"][::-1].to_numpy()
+    df.to_csv(miami, index=False)
+    os.remove(data_dir / "seattle_daily.csv")
+    algorithm = ClusteringAlgorithm(str(data_dir), feature_cache_dir=None)
+    assert loaded.sync(algorithm) == {"updated": ["Miami"], "removed": ["Seattle"]}
+    rebuilt = SimilarityIndex.from_algorithm(algorithm, loaded.cities)
+    pd.testing.assert_frame_equal(loaded.distances, rebuilt.distances, atol=1e-9)
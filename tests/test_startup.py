@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+def modules_loaded_by(statement):
+    code = f"import sys\n{statement}\nprint(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+def test_main_defers_heavy_imports():
+    loaded = modules_loaded_by("import main")
+    assert not loaded & {"pandas", "matplotlib", "sklearn", "prophet"}
+
+def test_algorithms_defers_prophet_and_sklearn():
+    loaded = modules_loaded_by("import algorithms")
+    assert not loaded & {"matplotlib", "sklearn", "prophet"}
@@ -0,0 +1,53 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+import json
+import numpy as np
+import pytest
+import cli
+import tracing
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+
+@pytest.fixture(autouse=True)
+def no_tracer():
+    tracing.disable()
+    yield
+    tracing.disable()
+
+def test_disabled_spans_record_nothing():
+    @tracing.traced('work')
+    def work():
+        with tracing.span('inner'):
+            return 42
+    assert work() == 42
+    assert tracing.current() is None
+    assert tracing.span('inner') is tracing.span('other')  # one shared no-op object
+
+def test_nested_spans_record_time_and_peak_memory(tmp_path):
+    tracer = tracing.enable(profile=['outer'], profile_dir=str(tmp_path))
+    with tracing.span('outer', city='Boston'):
+        with tracing.span('inner'):
+            block = np.ones(2_000_000)  # 16 MB, freed before outer ends
+            del block
+    tracing.disable()
+
+    inner, outer = tracer.events  # inner closes first
+    assert (inner['name'], outer['name']) == ('inner', 'outer')
+    assert outer['ts'] <= inner['ts'] and inner['dur'] <= outer['dur']
+    assert inner['args']['peak_kb'] > 15000
+    assert outer['args']['peak_kb'] >= inner['args']['peak_kb']  # the child's peak counts for the parent
+    assert os.path.exists(outer['args']['profile'])
+    assert [row['city'] for row in tracer.summary(by='city')] == ['Boston']
+
+def test_cli_trace_writes_chrome_trace(tmp_path):
+    code = cli.main(['anomaly', '--data-dir', DATA_DIR, '--output-dir', str(tmp_path), '--cities', 'Boston,Miami',
+                     '--trace'])
+    assert code == 0
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    names = {event['name'] for event in events}
+    assert {'stage.anomaly', 'anomaly.detect'} <= names
+    assert all(event['ph'] == 'X' and 'cpu_ms' in event['args'] for event in events)
+    assert 'stage.anomaly' in (tmp_path / 'trace_summary.txt').read_text()
+    assert tracing.current() is None